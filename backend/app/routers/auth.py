@@ -1,19 +1,27 @@
-from fastapi import APIRouter, HTTPException, Depends
+import math
+from fastapi import APIRouter, HTTPException, Depends, Header, Request
 from pydantic import BaseModel
-from typing import Dict
-import jwt
-import os
-from datetime import datetime, timedelta
-from app.services.otp_service import create_otp, verify_otp, send_otp_email
+from typing import List, Optional
+from app.services.otp_service import create_otp, verify_otp, OtpDeliveryError
+from app.services.otp_store import OtpStoreError
+from app.services.jwt_auth import issue_access_token, decode_access_token, InvalidToken
+from app.services.user_store import user_repository, UserStoreError
+from app.services.rate_limit import (
+    auth_rate_limiter, client_ip, rate_limited_requests, RateLimited, RateRule, REQUEST_OTP_RULES, VERIFY_OTP_RULES
+)
+from app.services.logging_config import get_logger
+from app.services.metrics import Counter, Histogram, Span
+
+logger = get_logger("auth")
+
+auth_stage_latency = Histogram(
+    "auth_stage_latency_seconds", "Latency of each auth stage: create_otp, verify_otp, ensure_user, issue_token", ("stage",)
+)
+auth_outcomes = Counter("auth_requests_total", "Auth requests, by flow and outcome", ("flow", "outcome"))
 
 # Create router
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
-# JWT configuration
-SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-in-production")
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
-
 # Request/Response models
 class OtpRequest(BaseModel):
     email: str
@@ -26,19 +34,26 @@ class TokenResponse(BaseModel):
     token: str
     email: str
 
-# In-memory user storage (in production, use a database)
-users: Dict[str, dict] = {}
-
 def create_access_token(data: dict):
-    """Create JWT access token"""
-    to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    """Create JWT access token for ``data["sub"]`` (see ``jwt_auth.issue_access_token``)"""
+    return issue_access_token(data["sub"])
+
+async def _enforce_rate_limit(flow: str, rules: List[RateRule], email: str, http_request: Request) -> None:
+    """Count the request against the email and IP rules; 429 with Retry-After when over"""
+    ip = client_ip(http_request.headers, http_request.client.host if http_request.client else None)
+    email_rule, ip_rule = rules
+    try:
+        await auth_rate_limiter.check([(email_rule, email), (ip_rule, ip)])
+    except RateLimited as e:
+        rate_limited_requests.inc(rule=e.rule)
+        auth_outcomes.inc(flow=flow, outcome="rate_limited")
+        raise HTTPException(
+            status_code=429, detail="Too many requests, please try again later",
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))}
+        )
 
 @router.post("/request-otp")
-async def request_otp(request: OtpRequest):
+async def request_otp(request: OtpRequest, http_request: Request):
     """
     Request OTP for email authentication.
     Generates a 6-digit OTP and sends it to the user's email.
@@ -47,21 +62,31 @@ async def request_otp(request: OtpRequest):
     
     # Validate email format
     if "@" not in email:
+        auth_outcomes.inc(flow="request_otp", outcome="invalid")
         raise HTTPException(status_code=400, detail="Invalid email format")
     
+    # Before anything is stored or emailed
+    await _enforce_rate_limit("request_otp", REQUEST_OTP_RULES, email, http_request)
+    
     try:
-        # Generate OTP (will use EmailJS or fallback)
-        otp = create_otp(email)
-        
-        # Return success response (don't reveal the OTP in the response)
-        return {"message": "OTP sent successfully (or printed to console in fallback mode)"}
-    except Exception as e:
-        # Even if EmailJS fails, we still allow login via fallback
-        print(f"Warning: EmailJS failed but continuing with fallback mode: {e}")
-        return {"message": "EmailJS failed, but you can use any 6-digit code to login"}
+        # Generate OTP and queue its email
+        with Span(auth_stage_latency, stage="create_otp"):
+            await create_otp(email)
+    except OtpStoreError as e:
+        # Without a stored OTP the user could not log in, so don't pretend it was sent
+        logger.error("OTP store unavailable", extra={"fields": {"error": str(e)}})
+        auth_outcomes.inc(flow="request_otp", outcome="unavailable")
+        raise HTTPException(status_code=503, detail="OTP service temporarily unavailable")
+    except OtpDeliveryError:
+        auth_outcomes.inc(flow="request_otp", outcome="unavailable")
+        raise HTTPException(status_code=503, detail="Could not send the OTP email, please try again later")
+    auth_outcomes.inc(flow="request_otp", outcome="sent")
+    
+    # Return success response (don't reveal the OTP in the response)
+    return {"message": "OTP sent successfully"}
 
 @router.post("/verify-otp", response_model=TokenResponse)
-async def verify_otp_endpoint(request: OtpVerification):
+async def verify_otp_endpoint(request: OtpVerification, http_request: Request):
     """
     Verify OTP and return JWT token.
     """
@@ -70,40 +95,44 @@ async def verify_otp_endpoint(request: OtpVerification):
     
     # Validate OTP format
     if not otp.isdigit() or len(otp) != 6:
+        auth_outcomes.inc(flow="verify_otp", outcome="invalid")
         raise HTTPException(status_code=400, detail="Invalid OTP format")
     
-    # Verify OTP (will use fallback if EmailJS failed)
-    is_valid = verify_otp(email, otp)
+    # Bounds OTP guesses per email and per client
+    await _enforce_rate_limit("verify_otp", VERIFY_OTP_RULES, email, http_request)
+    
+    # Verify OTP; a matching one is used up
+    try:
+        with Span(auth_stage_latency, stage="verify_otp"):
+            is_valid = await verify_otp(email, otp)
+    except OtpStoreError as e:
+        logger.error("OTP store unavailable", extra={"fields": {"error": str(e)}})
+        auth_outcomes.inc(flow="verify_otp", outcome="unavailable")
+        raise HTTPException(status_code=503, detail="OTP service temporarily unavailable")
     
     if not is_valid:
+        auth_outcomes.inc(flow="verify_otp", outcome="rejected")
         raise HTTPException(status_code=401, detail="Invalid or expired OTP")
     
     # Create or get user
-    if email not in users:
-        users[email] = {
-            "email": email,
-            "created_at": datetime.utcnow()
-        }
+    try:
+        with Span(auth_stage_latency, stage="ensure_user"):
+            _, created = await user_repository.ensure_user(email)
+    except UserStoreError:
+        auth_outcomes.inc(flow="verify_otp", outcome="unavailable")
+        raise HTTPException(status_code=503, detail="User store temporarily unavailable")
+    if created:
+        logger.info("New user registered", extra={"fields": {"email": email}})
     
     # Create access token
-    access_token = create_access_token(data={"sub": email})
+    with Span(auth_stage_latency, stage="issue_token"):
+        access_token = create_access_token(data={"sub": email})
+    auth_outcomes.inc(flow="verify_otp", outcome="verified")
     
     return {"token": access_token, "email": email}
 
-# Dependency for protected routes
-def get_current_user(token: str):
-    """Get current user from JWT token"""
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise HTTPException(status_code=401, detail="Invalid authentication credentials")
-        return email
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
-
 # Add this to validate authorization header
-async def get_authorization_header(authorization: str = None):
+async def get_authorization_header(authorization: Optional[str] = Header(None)):
     """Extract token from Authorization header"""
     if not authorization:
         raise HTTPException(status_code=401, detail="Authorization header missing")
@@ -111,4 +140,19 @@ async def get_authorization_header(authorization: str = None):
     if not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Invalid authorization header format")
     
-    return authorization[7:]  # Remove "Bearer " prefix
\ No newline at end of file
+    return authorization[7:]  # Remove "Bearer " prefix
+
+# Dependency for protected routes, shared by every router
+async def get_current_user(token: str = Depends(get_authorization_header)) -> str:
+    """Get current user email from JWT token"""
+    try:
+        return decode_access_token(token)["sub"]
+    except InvalidToken:
+        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+
+# For public routes whose extra features need a signed-in user
+async def get_optional_user(authorization: Optional[str] = Header(None)) -> Optional[str]:
+    """Current user email, or None without an Authorization header; 401 for a bad token"""
+    if authorization is None:
+        return None
+    return await get_current_user(await get_authorization_header(authorization))
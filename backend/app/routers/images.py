@@ -0,0 +1,97 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from starlette.datastructures import UploadFile
+from starlette.formparsers import MultiPartException, MultiPartParser
+from pydantic import BaseModel
+from typing import AsyncIterator
+from app.services.image_store import image_store, ImageTooLarge, InvalidImage, IMAGE_MAX_UPLOAD_BYTES
+from app.routers.auth import get_current_user
+
+# Create router
+router = APIRouter(prefix="/api/inspiration-images", tags=["Images"])
+
+# Chunk size when reading a multipart upload
+UPLOAD_CHUNK_BYTES = 64 * 1024
+# Room for boundaries, part headers and small extra fields around the image in a multipart body
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+class ImageUploadResponse(BaseModel):
+    image_id: str
+    width: int
+    height: int
+    duplicate: bool
+
+
+async def _limited(chunks: AsyncIterator[bytes], limit: int) -> AsyncIterator[bytes]:
+    """Pass ``chunks`` through, raising ImageTooLarge once more than ``limit`` bytes arrived"""
+    received = 0
+    async for chunk in chunks:
+        received += len(chunk)
+        if received > limit:
+            raise ImageTooLarge(f"Image exceeds {IMAGE_MAX_UPLOAD_BYTES} bytes")
+        yield chunk
+
+
+async def _parse_multipart(request: Request):
+    """
+    Parse a multipart form from the body stream, stopping once it exceeds
+    the image limit (plus form overhead). ``request.form()`` would spool a
+    body of any size to disk first, and chunked requests carry no
+    Content-Length to check up front.
+    """
+    parser = MultiPartParser(
+        request.headers, _limited(request.stream(), IMAGE_MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES),
+        max_files=1, max_fields=16
+    )
+    try:
+        return await parser.parse()
+    except MultiPartException as e:
+        raise HTTPException(status_code=400, detail=e.message)
+
+
+async def _upload_chunks(upload: UploadFile) -> AsyncIterator[bytes]:
+    while True:
+        chunk = await upload.read(UPLOAD_CHUNK_BYTES)
+        if not chunk:
+            break
+        yield chunk
+
+
+@router.post("", response_model=ImageUploadResponse, dependencies=[Depends(get_current_user)])
+async def upload_inspiration_image(request: Request):
+    """
+    Upload a trip inspiration image and get its ``image_id``. Requires a
+    bearer token, since every new image takes disk space and a Gemini call.
+
+    Send the image either as the raw request body (``Content-Type: image/*``),
+    which is hashed and spooled as it arrives, or as the ``file`` field of a
+    ``multipart/form-data`` form. Pass the returned ``image_id`` as
+    ``inspiration_image_id`` when generating an itinerary; uploading the same
+    image again is answered from the store without reprocessing it.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > IMAGE_MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Image exceeds {IMAGE_MAX_UPLOAD_BYTES} bytes")
+
+    content_type = request.headers.get("content-type", "")
+    form = None
+    try:
+        if content_type.startswith("multipart/form-data"):
+            form = await _parse_multipart(request)
+            upload = form.get("file")
+            if not isinstance(upload, UploadFile):
+                raise HTTPException(status_code=400, detail="Multipart upload needs a 'file' field")
+            chunks = _upload_chunks(upload)
+        elif content_type.startswith(("image/", "application/octet-stream")):
+            chunks = request.stream()
+        else:
+            raise HTTPException(status_code=415, detail="Send an image body or a multipart form with a 'file' field")
+        image, duplicate = await image_store.put_stream(chunks)
+    except ImageTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except InvalidImage as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        if form is not None:
+            await form.close()
+    return ImageUploadResponse(image_id=image.digest, width=image.width, height=image.height, duplicate=duplicate)
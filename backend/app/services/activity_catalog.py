@@ -0,0 +1,284 @@
+"""
+Fallback activity catalog, stored in a compact memory-mapped binary file.
+
+The editable source is ``data/activities.json``; compile it after changes:
+
+    python -m app.services.activity_catalog data/activities.json data/activities.bin
+
+File layout (little-endian):
+
+    header   magic "ACT1", string count, group count, record count
+    strings  offsets (u32 x count + 1), then one UTF-8 blob
+    groups   destination string, tag string, first record, record count,
+             sorted by lower-cased (destination, tag) for binary search
+    records  time of day, title, description, location and category
+             strings, cost, booking flag, latitude, longitude
+
+Activities are grouped by (destination, tag); the empty tag holds a
+destination's base activities and the ``*`` destination holds generic
+templates, whose text may contain ``{destination}``.
+"""
+import os
+import sys
+import json
+import math
+import mmap
+import struct
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from schemas import Activity
+from app.services.logging_config import get_logger
+
+logger = get_logger("activity_catalog")
+
+# Compiled catalog; opened on first use
+ACTIVITY_CATALOG_PATH = os.getenv("ACTIVITY_CATALOG_PATH") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data", "activities.bin"
+)
+
+# Destination key of the generic templates
+GENERIC_DESTINATION = "*"
+DESTINATION_PLACEHOLDER = "{destination}"
+
+TIMES_OF_DAY = ("morning", "afternoon", "evening")
+
+_MAGIC = b"ACT1"
+_HEADER = struct.Struct("<4sIII")
+_OFFSET = struct.Struct("<I")
+# Two consecutive offsets: start and end of one string
+_STRING_SPAN = struct.Struct("<II")
+_GROUP = struct.Struct("<IIII")
+# time of day, title, description, location, category, cost, booking, latitude, longitude
+_RECORD = struct.Struct("<BIIIIf?ff")
+
+
+class CatalogActivity(NamedTuple):
+    """Immutable catalog entry, shared by every request that uses it"""
+    timeOfDay: str
+    title: str
+    description: str
+    location: str
+    category: str
+    estimatedCost: float
+    bookingRequired: bool
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+    def for_destination(self, destination: str) -> "CatalogActivity":
+        """Fill ``{destination}`` in a generic template"""
+        if DESTINATION_PLACEHOLDER not in self.title + self.description + self.location:
+            return self
+        return self._replace(
+            title=self.title.replace(DESTINATION_PLACEHOLDER, destination),
+            description=self.description.replace(DESTINATION_PLACEHOLDER, destination),
+            location=self.location.replace(DESTINATION_PLACEHOLDER, destination)
+        )
+
+    def to_activity(self) -> Activity:
+        """
+        Build the response model.
+
+        Plain construction: with pydantic-core's compiled validator this
+        is cheaper than ``model_construct``.
+        """
+        return Activity(**self._asdict())
+
+
+class ActivityCatalog:
+    """
+    Read-only view of a compiled catalog file.
+
+    Nothing is read until the first lookup. The file is then memory-mapped
+    and only its header is parsed; a lookup binary-searches the sorted
+    group table inside the mapping and decodes just that group's records,
+    which are kept as a shared tuple (so at most one per group in the
+    file). Startup time and memory therefore do not grow with the number
+    of destinations shipped.
+    """
+
+    def __init__(self, path: str = ACTIVITY_CATALOG_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._buffer: Optional[mmap.mmap] = None
+        self._opened = False
+        self._group_count = 0
+        self._strings_start = 0
+        self._groups_start = 0
+        self._records_start = 0
+        # (destination, tag), lower-cased -> decoded records; only groups in
+        # the file, so user-supplied keys cannot grow it
+        self._decoded: Dict[Tuple[str, str], Tuple[CatalogActivity, ...]] = {}
+
+    def activities(self, destination: str, tag: str = "") -> Tuple[CatalogActivity, ...]:
+        """
+        Return the activities stored for a destination and tag.
+
+        Args:
+            destination: Canonical destination name, or ``*`` for templates
+            tag: Trip tag, or empty for the destination's base activities
+
+        Returns:
+            The shared, immutable records; empty when the group is unknown
+        """
+        key = (destination.lower(), tag.lower())
+        records = self._decoded.get(key)
+        if records is not None:
+            return records
+        group = self._find_group(key) if self._open() else None
+        if group is None:
+            # Misses cost one binary search and are not cached
+            return ()
+        records = self._decoded[key] = self._decode_group(*group)
+        return records
+
+    def base_activities(self, destination: str) -> Tuple[CatalogActivity, ...]:
+        """Destination-specific base activities, else the generic templates"""
+        return self.activities(destination) or self.activities(GENERIC_DESTINATION)
+
+    def tag_activities(self, destination: str, tag: str) -> Tuple[CatalogActivity, ...]:
+        """Destination-specific activities for a tag, else the generic ones"""
+        return self.activities(destination, tag) or self.activities(GENERIC_DESTINATION, tag)
+
+    def destinations(self) -> List[str]:
+        """Destinations with their own activities (lower-cased)"""
+        if not self._open():
+            return []
+        names = {self._group_key(index)[0] for index in range(self._group_count)}
+        return sorted(names - {GENERIC_DESTINATION})
+
+    def _open(self) -> bool:
+        """Map the file on first use; False when it is missing or unreadable"""
+        if self._opened:
+            return self._buffer is not None
+        with self._lock:
+            if self._opened:
+                return self._buffer is not None
+            try:
+                with open(self.path, "rb") as catalog_file:
+                    buffer = mmap.mmap(catalog_file.fileno(), 0, access=mmap.ACCESS_READ)
+                magic, string_count, group_count, _ = _HEADER.unpack_from(buffer, 0)
+                if magic != _MAGIC:
+                    raise ValueError("not a compiled activity catalog")
+            except (OSError, ValueError, struct.error) as e:
+                logger.error("Activity catalog unavailable", extra={"fields": {"path": self.path, "error": str(e)}})
+                self._opened = True
+                return False
+            self._buffer = buffer
+            self._group_count = group_count
+            self._strings_start = _HEADER.size + _OFFSET.size * (string_count + 1)
+            self._groups_start = self._strings_start + _OFFSET.unpack_from(buffer, _HEADER.size + _OFFSET.size * string_count)[0]
+            self._records_start = self._groups_start + _GROUP.size * group_count
+            self._opened = True
+            logger.info("Activity catalog opened", extra={"fields": {"path": self.path, "groups": group_count}})
+            return True
+
+    def _group_key(self, index: int) -> Tuple[str, str]:
+        destination, tag, _, _ = _GROUP.unpack_from(self._buffer, self._groups_start + index * _GROUP.size)
+        return self._string(destination).lower(), self._string(tag).lower()
+
+    def _find_group(self, key: Tuple[str, str]) -> Optional[Tuple[int, int]]:
+        """Binary search the sorted group table; returns (first record, count)"""
+        low, high = 0, self._group_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._group_key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._group_count and self._group_key(low) == key:
+            return _GROUP.unpack_from(self._buffer, self._groups_start + low * _GROUP.size)[2:]
+        return None
+
+    def _string(self, index: int) -> str:
+        start, end = _STRING_SPAN.unpack_from(self._buffer, _HEADER.size + _OFFSET.size * index)
+        return self._buffer[self._strings_start + start:self._strings_start + end].decode("utf-8")
+
+    def _decode_group(self, first: int, count: int) -> Tuple[CatalogActivity, ...]:
+        start = self._records_start + first * _RECORD.size
+        records = []
+        for time_of_day, title, description, location, category, cost, booking, latitude, longitude in _RECORD.iter_unpack(
+            self._buffer[start:start + count * _RECORD.size]
+        ):
+            records.append(CatalogActivity(
+                timeOfDay=TIMES_OF_DAY[time_of_day],
+                title=self._string(title),
+                description=self._string(description),
+                location=self._string(location),
+                category=self._string(category),
+                # Stored as float32; round away the conversion noise
+                estimatedCost=round(cost, 2),
+                bookingRequired=booking,
+                latitude=None if math.isnan(latitude) else round(latitude, 4),
+                longitude=None if math.isnan(longitude) else round(longitude, 4)
+            ))
+        return tuple(records)
+
+
+def compile_catalog(source: dict, path: str) -> int:
+    """
+    Validate a catalog source and write it in the compiled format.
+
+    Args:
+        source: ``{"destinations": {name: {"activities": [...], "tags": {tag: [...]}}}}``
+        path: Output file
+
+    Returns:
+        Number of activities written
+    """
+    strings: Dict[str, int] = {}
+
+    def string_id(value: str) -> int:
+        if value not in strings:
+            strings[value] = len(strings)
+        return strings[value]
+
+    sections: List[Tuple[str, str, Iterable[dict]]] = []
+    for destination, entry in source["destinations"].items():
+        sections.append((destination, "", entry.get("activities", [])))
+        sections.extend((destination, tag, activities) for tag, activities in entry.get("tags", {}).items())
+    # Lookups binary-search on the lower-cased key
+    sections.sort(key=lambda section: (section[0].lower(), section[1].lower()))
+
+    groups = []
+    records = []
+    for destination, tag, activities in sections:
+        first = len(records)
+        for data in activities:
+            activity = Activity.model_validate(data)
+            records.append(_RECORD.pack(
+                TIMES_OF_DAY.index(activity.timeOfDay),
+                string_id(activity.title),
+                string_id(activity.description),
+                string_id(activity.location),
+                string_id(activity.category),
+                activity.estimatedCost,
+                activity.bookingRequired,
+                math.nan if activity.latitude is None else activity.latitude,
+                math.nan if activity.longitude is None else activity.longitude
+            ))
+        if len(records) > first:
+            groups.append(_GROUP.pack(string_id(destination), string_id(tag), first, len(records) - first))
+
+    encoded = [value.encode("utf-8") for value in strings]
+    offsets = [0]
+    for value in encoded:
+        offsets.append(offsets[-1] + len(value))
+    with open(path, "wb") as catalog_file:
+        catalog_file.write(_HEADER.pack(_MAGIC, len(encoded), len(groups), len(records)))
+        catalog_file.write(b"".join(_OFFSET.pack(offset) for offset in offsets))
+        catalog_file.write(b"".join(encoded))
+        catalog_file.write(b"".join(groups))
+        catalog_file.write(b"".join(records))
+    return len(records)
+
+
+# Shared catalog for the fallback planner
+activity_catalog = ActivityCatalog()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: python -m app.services.activity_catalog <source.json> <output.bin>")
+    with open(sys.argv[1]) as source_file:
+        written = compile_catalog(json.load(source_file), sys.argv[2])
+    print(f"Wrote {written} activities to {sys.argv[2]}")
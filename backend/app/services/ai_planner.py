@@ -1,227 +1,615 @@
 import os
 import json
-import re
+import time
+import asyncio
 import hashlib
-import google.generativeai as genai
-from typing import List
+import functools
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
+from pydantic import ValidationError
 from schemas import TripRequest, Itinerary, DayPlan, Activity, ItineraryMeta
+from app.services.gemini_client import gemini_registry, gemini_executor, GEMINI_TRANSPORT
+from app.services.itinerary_cache import itinerary_cache, request_cache_key
+from app.services.single_flight import itinerary_flights
+from app.services.json_stream import ItineraryStreamParser, extract_itinerary_json
+from app.services.gemini_scheduler import (
+    gemini_scheduler, is_quota_error, SharedPriority, Slot, PRIORITY_INTERACTIVE, PRIORITY_BATCH
+)
+from app.services.metrics import Counter, Histogram, Span, SIZE_BUCKETS
+from app.services.destinations import destination_index, DEFAULT_DESTINATION
+from app.services.style_keywords import style_classifier
+from app.services.activity_catalog import activity_catalog, CatalogActivity
+from app.services.image_store import image_store, StoredImage
+from app.services.prompts import SYSTEM_INSTRUCTION, RequestPrompt, build_request_prompt
+from app.services.image_mood import (
+    MoodAnalysis, IMAGE_MOOD_PROMPT, IMAGE_MOOD_TOKENS, IMAGE_MOOD_TIMEOUT,
+    mood_cache, image_mood_flights, parse_mood_response, perceptual_hash_file
+)
+from app.services.logging_config import get_logger, annotate_request, should_sample_payload
 
+logger = get_logger("ai_planner")
 
-def generate_itinerary(request: TripRequest) -> Itinerary:
+
+# Default number of batch items generated concurrently
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+
+# Where an itinerary came from
+STATUS_SUCCESS = "success"
+STATUS_CACHED = "cached"
+STATUS_FALLBACK = "fallback"
+STATUS_ERROR = "error"
+
+# Time kept back from a request deadline to build the fallback itinerary
+FALLBACK_RESERVE = float(os.getenv("FALLBACK_RESERVE", "0.5"))
+
+# Upper bound for a single Gemini call, even without a caller deadline
+GEMINI_CALL_TIMEOUT = float(os.getenv("GEMINI_CALL_TIMEOUT", "60"))
+# REST calls run on threads that cannot be cancelled, so the HTTP request itself times out
+_REST_OPTIONS = {"timeout": GEMINI_CALL_TIMEOUT}
+
+# Hedging: send a second request when the first is slower than GEMINI_HEDGE_AFTER
+# seconds, or than the observed p95 once enough calls were seen if that is unset
+GEMINI_HEDGE_ENABLED = os.getenv("GEMINI_HEDGE_ENABLED", "false").lower() == "true"
+GEMINI_HEDGE_AFTER = float(os.getenv("GEMINI_HEDGE_AFTER", "0"))
+GEMINI_HEDGE_MIN_SAMPLES = 20
+
+# Which path served each itinerary: cached, primary, hedge, deadline_fallback or error_fallback
+PATH_CACHED = "cached"
+PATH_PRIMARY = "primary"
+PATH_HEDGE = "hedge"
+PATH_DEADLINE_FALLBACK = "deadline_fallback"
+PATH_ERROR_FALLBACK = "error_fallback"
+
+itinerary_paths = Counter("itinerary_path_total", "Itineraries served, by path", ("path",))
+itinerary_latency = Histogram("itinerary_latency_seconds", "End-to-end itinerary latency, by path", ("path",))
+# By call: itinerary or image_mood; only itinerary calls calibrate the hedge delay
+CALL_ITINERARY = "itinerary"
+CALL_IMAGE_MOOD = "image_mood"
+gemini_call_latency = Histogram("gemini_call_latency_seconds", "Latency of successful Gemini generate calls, by call", ("call",))
+gemini_hedges = Counter("gemini_hedged_requests_total", "Hedged second Gemini requests sent")
+itinerary_stage_latency = Histogram(
+    "itinerary_stage_latency_seconds",
+    "Latency of each itinerary pipeline stage: cache_lookup, image_mood, prompt, scheduler_wait, parse, fallback",
+    ("stage",)
+)
+itinerary_fallbacks = Counter("itinerary_fallbacks_total", "Fallback itineraries served, by reason", ("reason",))
+gemini_prompt_chars = Histogram("gemini_prompt_chars", "Size of prompts sent to Gemini", buckets=SIZE_BUCKETS)
+gemini_response_chars = Histogram("gemini_response_chars", "Size of Gemini responses", buckets=SIZE_BUCKETS)
+gemini_prompt_tokens = Histogram(
+    "gemini_prompt_tokens", "Prompt tokens per Gemini itinerary call, as reported by Gemini (else estimated)", buckets=SIZE_BUCKETS
+)
+gemini_cached_prompt_tokens = Counter("gemini_cached_prompt_tokens_total", "Prompt tokens served from Gemini's context cache")
+prompt_truncations = Counter("prompt_truncations_total", "Trip descriptions cut to fit PROMPT_TOKEN_BUDGET")
+image_mood_sources = Counter(
+    "image_mood_total", "Inspiration image mood analyses, by source: stored, similar, gemini, fallback", ("source",)
+)
+
+# Priority of each in-flight itinerary generation, raised when a more urgent caller joins
+_flight_priorities: Dict[str, SharedPriority] = {}
+
+
+async def generate_itinerary_async(request: TripRequest, deadline: Optional[float] = None) -> Itinerary:
     """
-    Generate a travel itinerary using Google Gemini AI with function calling.
+    Generate a travel itinerary without blocking the event loop.
     """
+    itinerary, _ = await generate_itinerary_with_status(request, deadline=deadline)
+    return itinerary
+
+
+async def generate_itinerary_with_status(
+    request: TripRequest,
+    priority: int = PRIORITY_INTERACTIVE,
+    deadline: Optional[float] = None
+) -> Tuple[Itinerary, str]:
+    """
+    Generate a travel itinerary and report where it came from.
+    
+    Args:
+        request: Trip request
+        priority: Scheduling priority for the Gemini call; batch and
+            pre-warm traffic should pass PRIORITY_BATCH
+        deadline: ``time.monotonic()`` by which to return; when Gemini has
+            not answered shortly before it, the fallback itinerary is served
+    
+    Returns:
+        The itinerary and its status: ``success`` (fresh from Gemini),
+        ``cached`` or ``fallback``
+    """
+    start = time.monotonic()
+    _log_request(request)
+    cache_key, cached = _lookup_cache(request)
+    if cached is not None:
+        logger.debug("Serving itinerary from cache")
+        _record_path(PATH_CACHED, start)
+        return cached, STATUS_CACHED
+    
+    def start_flight():
+        flight_priority = _flight_priorities[cache_key] = SharedPriority(priority)
+        return _generate_and_cache_async(request, cache_key, flight_priority)
+
+    def join_flight():
+        flight_priority = _flight_priorities.get(cache_key)
+        if flight_priority is not None:
+            flight_priority.raise_to(priority)
+
     try:
-        print("=" * 50)
-        print("🚀 STARTING ITINERARY GENERATION")
-        print("=" * 50)
-        print(f"📝 Trip description: {request.trip_description}")
-        print(f"📅 Start date: {request.start_date}")
-        print(f"📆 Days: {request.days}")
-        print(f"💰 Budget level: {request.budget_level}")
-        print(f"🏷️ Trip tags: {request.trip_tags}")
-        print(f"🖼️ Image provided: {'Yes' if request.inspiration_image else 'No'}")
-        
-        # Configure Gemini
-        GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-        print(f"🔍 Gemini API Key Status: {'SET' if GEMINI_API_KEY and not GEMINI_API_KEY.startswith('your_') and len(GEMINI_API_KEY) > 20 else 'NOT SET or PLACEHOLDER'}")
-        print(f"🔑 Gemini API Key length: {len(GEMINI_API_KEY) if GEMINI_API_KEY else 0}")
-        print(f"🔑 Gemini API Key starts with: {GEMINI_API_KEY[:10] if GEMINI_API_KEY else 'NONE'}")
-        print(f"🔑 Full Gemini API Key (last 5 chars): {GEMINI_API_KEY[-5:] if GEMINI_API_KEY else 'NONE'}")
-        
-        if not GEMINI_API_KEY:
-            print("❌ ERROR: GEMINI_API_KEY not set")
-            raise RuntimeError("GEMINI_API_KEY not set")
-        
-        if GEMINI_API_KEY.startswith("your_") or len(GEMINI_API_KEY) < 20:
-            print("❌ ERROR: GEMINI_API_KEY still contains placeholder value or is too short")
-            raise RuntimeError("GEMINI_API_KEY not set (placeholder value detected)")
-        
-        # Test if the API key is valid by trying to list models
-        try:
-            genai.configure(api_key=GEMINI_API_KEY)
-            print("✅ Gemini configured successfully")
-            
-            # Test the API key by listing models
-            print("🔍 Testing API key validity...")
-            models = genai.list_models()
-            model_names = [m.name for m in models]
-            print(f"✅ API key is valid. Available models: {len(model_names)}")
-            if model_names:
-                print(f"📋 First few models: {model_names[:3]}")
-        except Exception as key_error:
-            print(f"❌ API key validation failed: {key_error}")
-            raise RuntimeError(f"Invalid Gemini API key: {key_error}")
-        
-        # Define the model
-        model = genai.GenerativeModel("models/gemini-flash-latest")
-        print("🤖 Using model: gemini-flash-latest")
-        
-        # Create system prompt with schema information
-        itinerary_schema = """{
-            "destination": "string",
-            "numDays": "integer",
-            "styleKeywords": ["string"],
-            "imageMoodSummary": "string or null",
-            "days": [
-                {
-                    "dayNumber": "integer",
-                    "date": "string or null",
-                    "theme": "string",
-                    "summary": "string",
-                    "activities": [
-                        {
-                            "timeOfDay": "morning|afternoon|evening",
-                            "title": "string",
-                            "description": "string",
-                            "location": "string",
-                            "category": "string",
-                            "estimatedCost": "number",
-                            "bookingRequired": "boolean",
-                            "latitude": "number or null (approximate GPS latitude of the location)",
-                            "longitude": "number or null (approximate GPS longitude of the location)"
-                        }
-                    ]
-                }
-            ],
-            "meta": {
-                "currency": "string",
-                "budgetLevel": "string",
-                "notes": "string"
-            }
-        }"""
-        
-        # Prepare the prompt
-        prompt = f"""
-You are an AI travel planner. Generate a detailed, realistic travel itinerary as JSON only, matching this exact schema:
-
-{itinerary_schema}
-
-User trip description: {request.trip_description}
-Destination: {request.destination}
-Start date: {request.start_date or 'Not specified'}
-Days: {request.days or 'Not specified'}
-Budget level: {request.budget_level or 'Not specified'}
-Trip tags: {request.trip_tags}
-Image mood hint: {request.inspiration_image and 'Provided (base64 encoded)' or 'Not provided'}
-
-Important instructions:
-1. Respond ONLY with valid JSON that matches the schema exactly
-2. Do not include any markdown, explanations, or other text
-3. Make the itinerary realistic and engaging
-4. Ensure all fields are populated appropriately
-5. For estimated costs, use reasonable values in the local currency
-6. Activities should be appropriate for the destination and trip type
-7. Include 2-4 activities per day
-8. Use the destination provided above, not the one mentioned in the trip description
-9. Generate specific tourist attractions and activities for the given destination
-10. Include approximate latitude and longitude coordinates for each activity location
-11. If you don't know the exact coordinates, estimate them based on the location name and destination
-"""
-        
-        print("📤 Sending request to Gemini API...")
-        print(f"📋 Prompt length: {len(prompt)} characters")
+        # Concurrent identical requests share one Gemini call, which runs at
+        # the most urgent caller's priority; each caller only waits until its
+        # own deadline, so the shared call has none
+        shared = itinerary_flights.do(cache_key, start_flight, on_join=join_flight)
+        if deadline is None:
+            itinerary, path = await shared
+        else:
+            itinerary, path = await asyncio.wait_for(shared, max(0.0, deadline - time.monotonic() - FALLBACK_RESERVE))
+        _record_path(path, start)
+        return itinerary, STATUS_SUCCESS
+    except asyncio.TimeoutError:
+        logger.warning("Deadline reached before Gemini answered, using fallback implementation")
+        itinerary_fallbacks.inc(reason="deadline")
+        annotate_request(fallback_reason="deadline")
+        itinerary = _timed_mock_itinerary(request)
+        _record_path(PATH_DEADLINE_FALLBACK, start)
+        return itinerary, STATUS_FALLBACK
+    except Exception as e:
+        itinerary = _fallback_itinerary(request, e)
+        _record_path(PATH_ERROR_FALLBACK, start)
+        return itinerary, STATUS_FALLBACK
+
+
+def _lookup_cache(request: TripRequest) -> Tuple[str, Optional[Itinerary]]:
+    """Return the request's cache key and the cached itinerary, if any"""
+    with Span(itinerary_stage_latency, stage="cache_lookup"):
+        cache_key = request_cache_key(request)
+        return cache_key, itinerary_cache.get(cache_key)
+
+
+def _record_path(path: str, start: float) -> None:
+    itinerary_paths.inc(path=path)
+    itinerary_latency.observe(time.monotonic() - start, path=path)
+    annotate_request(path=path)
+
+
+async def generate_itineraries_batch(
+    requests: List[TripRequest],
+    concurrency: int = BATCH_CONCURRENCY
+) -> AsyncIterator[Tuple[int, Optional[Itinerary], str, Optional[str]]]:
+    """
+    Generate many itineraries with bounded concurrency, yielding each as it completes.
+    
+    Args:
+        requests: Trip requests to generate
+        concurrency: Maximum generations in flight at once
         
-        # Generate content with Gemini
+    Yields:
+        ``(index, itinerary, status, error)`` in completion order; status is
+        ``success``, ``cached``, ``fallback`` or ``error``
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    
+    async def run(index: int, request: TripRequest):
+        async with semaphore:
+            try:
+                itinerary, status = await generate_itinerary_with_status(request, PRIORITY_BATCH)
+                return index, itinerary, status, None
+            except Exception as e:
+                return index, None, STATUS_ERROR, str(e)
+    
+    tasks = [asyncio.ensure_future(run(index, request)) for index, request in enumerate(requests)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Stop outstanding work if the consumer goes away
+        for task in tasks:
+            task.cancel()
+
+
+async def _generate_and_cache_async(
+    request: TripRequest,
+    cache_key: str,
+    priority: SharedPriority
+) -> Tuple[Itinerary, str]:
+    """Generate with Gemini and cache the result under ``cache_key``"""
+    try:
+        itinerary, path = await _generate_with_gemini_async(request, priority)
+    finally:
+        _flight_priorities.pop(cache_key, None)
+    itinerary_cache.put(cache_key, itinerary)
+    return itinerary, path
+
+
+async def _generate_with_gemini_async(
+    request: TripRequest,
+    priority: Union[int, SharedPriority] = PRIORITY_INTERACTIVE,
+    deadline: Optional[float] = None
+) -> Tuple[Itinerary, str]:
+    """
+    Call Gemini without blocking the event loop; raises on any failure.
+
+    Returns the itinerary and whether the primary or the hedged request
+    produced it.
+    """
+    model = _itinerary_model()
+    analysis = await _analyze_image(request, priority, deadline)
+    prompt = _timed_prompt(request, analysis)
+    
+    try:
+        response, path = await _call_gemini_hedged(model, prompt.text, priority, _estimate_tokens(prompt, request), deadline)
+        _record_usage(response, prompt)
+        itinerary = _parse_itinerary(response.text)
+        if analysis is not None and not itinerary.imageMoodSummary:
+            itinerary.imageMoodSummary = analysis.summary
+        return itinerary, path
+    except Exception as api_error:
+        raise RuntimeError(f"Gemini API call failed: {api_error}") from api_error
+
+
+async def _call_gemini_hedged(
+    model,
+    prompt: str,
+    priority: Union[int, SharedPriority],
+    tokens: int,
+    deadline: Optional[float]
+):
+    """
+    Run the primary Gemini call and, if it is slower than the hedge delay,
+    a second identical call; the first successful response wins and the
+    other call is cancelled.
+
+    The delay counts from the primary's admission, not from its queueing,
+    and no hedge is sent while other calls wait for the scheduler: a
+    duplicate would only take capacity from them when Gemini is saturated.
+    """
+    hedge_after = _hedge_delay()
+    if hedge_after is None:
+        return await _call_gemini(model, prompt, priority, tokens, deadline), PATH_PRIMARY
+    
+    admitted = asyncio.Event()
+    primary = asyncio.ensure_future(_call_gemini(model, prompt, priority, tokens, deadline, admitted))
+    admission = asyncio.ensure_future(admitted.wait())
+    try:
+        await asyncio.wait({primary, admission}, return_when=asyncio.FIRST_COMPLETED)
+        if not primary.done():
+            await asyncio.wait({primary}, timeout=hedge_after)
+    except BaseException:
+        primary.cancel()
+        raise
+    finally:
+        admission.cancel()
+    if primary.done():
+        return primary.result(), PATH_PRIMARY
+    if gemini_scheduler.queued():
+        return await primary, PATH_PRIMARY
+    
+    logger.info("Gemini call slow, sending hedged request", extra={"fields": {"hedge_after_s": round(hedge_after, 3)}})
+    gemini_hedges.inc()
+    hedge = asyncio.ensure_future(_call_gemini(model, prompt, priority, tokens, deadline))
+    paths = {primary: PATH_PRIMARY, hedge: PATH_HEDGE}
+    try:
+        pending = set(paths)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result(), paths[task]
+        # Both failed; report the primary's error
+        return primary.result(), PATH_PRIMARY
+    finally:
+        for task in paths:
+            task.cancel()
+
+
+def _hedge_delay() -> Optional[float]:
+    """Seconds to wait before hedging, or None when hedging is off or not yet calibrated"""
+    if not GEMINI_HEDGE_ENABLED:
+        return None
+    if GEMINI_HEDGE_AFTER > 0:
+        return GEMINI_HEDGE_AFTER
+    if gemini_call_latency.count(call=CALL_ITINERARY) < GEMINI_HEDGE_MIN_SAMPLES:
+        return None
+    return gemini_call_latency.quantile(0.95, call=CALL_ITINERARY)
+
+
+async def _call_gemini(
+    model,
+    prompt: Union[str, list],
+    priority: Union[int, SharedPriority],
+    tokens: int,
+    deadline: Optional[float],
+    admitted: Optional[asyncio.Event] = None,
+    call_kind: str = CALL_ITINERARY
+):
+    """
+    One scheduled Gemini generate call (text, or a list of parts for
+    multimodal prompts), timed under ``call_kind``.
+
+    The call waits for admission from the shared scheduler (rate budget and
+    adaptive concurrency limit), but never past the deadline, then sets
+    ``admitted`` if given. Uses ``generate_content_async`` on the default
+    (gRPC) transport and falls back to the bounded Gemini executor for the
+    REST transport, which has no async client; there the slot is kept until
+    the thread is done, even when the wait is cut short.
+    """
+    queue_timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+    queued = time.monotonic()
+    async with gemini_scheduler.slot(priority, tokens, timeout=queue_timeout) as slot:
+        start = time.monotonic()
+        itinerary_stage_latency.observe(start - queued, stage="scheduler_wait")
+        if admitted is not None:
+            admitted.set()
+        if GEMINI_TRANSPORT == "rest":
+            call = _in_executor(slot, functools.partial(model.generate_content, prompt, request_options=_REST_OPTIONS))
+        else:
+            call = model.generate_content_async(prompt)
+        response = await asyncio.wait_for(call, GEMINI_CALL_TIMEOUT)
+        elapsed = time.monotonic() - start
+        gemini_call_latency.observe(elapsed, call=call_kind)
+        if call_kind == CALL_ITINERARY:
+            annotate_request(gemini_ms=round(elapsed * 1000, 2))
+    return response
+
+
+async def stream_itinerary(request: TripRequest, deadline: Optional[float] = None) -> AsyncIterator[dict]:
+    """
+    Generate an itinerary with Gemini's streaming mode and yield it as events.
+    
+    Yields a ``header`` event (destination, numDays, styleKeywords,
+    imageMoodSummary), then one ``day`` event per validated DayPlan as soon
+    as it is complete, then a final ``meta`` event carrying the status
+    (``success``, ``cached`` or ``fallback``). If Gemini fails part way, or
+    has not finished shortly before ``deadline`` (``time.monotonic()``), the
+    remaining days come from the fallback planner.
+    """
+    _log_request(request)
+    cache_key, cached = _lookup_cache(request)
+    if cached is not None:
+        logger.debug("Serving itinerary from cache")
+        annotate_request(path=PATH_CACHED)
+        for event in _itinerary_events(cached, STATUS_CACHED):
+            yield event
+        return
+    
+    parser = ItineraryStreamParser()
+    days: List[DayPlan] = []
+    header_sent = False
+    chunks = _stream_gemini_text(request, deadline)
+    try:
+        while True:
+            try:
+                if deadline is None:
+                    text = await chunks.__anext__()
+                else:
+                    text = await asyncio.wait_for(
+                        chunks.__anext__(), max(0.0, deadline - time.monotonic() - FALLBACK_RESERVE)
+                    )
+            except StopAsyncIteration:
+                break
+            completed = parser.feed(text)
+            header = parser.take_header()
+            if header is not None:
+                header_sent = True
+                yield {"type": "header", **header}
+            for day_data in completed:
+                day = DayPlan.model_validate(day_data)
+                days.append(day)
+                yield {"type": "day", "day": day.model_dump()}
+        document = parser.close()
+        document["days"] = days
+        itinerary = Itinerary.model_validate(document)
+    except asyncio.TimeoutError:
+        logger.warning("Deadline reached before Gemini finished streaming, using fallback implementation")
+        itinerary_fallbacks.inc(reason="deadline")
+        annotate_request(fallback_reason="deadline", path=PATH_DEADLINE_FALLBACK, streamed_days=len(days))
+        fallback = _timed_mock_itinerary(request)
+        for event in _itinerary_events(fallback, STATUS_FALLBACK, skip_header=header_sent, skip_days=len(days)):
+            yield event
+        return
+    except Exception as e:
+        fallback = _fallback_itinerary(request, e)
+        annotate_request(path=PATH_ERROR_FALLBACK, streamed_days=len(days))
+        for event in _itinerary_events(fallback, STATUS_FALLBACK, skip_header=header_sent, skip_days=len(days)):
+            yield event
+        return
+    finally:
+        await chunks.aclose()
+    
+    itinerary_cache.put(cache_key, itinerary)
+    annotate_request(path=PATH_PRIMARY, streamed_days=len(days))
+    yield {"type": "meta", "status": STATUS_SUCCESS, "meta": itinerary.meta.model_dump()}
+
+
+def _itinerary_events(itinerary: Itinerary, status: str, skip_header: bool = False, skip_days: int = 0):
+    """Yield an already built itinerary as stream events"""
+    if not skip_header:
+        yield {
+            "type": "header",
+            "destination": itinerary.destination,
+            "numDays": itinerary.numDays,
+            "styleKeywords": itinerary.styleKeywords,
+            "imageMoodSummary": itinerary.imageMoodSummary
+        }
+    for day in itinerary.days[skip_days:]:
+        yield {"type": "day", "day": day.model_dump()}
+    yield {"type": "meta", "status": status, "meta": itinerary.meta.model_dump()}
+
+
+async def _stream_gemini_text(request: TripRequest, deadline: Optional[float] = None) -> AsyncIterator[str]:
+    """
+    Yield text chunks from Gemini's streaming mode without blocking the event loop.
+
+    Waits for a scheduler slot no longer than ``deadline``; once admitted,
+    the whole stream gets at most GEMINI_CALL_TIMEOUT seconds, like a single
+    call.
+    """
+    model = _itinerary_model()
+    analysis = await _analyze_image(request, PRIORITY_INTERACTIVE, deadline)
+    prompt = _timed_prompt(request, analysis)
+    
+    queue_timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+    # The scheduler slot is held for the whole stream, but only the time to
+    # the first chunk counts against the latency target
+    async with gemini_scheduler.slot(PRIORITY_INTERACTIVE, _estimate_tokens(prompt, request), timeout=queue_timeout) as slot:
+        call_deadline = time.monotonic() + GEMINI_CALL_TIMEOUT
+        last = None
         try:
-            response = model.generate_content(prompt)
-            raw_text = response.text
-            print(f"📥 Received response from Gemini API")
-            print(f"📏 Response length: {len(raw_text)} characters")
-            
-            # Show first 500 characters of response for debugging
-            print(f"📄 First 500 chars of response: {raw_text[:500]}...")
-            
-            # Extract JSON from response (in case of extra text)
-            json_match = re.search(r'\{.*\}', raw_text, re.DOTALL)
-            if json_match:
-                json_text = json_match.group(0)
-                print("✅ Successfully extracted JSON from response")
+            if GEMINI_TRANSPORT == "rest":
+                response = await _before(call_deadline, _in_executor(
+                    slot, functools.partial(model.generate_content, prompt.text, stream=True, request_options=_REST_OPTIONS)
+                ))
+                chunks = iter(response)
+                while True:
+                    chunk = await _before(call_deadline, _in_executor(slot, functools.partial(next, chunks, None)))
+                    if chunk is None:
+                        break
+                    slot.first_response()
+                    last = chunk
+                    yield chunk.text
             else:
-                json_text = raw_text
-                print("⚠️ Could not extract JSON, using entire response")
-            
-            # Show first 500 characters of JSON for debugging
-            print(f"🔍 First 500 chars of JSON: {json_text[:500]}...")
-            
-            # Parse the JSON
-            itinerary_dict = json.loads(json_text)
-            print("✅ Successfully parsed JSON")
-            
-            # Fix timeOfDay values if needed
-            for day_data in itinerary_dict['days']:
-                for activity_data in day_data['activities']:
-                    if 'timeOfDay' in activity_data:
-                        time_of_day = activity_data['timeOfDay'].lower()
-                        if 'morning' in time_of_day:
-                            activity_data['timeOfDay'] = 'morning'
-                        elif 'evening' in time_of_day or 'night' in time_of_day:
-                            activity_data['timeOfDay'] = 'evening'
-                        else:
-                            # Default to afternoon for any other values (including "late afternoon")
-                            activity_data['timeOfDay'] = 'afternoon'
-        
-            # Convert to Itinerary object
-            # Handle nested objects
-            days = []
-            for day_data in itinerary_dict['days']:
-                activities = []
-                for activity_data in day_data['activities']:
-                    activity = Activity(**activity_data)
-                    activities.append(activity)
-                
-                day_plan = DayPlan(
-                    dayNumber=day_data['dayNumber'],
-                    date=day_data.get('date'),
-                    theme=day_data['theme'],
-                    summary=day_data['summary'],
-                    activities=activities
-                )
-                days.append(day_plan)
-            
-            meta = ItineraryMeta(**itinerary_dict['meta'])
-            
-            itinerary = Itinerary(
-                destination=itinerary_dict['destination'],
-                numDays=itinerary_dict['numDays'],
-                styleKeywords=itinerary_dict['styleKeywords'],
-                imageMoodSummary=itinerary_dict.get('imageMoodSummary'),
-                days=days,
-                meta=meta
-            )
-            
-            print("=" * 50)
-            print("✅ ITINERARY GENERATED SUCCESSFULLY")
-            print(f"🌍 Destination: {itinerary.destination}")
-            print(f"📅 Number of days: {itinerary.numDays}")
-            print(f"🏷️ Style keywords: {itinerary.styleKeywords}")
-            print("=" * 50)
-            
-            return itinerary
-            
-        except Exception as api_error:
-            print(f"❌ Gemini API call failed: {api_error}")
-            import traceback
-            traceback.print_exc()
-            raise RuntimeError(f"Gemini API call failed: {api_error}")
-            
-    except json.JSONDecodeError as e:
+                response = await _before(call_deadline, model.generate_content_async(prompt.text, stream=True))
+                chunks = response.__aiter__()
+                while True:
+                    try:
+                        last = await _before(call_deadline, chunks.__anext__())
+                    except StopAsyncIteration:
+                        break
+                    slot.first_response()
+                    yield last.text
+        except asyncio.TimeoutError as e:
+            # Not the caller's deadline: reported as a failed call
+            raise RuntimeError(f"Gemini stream did not finish within {GEMINI_CALL_TIMEOUT:g}s") from e
+        # Usage is reported on the final chunk
+        _record_usage(last, prompt)
+
+
+def _in_executor(slot: Slot, fn) -> asyncio.Future:
+    """
+    Run a blocking REST call on the Gemini executor. The thread cannot be
+    interrupted, so ``slot`` is held until it returns; the HTTP timeout in
+    ``_REST_OPTIONS`` bounds how long that can be.
+    """
+    return asyncio.wrap_future(slot.hold_until(gemini_executor.submit(fn)))
+
+
+async def _before(deadline: float, awaitable):
+    """Await ``awaitable``, raising asyncio.TimeoutError at ``deadline`` (``time.monotonic()``)"""
+    return await asyncio.wait_for(awaitable, max(0.0, deadline - time.monotonic()))
+
+
+def _estimate_tokens(prompt: RequestPrompt, request: TripRequest) -> int:
+    """Prompt + response token estimate for the TPM budget"""
+    return prompt.tokens + (request.days or 5) * 400
+
+
+def _itinerary_model():
+    """Shared model handle carrying the compiled system instruction (context-cached when enabled)"""
+    return gemini_registry.get_model(system_instruction=SYSTEM_INSTRUCTION)
+
+
+def _timed_prompt(request: TripRequest, analysis: Optional[MoodAnalysis] = None) -> RequestPrompt:
+    """Build the prompt, recording its build time and size"""
+    with Span(itinerary_stage_latency, stage="prompt"):
+        prompt = _build_prompt(request, analysis)
+    gemini_prompt_chars.observe(len(prompt.text))
+    if prompt.truncated:
+        prompt_truncations.inc()
+    annotate_request(prompt_chars=len(prompt.text), prompt_tokens_estimate=prompt.tokens, prompt_truncated=prompt.truncated)
+    return prompt
+
+
+def _record_usage(response, prompt: RequestPrompt) -> None:
+    """Record the prompt tokens Gemini reports, falling back to the local estimate"""
+    usage = getattr(response, "usage_metadata", None)
+    tokens = getattr(usage, "prompt_token_count", 0) or prompt.tokens
+    cached = getattr(usage, "cached_content_token_count", 0)
+    gemini_prompt_tokens.observe(tokens)
+    if cached:
+        gemini_cached_prompt_tokens.inc(cached)
+    annotate_request(prompt_tokens=tokens, cached_prompt_tokens=cached)
+
+
+def _log_request(request: TripRequest) -> None:
+    """Record the incoming trip request on the request's summary line"""
+    annotate_request(
+        days=request.days,
+        budget=request.budget_level,
+        tags=len(request.trip_tags),
+        image=bool(request.inspiration_image or request.inspiration_image_id),
+        description_chars=len(request.trip_description)
+    )
+    logger.debug("Starting itinerary generation", extra={"fields": {"description": request.trip_description[:200]}})
+
+
+def _build_prompt(request: TripRequest, analysis: Optional[MoodAnalysis] = None) -> RequestPrompt:
+    """Create the per-request prompt; the schema and rules are in the system instruction"""
+    return build_request_prompt(request, _image_hint(request, analysis))
+
+
+def _image_hint(request: TripRequest, analysis: Optional[MoodAnalysis]) -> str:
+    """The prompt's image line: the analysed mood and style cues when available"""
+    if analysis is not None:
+        if analysis.style_keywords:
+            return f"{analysis.summary} (style cues: {', '.join(analysis.style_keywords)}); reflect it in imageMoodSummary and the activities"
+        return f"{analysis.summary}; reflect it in imageMoodSummary and the activities"
+    if request.inspiration_image or request.inspiration_image_id:
+        return "Provided"
+    return "Not provided"
+
+
+def _parse_itinerary(raw_text: str) -> Itinerary:
+    """Extract, parse and validate the itinerary JSON from a Gemini response"""
+    gemini_response_chars.observe(len(raw_text))
+    annotate_request(response_chars=len(raw_text))
+    
+    # Dump a sample of raw responses for debugging
+    if should_sample_payload(logger):
+        logger.debug("Gemini response preview", extra={"fields": {"preview": raw_text[:500]}})
+    
+    with Span(itinerary_stage_latency, stage="parse") as span:
+        itinerary = _validate_itinerary_json(raw_text)
+    annotate_request(parse_ms=round(span.elapsed * 1000, 2), destination=itinerary.destination)
+    return itinerary
+
+
+def _validate_itinerary_json(raw_text: str) -> Itinerary:
+    """
+    Parse and validate the model output into an Itinerary in one call.
+    
+    The span from the first ``{`` to the last ``}`` goes straight through
+    pydantic-core's JSON mode. If that span is not valid JSON (e.g. trailing
+    text containing braces), fall back to decoding the first balanced object.
+    """
+    start = raw_text.find('{')
+    end = raw_text.rfind('}')
+    if 0 <= start < end:
+        try:
+            return Itinerary.model_validate_json(raw_text[start:end + 1])
+        except ValidationError as e:
+            if not any(error['type'] == 'json_invalid' for error in e.errors()):
+                raise
+    return Itinerary.model_validate(extract_itinerary_json(raw_text))
+
+
+def _fallback_itinerary(request: TripRequest, error: Exception) -> Itinerary:
+    """Log why Gemini failed and serve the mock itinerary instead"""
+    if isinstance(error, json.JSONDecodeError):
         # Fallback to mock implementation if JSON parsing fails
-        print(f"❌ JSON parsing failed: {e}. Using fallback implementation.")
+        logger.warning("JSON parsing failed, using fallback implementation", extra={"fields": {"error": str(error)}})
+        reason = "json"
+    elif is_quota_error(error):
+        # Upgrade the Gemini API plan or wait for quota reset if this persists
+        logger.warning("Gemini API quota exceeded, using fallback implementation")
+        reason = "quota"
+    else:
+        # Fallback to mock implementation for any other errors
+        logger.error("Gemini API call failed, using fallback implementation", exc_info=error)
+        reason = "error"
+    itinerary_fallbacks.inc(reason=reason)
+    annotate_request(fallback_reason=reason)
+    return _timed_mock_itinerary(request)
+
+
+def _timed_mock_itinerary(request: TripRequest) -> Itinerary:
+    with Span(itinerary_stage_latency, stage="fallback"):
         return _generate_mock_itinerary(request)
-    except Exception as e:
-        # Check if it's a quota exceeded error
-        error_str = str(e).lower()
-        if "quota" in error_str or "429" in error_str or "exceeded" in error_str:
-            print("❌ Gemini API quota exceeded. Using fallback implementation.")
-            print("💡 Solution: Upgrade your Gemini API plan or wait for quota reset.")
-            return _generate_mock_itinerary(request)
-        else:
-            # Fallback to mock implementation for any other errors
-            print(f"❌ Gemini API call failed: {e}. Using fallback implementation.")
-            import traceback
-            traceback.print_exc()
-            return _generate_mock_itinerary(request)
 
 
 def _generate_mock_itinerary(request: TripRequest) -> Itinerary:
@@ -230,18 +618,18 @@ def _generate_mock_itinerary(request: TripRequest) -> Itinerary:
     """
     # Use the destination from the request, or extract from description if not provided
     destination = request.destination if request.destination else _extract_destination(request.trip_description)
-    print(f"📍 Using destination: {destination}")
+    logger.debug("Using destination", extra={"fields": {"destination": destination}})
     
     # Determine number of days
     num_days = request.days or _estimate_days(request.trip_description)
     
-    # Determine style keywords from tags and description
-    style_keywords = _extract_style_keywords(request.trip_description, request.trip_tags)
+    # Determine style keywords from tags, description and the image's style cues
+    analysis = _stored_analysis(request)
+    tags = request.trip_tags + list(analysis.style_keywords) if analysis else request.trip_tags
+    style_keywords = _extract_style_keywords(request.trip_description, tags)
     
     # Generate image mood summary if image is provided
-    image_mood_summary = None
-    if request.inspiration_image:
-        image_mood_summary = _interpret_image_mood(request.inspiration_image)
+    image_mood_summary = analysis.summary if analysis else _image_mood(request)
     
     # Generate daily plans
     days = []
@@ -273,76 +661,9 @@ def _generate_mock_itinerary(request: TripRequest) -> Itinerary:
 
 
 def _extract_destination(description: str) -> str:
-    """Extract destination from trip description (improved implementation)"""
-    # More comprehensive list of destinations
-    destinations = [
-        "Paris", "Tokyo", "New York", "London", "Rome", "Barcelona", 
-        "Bangkok", "Dubai", "Sydney", "Bali", "Hawaii", "Swiss Alps",
-        "Amsterdam", "Prague", "Vienna", "Berlin", "Madrid", "Lisbon",
-        "Athens", "Istanbul", "Cairo", "Marrakech", "Cape Town", "Santorini",
-        "Buenos Aires", "Rio de Janeiro", "Mexico City", "Los Angeles",
-        "San Francisco", "Toronto", "Vancouver", "Seoul", "Singapore",
-        "Hong Kong", "Shanghai", "Beijing", "Moscow", "Stockholm",
-        "Oslo", "Helsinki", "Copenhagen", "Dublin", "Edinburgh", "Andhra Pradesh"
-    ]
-    
-    # Convert description to lowercase for case-insensitive matching
-    desc_lower = description.lower()
-    
-    # First try to find exact matches of destination names
-    for dest in destinations:
-        if dest.lower() in desc_lower:
-            print(f"📍 Found exact destination match: {dest}")
-            return dest
-    
-    # Try partial matching with common variations
-    destination_variations = {
-        "new york": ["new york", "nyc", "new york city"],
-        "los angeles": ["los angeles", "la", "l.a."],
-        "san francisco": ["san francisco", "sf", "sfo"],
-        "london": ["london", "england", "uk", "united kingdom"],
-        "paris": ["paris", "france"],
-        "tokyo": ["tokyo", "japan"],
-        "sydney": ["sydney", "australia"],
-        "rome": ["rome", "italy"],
-        "berlin": ["berlin", "germany"],
-        "madrid": ["madrid", "spain"]
-    }
-    
-    for dest, variations in destination_variations.items():
-        # Capitalize the destination name properly
-        proper_dest = dest.title()
-        if dest.lower() == "new york":
-            proper_dest = "New York"
-        elif dest.lower() == "san francisco":
-            proper_dest = "San Francisco"
-        elif dest.lower() == "los angeles":
-            proper_dest = "Los Angeles"
-        elif dest.lower() == "london":
-            proper_dest = "London"
-            
-        for variation in variations:
-            if variation in desc_lower:
-                print(f"📍 Found destination variation match: {proper_dest}")
-                return proper_dest
-    
-    # If still no match, try to extract potential destination words
-    # Look for capitalized words that might be cities/countries
-    words = description.split()
-    for word in words:
-        # Remove punctuation
-        clean_word = ''.join(c for c in word if c.isalpha())
-        # Check if it's a potential destination (starts with capital letter and length > 2)
-        if clean_word and clean_word[0].isupper() and len(clean_word) > 2:
-            # Check if it's in our destinations list (case insensitive)
-            for dest in destinations:
-                if dest.lower() == clean_word.lower():
-                    print(f"📍 Found capitalized word match: {dest}")
-                    return dest
-    
-    # Default to a more interesting destination than Paris
-    print("📍 No destination found, defaulting to Tokyo")
-    return "Tokyo"
+    """Extract destination from trip description with the precompiled destination index"""
+    info = destination_index.find(description)
+    return info.name if info else DEFAULT_DESTINATION
 
 
 def _estimate_days(description: str) -> int:
@@ -389,95 +710,151 @@ def _estimate_days(description: str) -> int:
 
 
 def _extract_style_keywords(description: str, tags: List[str]) -> List[str]:
-    """Extract style keywords from description and tags (improved implementation)"""
-    # Combine tags and description keywords
-    all_keywords = tags + description.lower().split()
-    
-    # Style keywords we're looking for
-    style_categories = {
-        "relaxing": ["relax", "relaxing", "chill", "peaceful", "serene", "calm", "spa", "beach"],
-        "adventure": ["adventure", "thrill", "exciting", "explore", "hiking", "trekking", "outdoor"],
-        "luxury": ["luxury", "luxurious", "expensive", "high-end", "premium", "five-star"],
-        "budget": ["budget", "cheap", "affordable", "low-cost", "economical"],
-        "family": ["family", "kids", "children", "parents"],
-        "romantic": ["romantic", "couple", "honeymoon", "love", "date"],
-        "cultural": ["cultural", "culture", "museum", "art", "heritage", "local"],
-        "historical": ["historical", "history", "ancient", "historic", "monument"],
-        "beach": ["beach", "coast", "ocean", "sea", "sand", "surf"],
-        "mountain": ["mountain", "hills", "peak", "summit", "alpine"],
-        "city": ["city", "urban", "metropolitan", "downtown"],
-        "nature": ["nature", "wildlife", "forest", "park", "natural"]
-    }
-    
-    found_keywords = []
-    
-    # Check each category
-    for category, keywords in style_categories.items():
-        # Check if any keyword from this category is in our input
-        for keyword in keywords:
-            if keyword in [k.lower() for k in all_keywords]:
-                # Capitalize properly
-                capitalized = category.capitalize()
-                if category == "relaxing":
-                    capitalized = "Relaxing"
-                elif category == "adventure":
-                    capitalized = "Adventure"
-                found_keywords.append(capitalized)
-                break  # Only add each category once
-    
-    # Ensure we have at least one keyword
-    if not found_keywords:
-        found_keywords.append("Cultural")
-    
-    return found_keywords[:3]  # Limit to 3 keywords
+    """Extract up to 3 style keywords from description and tags"""
+    return style_classifier.classify(description, tags, limit=3)
 
 
-def _interpret_image_mood(image_data: str) -> str:
-    """Interpret image mood from base64 image data (mock implementation)"""
+async def _analyze_image(
+    request: TripRequest,
+    priority: Union[int, SharedPriority],
+    deadline: Optional[float]
+) -> Optional[MoodAnalysis]:
+    """
+    Mood analysis of the request's stored inspiration image.
+
+    In order: the analysis recorded for this exact image; the analysis of a
+    visually similar image (perceptual hash within IMAGE_MOOD_MAX_DISTANCE
+    bits), so resized or recompressed copies reuse it; otherwise the
+    downscaled image goes to Gemini. Concurrent requests for the same
+    picture share one call. The call gets at most IMAGE_MOOD_TIMEOUT seconds;
+    after that, or on any failure, this returns None and the itinerary goes
+    ahead with the generic image hint. Nothing is recorded then, so a later
+    request tries again.
+    """
+    image = _stored_image(request)
+    if image is None:
+        return None
+    if image.analysis is not None:
+        image_mood_sources.inc(source="stored")
+        return image.analysis
+    
+    with Span(itinerary_stage_latency, stage="image_mood") as span:
+        image_hash = image.perceptual_hash
+        if image_hash is None:
+            # Stored before hashes were recorded
+            image_hash = await asyncio.to_thread(perceptual_hash_file, image.path)
+        analysis = mood_cache.get(image_hash)
+        source = "similar"
+        if analysis is None:
+            timeout = IMAGE_MOOD_TIMEOUT
+            if deadline is not None:
+                timeout = min(timeout, max(0.0, deadline - time.monotonic() - FALLBACK_RESERVE))
+            try:
+                analysis = await asyncio.wait_for(
+                    image_mood_flights.do(f"{image_hash:016x}", lambda: _analyze_with_gemini(image, image_hash, priority)),
+                    timeout
+                )
+                source = "gemini"
+            except Exception as e:
+                logger.warning("Image mood analysis failed, continuing without it", extra={"fields": {"error": str(e) or type(e).__name__}})
+                image_mood_sources.inc(source="fallback")
+                annotate_request(image_mood="fallback")
+                return None
+    image_store.set_analysis(image.digest, analysis, image_hash)
+    image_mood_sources.inc(source=source)
+    annotate_request(image_mood=source, image_mood_ms=round(span.elapsed * 1000, 2))
+    return analysis
+
+
+async def _analyze_with_gemini(image: StoredImage, image_hash: int, priority: Union[int, SharedPriority]) -> MoodAnalysis:
+    """Send the downscaled image to Gemini and cache the answer under its perceptual hash"""
+    model = gemini_registry.get_model()
+    data = await asyncio.to_thread(_read_file, image.path)
+    response = await _call_gemini(
+        model, [IMAGE_MOOD_PROMPT, {"mime_type": "image/jpeg", "data": data}], priority, IMAGE_MOOD_TOKENS, None,
+        call_kind=CALL_IMAGE_MOOD
+    )
+    analysis = parse_mood_response(response.text)
+    mood_cache.put(image_hash, analysis)
+    return analysis
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as image_file:
+        return image_file.read()
+
+
+def _stored_image(request: TripRequest) -> Optional[StoredImage]:
+    if not request.inspiration_image_id:
+        return None
+    image = image_store.get(request.inspiration_image_id)
+    if image is None:
+        logger.warning("Unknown inspiration image", extra={"fields": {"digest": request.inspiration_image_id}})
+    return image
+
+
+def _stored_analysis(request: TripRequest) -> Optional[MoodAnalysis]:
+    """The analysis recorded for the request's stored image, without calling Gemini"""
+    image = _stored_image(request)
+    return image.analysis if image is not None else None
+
+
+def _image_mood(request: TripRequest) -> Optional[str]:
+    """
+    Mock mood summary for an image that was not analysed (fallback planner).
+
+    Stored images are keyed by their digest; inline images (URLs, or base64
+    that was not moved into the store) by a hash of the string.
+    """
+    if request.inspiration_image_id:
+        return _interpret_image_mood(request.inspiration_image_id) if image_store.get(request.inspiration_image_id) else None
+    if request.inspiration_image:
+        return _interpret_image_mood(hashlib.sha256(request.inspiration_image.encode()).hexdigest())
+    return None
+
+
+# Mood descriptions, selected by image digest
+IMAGE_MOODS = (
+    "Vibrant and colorful atmosphere",
+    "Serene and peaceful setting",
+    "Urban and modern landscape",
+    "Natural and rustic environment",
+    "Luxurious and elegant ambiance",
+    "Adventurous and exotic locale"
+)
+
+
+def _interpret_image_mood(digest: str) -> str:
+    """Interpret image mood from the image's hex digest (mock implementation)"""
     # In a real implementation, this would use computer vision or AI
-    # For mocking, we'll generate a deterministic response based on image data
-    
-    # Hash the image data to get consistent results
-    hash_object = hashlib.md5(image_data.encode())
-    hex_dig = hash_object.hexdigest()
-    
-    # Map hash to mood descriptions
-    mood_descriptions = [
-        "Vibrant and colorful atmosphere",
-        "Serene and peaceful setting",
-        "Urban and modern landscape",
-        "Natural and rustic environment",
-        "Luxurious and elegant ambiance",
-        "Adventurous and exotic locale"
-    ]
-    
-    # Use first byte of hash to select mood
-    mood_index = int(hex_dig[:2], 16) % len(mood_descriptions)
-    return mood_descriptions[mood_index]
+    # For mocking, the first byte of the digest selects a deterministic mood
+    return IMAGE_MOODS[int(digest[:2], 16) % len(IMAGE_MOODS)]
+
+
+# Day themes and summaries, rotated through by day number
+DAY_THEMES = (
+    "Exploring the City",
+    "Cultural Immersion",
+    "Scenic Adventures",
+    "Local Experiences",
+    "Historical Journey",
+    "Gastronomic Delights"
+)
+DAY_SUMMARIES = (
+    "Discover the highlights of {destination} on day {day_number}",
+    "Immerse yourself in the local culture of {destination}",
+    "Experience the natural beauty surrounding {destination}",
+    "Taste the authentic flavors of {destination}",
+    "Uncover the history and heritage of {destination}"
+)
+
+TIME_SLOTS = ("morning", "afternoon", "evening")
 
 
 def _generate_day_plan(day_number: int, destination: str, tags: List[str]) -> DayPlan:
     """Generate a day plan for the itinerary"""
-    themes = [
-        "Exploring the City",
-        "Cultural Immersion",
-        "Scenic Adventures",
-        "Local Experiences",
-        "Historical Journey",
-        "Gastronomic Delights"
-    ]
-    
-    theme = themes[(day_number - 1) % len(themes)]
-    
-    summaries = [
-        f"Discover the highlights of {destination} on day {day_number}",
-        f"Immerse yourself in the local culture of {destination}",
-        f"Experience the natural beauty surrounding {destination}",
-        f"Taste the authentic flavors of {destination}",
-        f"Uncover the history and heritage of {destination}"
-    ]
-    
-    summary = summaries[(day_number - 1) % len(summaries)]
+    theme = DAY_THEMES[(day_number - 1) % len(DAY_THEMES)]
+    summary = DAY_SUMMARIES[(day_number - 1) % len(DAY_SUMMARIES)].format(destination=destination, day_number=day_number)
     
     # Generate activities based on tags and destination
     activities = _generate_activities(day_number, destination, tags)
@@ -491,173 +868,57 @@ def _generate_day_plan(day_number: int, destination: str, tags: List[str]) -> Da
 
 
 def _generate_activities(day_number: int, destination: str, tags: List[str]) -> List[Activity]:
-    """Generate activities for a day based on destination and tags"""
-    
-    # Specific activities for Indian destinations
-    if "Karnataka" in destination or "Andhra Pradesh" in destination:
-        if "Karnataka" in destination:
-            activities = [
-                Activity(
-                    timeOfDay="morning",
-                    title="Visit Mysore Palace",
-                    description="Explore the magnificent Mysore Palace, a symbol of the city's rich heritage.",
-                    location="Mysore Palace, Mysore",
-                    category="Historical Site",
-                    estimatedCost=50.0,
-                    bookingRequired=False,
-                    latitude=12.3051,
-                    longitude=76.6555
-                ),
-                Activity(
-                    timeOfDay="afternoon",
-                    title="Explore Coorg's Coffee Plantations",
-                    description="Take a guided tour of coffee plantations and learn about the coffee-making process.",
-                    location="Coorg Coffee Plantations",
-                    category="Nature & Adventure",
-                    estimatedCost=75.0,
-                    bookingRequired=True,
-                    latitude=12.3375,
-                    longitude=75.8019
-                ),
-                Activity(
-                    timeOfDay="evening",
-                    title="Stroll along Lalbagh Botanical Garden",
-                    description="Enjoy the beautiful gardens and glass house in this historic botanical garden.",
-                    location="Lalbagh Botanical Garden, Bangalore",
-                    category="Nature",
-                    estimatedCost=30.0,
-                    bookingRequired=False,
-                    latitude=12.9791,
-                    longitude=77.5704
-                )
-            ]
-        else:  # Andhra Pradesh
-            activities = [
-                Activity(
-                    timeOfDay="morning",
-                    title="Visit Araku Valley",
-                    description="Explore the scenic hill station with coffee plantations and tribal villages.",
-                    location="Araku Valley",
-                    category="Nature & Adventure",
-                    estimatedCost=80.0,
-                    bookingRequired=True,
-                    latitude=18.3991,
-                    longitude=83.3434
-                ),
-                Activity(
-                    timeOfDay="afternoon",
-                    title="Tour Amaravati Buddhist Stupa",
-                    description="Discover the ancient Buddhist stupa and archaeological museum.",
-                    location="Amaravati Buddhist Stupa",
-                    category="Historical Site",
-                    estimatedCost=40.0,
-                    bookingRequired=False,
-                    latitude=16.5333,
-                    longitude=80.3667
-                ),
-                Activity(
-                    timeOfDay="evening",
-                    title="Relax at Rushikonda Beach",
-                    description="Enjoy the sunset and water sports at this pristine beach in Visakhapatnam.",
-                    location="Rushikonda Beach, Visakhapatnam",
-                    category="Beach & Recreation",
-                    estimatedCost=25.0,
-                    bookingRequired=False,
-                    latitude=17.7667,
-                    longitude=83.3333
-                )
-            ]
+    """
+    Pick one activity per time slot for a day, rotating through the
+    destination's pre-built pools so every day gets a plan.
+    """
+    activities = []
+    for pool in _activity_pools(destination, tuple(tags)):
+        if pool:
+            activities.append(pool[(day_number - 1) % len(pool)])
+    return activities
+
+
+@functools.lru_cache(maxsize=1024)
+def _activity_pools(destination: str, tags: Tuple[str, ...]) -> Tuple[Tuple[Activity, ...], ...]:
+    """
+    Morning, afternoon and evening pools of Activity models for a
+    destination and tag set, built once and shared between requests and
+    days (Activity is frozen).
+    """
+    records = list(_catalog_records(destination))
+    for tag in tags:
+        records.extend(_catalog_records(destination, tag))
+    activities = [record.to_activity() for record in records]
+    return tuple(
+        tuple(activity for activity in activities if activity.timeOfDay == slot)
+        for slot in TIME_SLOTS
+    )
+
+
+@functools.lru_cache(maxsize=1024)
+def _catalog_records(destination: str, tag: str = "") -> Tuple[CatalogActivity, ...]:
+    """
+    Catalog activities for a destination (base activities, or those for
+    ``tag``) with templates filled in and placed at the destination.
+    Cached, so repeated fallbacks for a destination share the records.
+    """
+    # Catalog entries are keyed by canonical name ("Mysore, Karnataka" -> Karnataka)
+    info = destination_index.resolve(destination)
+    catalog_name = info.name if info else destination
+    if tag:
+        records = activity_catalog.tag_activities(catalog_name, tag)
     else:
-        # Base activities for all other trips
-        activities = [
-            Activity(
-                timeOfDay="morning",
-                title=f"Morning Exploration in {destination}",
-                description=f"Start your day with a guided tour of {destination}'s iconic landmarks.",
-                location=f"Downtown {destination}",
-                category="Sightseeing",
-                estimatedCost=0.0,
-                bookingRequired=False
-            ),
-            Activity(
-                timeOfDay="afternoon",
-                title="Local Cuisine Experience",
-                description=f"Enjoy a traditional meal at a renowned local restaurant.",
-                location=f"Local Restaurant in {destination}",
-                category="Food & Drink",
-                estimatedCost=25.0,
-                bookingRequired=True
-            ),
-            Activity(
-                timeOfDay="evening",
-                title="Evening Entertainment",
-                description="Experience the nightlife and entertainment options.",
-                location=f"{destination} Entertainment District",
-                category="Entertainment",
-                estimatedCost=30.0,
-                bookingRequired=False
-            )
+        records = activity_catalog.base_activities(catalog_name)
+    records = [record.for_destination(destination) for record in records]
+    if info:
+        records = [
+            record if record.latitude is not None else record._replace(latitude=info.latitude, longitude=info.longitude)
+            for record in records
         ]
-    
-    # Add tag-specific activities
-    tag_activities = []
-    
-    if "Adventure" in tags:
-        tag_activities.append(Activity(
-            timeOfDay="morning",
-            title="Adventure Activity",
-            description="Thrilling outdoor adventure experience.",
-            location=f"{destination} Adventure Park",
-            category="Adventure",
-            estimatedCost=75.0,
-            bookingRequired=True
-        ))
-    
-    if "Relaxing" in tags:
-        tag_activities.append(Activity(
-            timeOfDay="afternoon",
-            title="Spa & Wellness",
-            description="Relaxing spa treatment and wellness session.",
-            location=f"Luxury Spa in {destination}",
-            category="Wellness",
-            estimatedCost=120.0,
-            bookingRequired=True
-        ))
-    
-    if "Romantic" in tags:
-        tag_activities.append(Activity(
-            timeOfDay="evening",
-            title="Romantic Dinner",
-            description="Intimate dinner for two at a romantic venue.",
-            location=f"Romantic Restaurant in {destination}",
-            category="Dining",
-            estimatedCost=150.0,
-            bookingRequired=True
-        ))
-    
-    # Combine base and tag-specific activities
-    all_activities = activities + tag_activities
-    
-    # Return activities appropriate for this day
-    start_idx = (day_number - 1) * 2
-    end_idx = start_idx + 3
-    return all_activities[start_idx:end_idx]
+    return tuple(records)
 
 
 def _determine_currency(destination: str) -> str:
     """Determine currency based on destination"""
-    currency_map = {
-        "Paris": "EUR",
-        "Tokyo": "JPY",
-        "New York": "USD",
-        "London": "GBP",
-        "Rome": "EUR",
-        "Barcelona": "EUR",
-        "Bangkok": "THB",
-        "Dubai": "AED",
-        "Sydney": "AUD",
-        "Bali": "IDR",
-        "Hawaii": "USD"
-    }
-    
-    return currency_map.get(destination, "USD")
\ No newline at end of file
+    return destination_index.currency(destination)
@@ -0,0 +1,170 @@
+import re
+import string
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# Served when the description names no known destination
+DEFAULT_DESTINATION = "Tokyo"
+DEFAULT_CURRENCY = "USD"
+
+
+class DestinationInfo(NamedTuple):
+    """Static metadata for a destination the fallback planner knows about"""
+    name: str
+    currency: str
+    latitude: float
+    longitude: float
+    # Other names that resolve to this destination (countries, abbreviations)
+    aliases: Tuple[str, ...] = ()
+
+
+DESTINATIONS: Tuple[DestinationInfo, ...] = (
+    DestinationInfo("Paris", "EUR", 48.8566, 2.3522, ("france",)),
+    DestinationInfo("Tokyo", "JPY", 35.6762, 139.6503, ("japan",)),
+    DestinationInfo("New York", "USD", 40.7128, -74.0060, ("nyc", "new york city")),
+    DestinationInfo("London", "GBP", 51.5074, -0.1278, ("england", "uk", "united kingdom")),
+    DestinationInfo("Rome", "EUR", 41.9028, 12.4964, ("italy",)),
+    DestinationInfo("Barcelona", "EUR", 41.3874, 2.1686),
+    DestinationInfo("Bangkok", "THB", 13.7563, 100.5018),
+    DestinationInfo("Dubai", "AED", 25.2048, 55.2708),
+    DestinationInfo("Sydney", "AUD", -33.8688, 151.2093, ("australia",)),
+    DestinationInfo("Bali", "IDR", -8.3405, 115.0920),
+    DestinationInfo("Hawaii", "USD", 21.3069, -157.8583),
+    DestinationInfo("Swiss Alps", "CHF", 46.6863, 7.8632),
+    DestinationInfo("Amsterdam", "EUR", 52.3676, 4.9041),
+    DestinationInfo("Prague", "CZK", 50.0755, 14.4378),
+    DestinationInfo("Vienna", "EUR", 48.2082, 16.3738),
+    DestinationInfo("Berlin", "EUR", 52.5200, 13.4050, ("germany",)),
+    DestinationInfo("Madrid", "EUR", 40.4168, -3.7038, ("spain",)),
+    DestinationInfo("Lisbon", "EUR", 38.7223, -9.1393),
+    DestinationInfo("Athens", "EUR", 37.9838, 23.7275),
+    DestinationInfo("Istanbul", "TRY", 41.0082, 28.9784),
+    DestinationInfo("Cairo", "EGP", 30.0444, 31.2357),
+    DestinationInfo("Marrakech", "MAD", 31.6295, -7.9811),
+    DestinationInfo("Cape Town", "ZAR", -33.9249, 18.4241),
+    DestinationInfo("Santorini", "EUR", 36.3932, 25.4615),
+    DestinationInfo("Buenos Aires", "ARS", -34.6037, -58.3816),
+    DestinationInfo("Rio de Janeiro", "BRL", -22.9068, -43.1729),
+    DestinationInfo("Mexico City", "MXN", 19.4326, -99.1332),
+    DestinationInfo("Los Angeles", "USD", 34.0522, -118.2437, ("la", "l.a.")),
+    DestinationInfo("San Francisco", "USD", 37.7749, -122.4194, ("sf", "sfo")),
+    DestinationInfo("Toronto", "CAD", 43.6532, -79.3832),
+    DestinationInfo("Vancouver", "CAD", 49.2827, -123.1207),
+    DestinationInfo("Seoul", "KRW", 37.5665, 126.9780),
+    DestinationInfo("Singapore", "SGD", 1.3521, 103.8198),
+    DestinationInfo("Hong Kong", "HKD", 22.3193, 114.1694),
+    DestinationInfo("Shanghai", "CNY", 31.2304, 121.4737),
+    DestinationInfo("Beijing", "CNY", 39.9042, 116.4074),
+    DestinationInfo("Moscow", "RUB", 55.7558, 37.6173),
+    DestinationInfo("Stockholm", "SEK", 59.3293, 18.0686),
+    DestinationInfo("Oslo", "NOK", 59.9139, 10.7522),
+    DestinationInfo("Helsinki", "EUR", 60.1699, 24.9384),
+    DestinationInfo("Copenhagen", "DKK", 55.6761, 12.5683),
+    DestinationInfo("Dublin", "EUR", 53.3498, -6.2603),
+    DestinationInfo("Edinburgh", "GBP", 55.9533, -3.1883),
+    DestinationInfo("Andhra Pradesh", "INR", 16.5062, 80.6480),
+    DestinationInfo("Karnataka", "INR", 12.9716, 77.5946),
+)
+
+
+# Punctuation becomes whitespace before tokenizing ("Paris," "L.A." "new-york")
+_PUNCTUATION = str.maketrans({char: " " for char in string.punctuation})
+
+
+def _normalize(text: str) -> str:
+    return text.lower().translate(_PUNCTUATION)
+
+
+class DestinationIndex:
+    """
+    Case-insensitive lookup of destinations by name or alias, built once.
+
+    Every name and alias is normalized into words and indexed by its first
+    word. Finding the destination in a description normalizes and splits
+    the text once and intersects its words with the index, all in C. Only
+    the few candidates that come out of that are checked further
+    (remaining words of multi-word names, order of mention). Matches are
+    whole words, so "Romeo" does not match Rome and "relax" not LA.
+    """
+
+    def __init__(self, destinations: Iterable[DestinationInfo]):
+        self._by_name: Dict[str, DestinationInfo] = {}
+        # Normalized name or alias -> (destination, is_alias)
+        self._terms: Dict[str, Tuple[DestinationInfo, bool]] = {}
+        for info in destinations:
+            self._by_name[info.name.lower()] = info
+            self._terms[" ".join(_normalize(info.name).split())] = (info, False)
+        for info in self._by_name.values():
+            for alias in info.aliases:
+                self._terms.setdefault(" ".join(_normalize(alias).split()), (info, True))
+        # First word -> terms starting with it
+        self._first_words: Dict[str, List[str]] = {}
+        for term in self._terms:
+            self._first_words.setdefault(term.split(" ", 1)[0], []).append(term)
+        # Whole-word patterns, used only to confirm multi-word terms and order candidates
+        self._patterns = {
+            term: re.compile(r"(?<!\w)" + r"\s+".join(map(re.escape, term.split())) + r"(?!\w)")
+            for term in self._terms
+        }
+
+    def __len__(self) -> int:
+        return len(self._by_name)
+
+    def names(self) -> List[str]:
+        """Canonical destination names"""
+        return [info.name for info in self._by_name.values()]
+
+    def get(self, name: str) -> Optional[DestinationInfo]:
+        """
+        Look up a destination by its exact name or alias.
+
+        Args:
+            name: Name as typed by the user, any case or punctuation
+
+        Returns:
+            The destination, or None if unknown
+        """
+        term = self._terms.get(" ".join(_normalize(name).split()))
+        return term[0] if term else None
+
+    def find(self, text: str) -> Optional[DestinationInfo]:
+        """
+        Find the destination mentioned in free text.
+
+        Canonical names win over aliases ("Tokyo, Japan" and "Japan, Tokyo"
+        both give Tokyo); among several names, the first mention wins.
+
+        Args:
+            text: Trip description or destination field
+
+        Returns:
+            The destination, or None if nothing matched
+        """
+        normalized = _normalize(text)
+        first_words = self._first_words.keys() & normalized.split()
+        if not first_words:
+            return None
+        candidates = []
+        for word in first_words:
+            for term in self._first_words[word]:
+                if " " not in term or self._patterns[term].search(normalized):
+                    candidates.append(term)
+        if not candidates:
+            return None
+        names = [term for term in candidates if not self._terms[term][1]]
+        matched = names or candidates
+        if len(matched) > 1:
+            matched.sort(key=lambda term: self._patterns[term].search(normalized).start())
+        return self._terms[matched[0]][0]
+
+    def resolve(self, destination: str) -> Optional[DestinationInfo]:
+        """Match a destination field exactly first, then by the names it mentions ("Paris, France")"""
+        return self.get(destination) or self.find(destination)
+
+    def currency(self, destination: str) -> str:
+        """Local currency for a destination, ``USD`` when unknown"""
+        info = self.resolve(destination)
+        return info.currency if info else DEFAULT_CURRENCY
+
+
+# Built once at import and shared by every request
+destination_index = DestinationIndex(DESTINATIONS)
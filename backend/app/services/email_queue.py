@@ -0,0 +1,182 @@
+import os
+import time
+import random
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, NamedTuple, Optional
+from app.services.emailjs_service import deliver_otp_email, EmailDeliveryError
+from app.services.metrics import Histogram
+from app.services.logging_config import get_logger
+
+logger = get_logger("email_queue")
+
+# Concurrent EmailJS deliveries; also the size of the HTTP connection pool
+OTP_EMAIL_WORKERS = int(os.getenv("OTP_EMAIL_WORKERS", "4"))
+# Emails waiting for a worker; beyond this, request-otp answers 503
+OTP_EMAIL_QUEUE_SIZE = int(os.getenv("OTP_EMAIL_QUEUE_SIZE", "1000"))
+OTP_EMAIL_MAX_ATTEMPTS = int(os.getenv("OTP_EMAIL_MAX_ATTEMPTS", "4"))
+# First retry delay in seconds; doubles on every further attempt, with jitter
+OTP_EMAIL_RETRY_BASE = float(os.getenv("OTP_EMAIL_RETRY_BASE", "0.5"))
+
+otp_email_delivery_latency = Histogram(
+    "otp_email_delivery_seconds", "Time from enqueueing an OTP email to its final outcome, retries included", ("outcome",)
+)
+otp_email_attempt_latency = Histogram("otp_email_attempt_seconds", "Latency of single EmailJS send attempts")
+
+
+class EmailJob(NamedTuple):
+    email: str
+    otp: str
+    enqueued_at: float
+    attempt: int = 1
+
+
+class OtpEmailQueue:
+    """
+    Background delivery of OTP emails.
+
+    ``submit`` only puts the job on a bounded asyncio queue, so the request
+    handler returns as soon as the OTP is stored. A fixed number of worker
+    tasks take jobs off the queue and run the blocking EmailJS call on a
+    thread pool of the same size, over a shared keep-alive session.
+    Retryable failures are put back on the queue after an exponential
+    backoff with jitter, without holding a worker while they wait.
+
+    Args:
+        deliver: Blocking send function; raises ``EmailDeliveryError``
+        on_result: Called with ``(email, otp, delivered)`` once per job,
+            after the last attempt
+        workers: Concurrent deliveries
+        max_size: Queue capacity
+        max_attempts: Attempts per email, the first included
+        retry_base: Delay before the first retry, in seconds
+    """
+
+    def __init__(
+        self,
+        deliver: Callable[[str, str], None] = deliver_otp_email,
+        on_result: Optional[Callable[[str, str, bool], None]] = None,
+        workers: int = OTP_EMAIL_WORKERS,
+        max_size: int = OTP_EMAIL_QUEUE_SIZE,
+        max_attempts: int = OTP_EMAIL_MAX_ATTEMPTS,
+        retry_base: float = OTP_EMAIL_RETRY_BASE
+    ):
+        self.deliver = deliver
+        self.on_result = on_result
+        self.workers = max(1, workers)
+        self.max_size = max_size
+        self.max_attempts = max(1, max_attempts)
+        self.retry_base = retry_base
+        self.delivered = 0
+        self.failed = 0
+        self.retries = 0
+        self.dropped = 0
+        self.in_flight = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._waiting_retries = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    async def start(self) -> None:
+        """Start the worker tasks on the running loop"""
+        if self._tasks:
+            return
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="otp-email")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """Give queued emails up to ``timeout`` seconds to go out, then cancel the workers"""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("OTP emails still queued at shutdown", extra={"fields": {"queued": self._queue.qsize()}})
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._executor.shutdown(wait=False)
+
+    def submit(self, email: str, otp: str) -> bool:
+        """
+        Queue an OTP email without waiting for it to be sent.
+
+        Must be called on the event loop thread. Starts the workers on
+        first use if the application did not.
+
+        Returns:
+            False when the queue is full (the email is not sent)
+        """
+        if not self._tasks:
+            if self._queue is None:
+                self._queue = asyncio.Queue(maxsize=self.max_size)
+            asyncio.get_running_loop().create_task(self.start())
+        try:
+            self._queue.put_nowait(EmailJob(email, otp, time.monotonic()))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        return True
+
+    def stats(self) -> dict:
+        """Return queue depth and delivery counters"""
+        return {
+            "depth": self._queue.qsize() if self._queue is not None else 0,
+            "waiting_retries": self._waiting_retries,
+            "in_flight": self.in_flight,
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "retries": self.retries,
+            "dropped": self.dropped
+        }
+
+    async def _worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._queue.get()
+            self.in_flight += 1
+            try:
+                await self._attempt(loop, job)
+            except Exception:
+                logger.exception("OTP email worker error")
+            finally:
+                self.in_flight -= 1
+                self._queue.task_done()
+
+    async def _attempt(self, loop: asyncio.AbstractEventLoop, job: EmailJob) -> None:
+        start = time.monotonic()
+        try:
+            await loop.run_in_executor(self._executor, self.deliver, job.email, job.otp)
+        except EmailDeliveryError as e:
+            otp_email_attempt_latency.observe(time.monotonic() - start)
+            if e.retryable and job.attempt < self.max_attempts:
+                delay = self.retry_base * 2 ** (job.attempt - 1) * random.uniform(0.5, 1.0)
+                logger.info("OTP email failed, retrying", extra={"fields": {"attempt": job.attempt, "delay_s": round(delay, 2), "error": str(e)}})
+                self.retries += 1
+                self._waiting_retries += 1
+                loop.call_later(delay, self._requeue, job._replace(attempt=job.attempt + 1))
+                return
+            logger.warning("OTP email not delivered", extra={"fields": {"attempts": job.attempt, "error": str(e)}})
+            self.failed += 1
+            self._finish(job, delivered=False)
+            return
+        otp_email_attempt_latency.observe(time.monotonic() - start)
+        self.delivered += 1
+        self._finish(job, delivered=True)
+
+    def _requeue(self, job: EmailJob) -> None:
+        self._waiting_retries -= 1
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            self._finish(job, delivered=False)
+
+    def _finish(self, job: EmailJob, delivered: bool) -> None:
+        otp_email_delivery_latency.observe(time.monotonic() - job.enqueued_at, outcome="delivered" if delivered else "failed")
+        if self.on_result is not None:
+            self.on_result(job.email, job.otp, delivered)
+
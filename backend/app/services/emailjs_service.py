@@ -1,78 +1,113 @@
 import requests
 import os
-import json
-from typing import Dict
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from app.services.logging_config import get_logger
 
-EMAILJS_URL = "https://api.emailjs.com/api/v1.0/email/send"
+# The settings below are read at import
+load_dotenv()
 
-def send_otp_email(email: str, otp: str) -> bool:
+logger = get_logger("emailjs")
+
+EMAILJS_URL = os.getenv("EMAILJS_API_URL") or "https://api.emailjs.com/api/v1.0/email/send"
+EMAILJS_TIMEOUT = float(os.getenv("EMAILJS_TIMEOUT", "10"))
+
+# Read once; the OTP flow checks them on every request
+EMAILJS_SERVICE_ID = os.getenv("EMAILJS_SERVICE_ID")
+EMAILJS_PUBLIC_KEY = os.getenv("EMAILJS_PUBLIC_KEY")
+EMAILJS_TEMPLATE_ID = os.getenv("EMAILJS_TEMPLATE_ID")
+
+# Keep-alive connections to EmailJS, one per delivery worker
+_session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=1, pool_maxsize=int(os.getenv("OTP_EMAIL_WORKERS", "4")))
+_session.mount("https://", _adapter)
+_session.mount("http://", _adapter)
+
+
+class EmailDeliveryError(Exception):
     """
-    Send OTP to user's email address using EmailJS.
-    
-    Args:
-        email: Recipient's email address
-        otp: OTP to send
-        
-    Returns:
-        True if email was sent successfully, False otherwise
+    EmailJS did not accept the email.
+
+    ``retryable`` is True for timeouts, connection errors, 429 and 5xx
+    answers, False for rejections that a retry cannot fix.
     """
-    # Debug: Show all environment variables (first few chars only for security)
-    print("🔍 DEBUG: Environment Variables Check:")
-    for key in ["EMAILJS_SERVICE_ID", "EMAILJS_PUBLIC_KEY", "EMAILJS_TEMPLATE_ID"]:
-        value = os.getenv(key, "NOT_SET")
-        if value != "NOT_SET":
-            # Show only first 4 and last 4 characters for security
-            masked_value = value[:4] + "..." + value[-4:] if len(value) > 8 else "TOO_SHORT"
-            print(f"  {key}: {masked_value}")
-        else:
-            print(f"  {key}: NOT_SET")
-    
-    service_id = os.getenv("EMAILJS_SERVICE_ID")
-    public_key = os.getenv("EMAILJS_PUBLIC_KEY")
-    template_id = os.getenv("EMAILJS_TEMPLATE_ID")
-    
-    # Log configuration for debugging
-    print(f"EmailJS Configuration Check:")
-    print(f"  Service ID: {'SET' if service_id and service_id != 'your_service_id_here' else 'NOT SET or PLACEHOLDER'}")
-    print(f"  Public Key: {'SET' if public_key and public_key != 'your_public_key_here' else 'NOT SET or PLACEHOLDER'}")
-    print(f"  Template ID: {'SET' if template_id and template_id != 'your_template_id_here' else 'NOT SET or PLACEHOLDER'}")
-    
-    if not service_id or not public_key or not template_id:
-        print("ERROR: EmailJS environment variables are missing")
+
+    def __init__(self, message: str, retryable: bool):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+def _check_config() -> bool:
+    """Validate the EmailJS settings once at import"""
+    values = (EMAILJS_SERVICE_ID, EMAILJS_PUBLIC_KEY, EMAILJS_TEMPLATE_ID)
+    if not all(values):
+        logger.warning("EmailJS environment variables are missing, OTP emails are disabled (codes are only logged)")
         return False
-    
-    if service_id == "your_service_id_here" or public_key == "your_public_key_here" or template_id == "your_template_id_here":
-        print("ERROR: EmailJS environment variables still contain placeholder values")
+    if "your_service_id_here" in values or "your_public_key_here" in values or "your_template_id_here" in values:
+        logger.warning("EmailJS environment variables still contain placeholder values, OTP emails are disabled (codes are only logged)")
         return False
-    
     # Check for example values
-    if "example" in service_id or "example" in public_key or "example" in template_id:
-        print("ERROR: EmailJS environment variables still contain example values")
+    if any("example" in value for value in values):
+        logger.warning("EmailJS environment variables still contain example values, OTP emails are disabled (codes are only logged)")
         return False
-    
+    return True
+
+
+EMAILJS_CONFIGURED = _check_config()
+
+
+def deliver_otp_email(email: str, otp: str) -> None:
+    """
+    Send OTP to user's email address using EmailJS (blocking).
+
+    Args:
+        email: Recipient's email address
+        otp: OTP to send
+
+    Raises:
+        EmailDeliveryError: The email was not sent
+    """
+    if not EMAILJS_CONFIGURED:
+        raise EmailDeliveryError("EmailJS is not configured", retryable=False)
+
     payload = {
-        "service_id": service_id,
-        "template_id": template_id,
-        "user_id": public_key,
+        "service_id": EMAILJS_SERVICE_ID,
+        "template_id": EMAILJS_TEMPLATE_ID,
+        "user_id": EMAILJS_PUBLIC_KEY,
         "template_params": {
             "to_email": email,
             "otp_code": otp,
             "app_name": "Agentic Travel Planner"
         }
     }
-    
+
     try:
-        print(f"Sending OTP {otp} to {email} via EmailJS...")
-        response = requests.post(EMAILJS_URL, json=payload, timeout=10)
-        print(f"EmailJS Response Status: {response.status_code}")
-        print(f"EmailJS Response Text: {response.text}")
-        
-        if response.status_code == 200:
-            print(f"✅ OTP email sent successfully to {email}")
-            return True
-        else:
-            print(f"❌ Failed to send OTP email. Status code: {response.status_code}")
-            return False
-    except Exception as e:
-        print(f"❌ Exception while sending OTP email: {e}")
-        return False
\ No newline at end of file
+        response = _session.post(EMAILJS_URL, json=payload, timeout=EMAILJS_TIMEOUT)
+    except requests.RequestException as e:
+        raise EmailDeliveryError(f"EmailJS request failed: {e}", retryable=True) from e
+
+    if response.status_code != 200:
+        raise EmailDeliveryError(
+            f"EmailJS answered {response.status_code}: {response.text[:200]}",
+            retryable=response.status_code == 429 or response.status_code >= 500
+        )
+    logger.info("OTP email sent", extra={"fields": {"email": email}})
+
+
+def send_otp_email(email: str, otp: str) -> bool:
+    """
+    Send OTP to user's email address using EmailJS (blocking, single attempt).
+
+    Args:
+        email: Recipient's email address
+        otp: OTP to send
+
+    Returns:
+        True if email was sent successfully, False otherwise
+    """
+    try:
+        deliver_otp_email(email, otp)
+        return True
+    except EmailDeliveryError as e:
+        logger.error("Failed to send OTP email", extra={"fields": {"error": str(e)}})
+        return False
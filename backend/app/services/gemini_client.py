@@ -0,0 +1,269 @@
+import os
+import time
+import asyncio
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+from google.generativeai import caching
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+from app.services.logging_config import get_logger
+from app.services.metrics import Counter, Histogram, Span
+
+logger = get_logger("gemini_client")
+
+# Key validation / model list round trips, kept off the request path but still worth watching
+gemini_list_models_latency = Histogram("gemini_list_models_latency_seconds", "Latency of Gemini list_models (key validation and refresh)")
+gemini_list_models_failures = Counter("gemini_list_models_failures_total", "Failed Gemini list_models calls")
+
+# Bounded pool for blocking Gemini calls so they never run on the event loop
+GEMINI_MAX_WORKERS = int(os.getenv("GEMINI_MAX_WORKERS", "32"))
+gemini_executor = ThreadPoolExecutor(max_workers=GEMINI_MAX_WORKERS, thread_name_prefix="gemini")
+
+# Optional transport overrides (e.g. GEMINI_TRANSPORT=rest with a local fake server)
+GEMINI_TRANSPORT = os.getenv("GEMINI_TRANSPORT") or None
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT") or None
+
+# How often the background task refreshes the model list
+GEMINI_MODELS_TTL = float(os.getenv("GEMINI_MODELS_TTL", "3600"))
+# Longest wait between retries after a failed refresh (network errors; starts at 1s and doubles)
+GEMINI_MODELS_RETRY_MAX = float(os.getenv("GEMINI_MODELS_RETRY_MAX", "60"))
+
+# Store static system instructions with Gemini context caching. Gemini only
+# caches content above a model-specific minimum size; smaller instructions
+# are rejected and keep being sent with each call.
+GEMINI_CONTEXT_CACHE = os.getenv("GEMINI_CONTEXT_CACHE", "false").lower() == "true"
+GEMINI_CONTEXT_CACHE_TTL = float(os.getenv("GEMINI_CONTEXT_CACHE_TTL", "3600"))
+
+MODEL_NAME = "models/gemini-flash-latest"
+
+
+def get_api_key() -> str:
+    """
+    Read the Gemini API key and reject missing or placeholder values.
+    
+    Returns:
+        The configured API key
+    """
+    GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+    
+    if not GEMINI_API_KEY:
+        logger.error("GEMINI_API_KEY not set")
+        raise RuntimeError("GEMINI_API_KEY not set")
+    
+    if GEMINI_API_KEY.startswith("your_") or len(GEMINI_API_KEY) < 20:
+        logger.error("GEMINI_API_KEY still contains placeholder value or is too short")
+        raise RuntimeError("GEMINI_API_KEY not set (placeholder value detected)")
+    
+    return GEMINI_API_KEY
+
+
+class InvalidApiKey(RuntimeError):
+    """The API key is missing, a placeholder, or rejected by Gemini"""
+
+
+def is_auth_error(error: Exception) -> bool:
+    """Return True when Gemini rejected the credentials, as opposed to a transient failure"""
+    if isinstance(error, (InvalidApiKey, google_exceptions.Unauthenticated, google_exceptions.PermissionDenied)):
+        return True
+    # An unknown key is reported as 400 INVALID_ARGUMENT "API key not valid"
+    return isinstance(error, google_exceptions.InvalidArgument) and "api key" in str(error).lower()
+
+
+class GeminiRegistry:
+    """
+    Process-wide Gemini client and model registry.
+    
+    Configures the SDK and validates the API key once at startup, refreshes
+    the model list in the background every ``ttl`` seconds and hands out
+    pre-built ``GenerativeModel`` handles, so the request path never pays
+    for ``configure`` or a ``list_models`` round trip.
+
+    Only a rejected key disables ``get_model``. Other failures (network,
+    5xx) are retried with backoff from 1s up to ``GEMINI_MODELS_RETRY_MAX``,
+    and the models keep being served meanwhile.
+    """
+
+    def __init__(self, ttl: float = GEMINI_MODELS_TTL):
+        self.ttl = ttl
+        self.available_models: List[str] = []
+        self.last_refresh: float = 0.0
+        self.validation_error: Optional[str] = None
+        self._configured = False
+        self._models: Dict[Tuple[str, Optional[str]], genai.GenerativeModel] = {}
+        # (model, system instruction) -> model bound to the cached context, and when that expires
+        self._contexts: Dict[Tuple[str, str], Tuple[genai.GenerativeModel, caching.CachedContent, float]] = {}
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._context_tasks: List[asyncio.Task] = []
+
+    def configure(self) -> None:
+        """Configure the Gemini SDK once with the API key and transport overrides"""
+        if self._configured:
+            return
+        options = {}
+        if GEMINI_TRANSPORT:
+            options["transport"] = GEMINI_TRANSPORT
+        if GEMINI_API_ENDPOINT:
+            options["client_options"] = {"api_endpoint": GEMINI_API_ENDPOINT}
+        try:
+            api_key = get_api_key()
+        except RuntimeError as e:
+            raise InvalidApiKey(str(e)) from e
+        genai.configure(api_key=api_key, **options)
+        self._configured = True
+        logger.info("Gemini configured", extra={"fields": {"transport": GEMINI_TRANSPORT or "grpc"}})
+
+    def refresh_models(self) -> List[str]:
+        """List the available models (blocking); this is also the key validity check"""
+        self.configure()
+        try:
+            with Span(gemini_list_models_latency):
+                model_names = [m.name for m in genai.list_models()]
+        except Exception:
+            gemini_list_models_failures.inc()
+            raise
+        self.available_models = model_names
+        self.last_refresh = time.time()
+        self.validation_error = None
+        logger.info("Gemini model list refreshed", extra={"fields": {"models": len(model_names)}})
+        return model_names
+
+    async def start(self) -> None:
+        """Validate the key once and start the background refresh task"""
+        validated = await self._try_refresh()
+        self._refresh_task = asyncio.create_task(self._refresh_loop(validated))
+
+    async def stop(self) -> None:
+        """Cancel the background refresh tasks"""
+        for task in [self._refresh_task, *self._context_tasks]:
+            if task is None:
+                continue
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._refresh_task = None
+        self._context_tasks = []
+
+    async def cache_context(self, system_instruction: str, name: str = MODEL_NAME) -> bool:
+        """
+        Store a system instruction with Gemini context caching and keep it alive.
+
+        ``get_model`` then serves a model bound to the cached content, so
+        calls only send (and pay full price for) their per-request part.
+        Does nothing unless ``GEMINI_CONTEXT_CACHE`` is enabled.
+
+        Args:
+            system_instruction: Static instruction shared by every call
+            name: Fully qualified model name
+
+        Returns:
+            True when the context was cached
+        """
+        if not GEMINI_CONTEXT_CACHE or self.validation_error:
+            return False
+        loop = asyncio.get_running_loop()
+        cached = await loop.run_in_executor(gemini_executor, self._create_context, name, system_instruction)
+        self._context_tasks.append(asyncio.create_task(self._context_loop(name, system_instruction)))
+        return cached
+
+    def _create_context(self, name: str, system_instruction: str) -> bool:
+        """Create the cached content (blocking); False when Gemini refuses it"""
+        self.configure()
+        try:
+            cached = caching.CachedContent.create(
+                model=name, system_instruction=system_instruction, ttl=timedelta(seconds=GEMINI_CONTEXT_CACHE_TTL)
+            )
+        except Exception as e:
+            logger.warning(
+                "Gemini context caching unavailable, sending the system instruction with each call",
+                extra={"fields": {"model": name, "error": str(e)}}
+            )
+            return False
+        model = genai.GenerativeModel.from_cached_content(cached)
+        self._contexts[(name, system_instruction)] = (model, cached, time.time() + GEMINI_CONTEXT_CACHE_TTL)
+        logger.info("Gemini context cached", extra={"fields": {"model": name, "cache": cached.name}})
+        return True
+
+    def _renew_context(self, name: str, system_instruction: str) -> None:
+        """Extend the cached content's TTL, or create it again if it is gone (blocking)"""
+        context = self._contexts.get((name, system_instruction))
+        if context is not None:
+            model, cached, _ = context
+            try:
+                cached.update(ttl=timedelta(seconds=GEMINI_CONTEXT_CACHE_TTL))
+                self._contexts[(name, system_instruction)] = (model, cached, time.time() + GEMINI_CONTEXT_CACHE_TTL)
+                return
+            except Exception as e:
+                logger.warning("Gemini context cache renewal failed", extra={"fields": {"model": name, "error": str(e)}})
+                self._contexts.pop((name, system_instruction), None)
+        self._create_context(name, system_instruction)
+
+    async def _context_loop(self, name: str, system_instruction: str) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            # Renew well before expiry
+            await asyncio.sleep(GEMINI_CONTEXT_CACHE_TTL / 2)
+            await loop.run_in_executor(gemini_executor, self._renew_context, name, system_instruction)
+
+    async def _try_refresh(self) -> bool:
+        """
+        Refresh the model list, recording a rejected key in ``validation_error``.
+
+        Returns:
+            True on success; False on any failure, after which the last known
+            model list is kept
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(gemini_executor, self.refresh_models)
+            return True
+        except Exception as e:
+            if is_auth_error(e):
+                logger.error("Gemini API key validation failed", extra={"fields": {"error": str(e)}})
+                self.validation_error = str(e)
+            else:
+                logger.warning("Gemini model list refresh failed, retrying", extra={"fields": {"error": str(e)}})
+            return False
+
+    async def _refresh_loop(self, succeeded: bool) -> None:
+        retry_delay = 1.0
+        while True:
+            # A rejected key is not retried quickly: it needs an operator
+            if succeeded or self.validation_error:
+                retry_delay = 1.0
+                await asyncio.sleep(self.ttl)
+            else:
+                await asyncio.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, GEMINI_MODELS_RETRY_MAX)
+            succeeded = await self._try_refresh()
+
+    def get_model(self, name: str = MODEL_NAME, system_instruction: Optional[str] = None) -> genai.GenerativeModel:
+        """
+        Return a shared model handle, building it on first use.
+        
+        Args:
+            name: Fully qualified model name
+            system_instruction: Static instruction for every call; served
+                from Gemini's context cache when ``cache_context`` stored it
+            
+        Returns:
+            A ready ``GenerativeModel``
+        """
+        if self.validation_error:
+            raise InvalidApiKey(f"Invalid Gemini API key: {self.validation_error}")
+        if system_instruction is not None:
+            context = self._contexts.get((name, system_instruction))
+            if context is not None and context[2] > time.time():
+                return context[0]
+        model = self._models.get((name, system_instruction))
+        if model is None:
+            self.configure()
+            model = genai.GenerativeModel(name, system_instruction=system_instruction)
+            self._models[(name, system_instruction)] = model
+        return model
+
+
+# Shared registry, started by the FastAPI lifespan in main.py
+gemini_registry = GeminiRegistry()
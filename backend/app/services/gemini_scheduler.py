@@ -0,0 +1,342 @@
+import os
+import time
+import heapq
+import asyncio
+import functools
+import itertools
+import concurrent.futures
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, List, Optional, Union
+from google.api_core import exceptions as google_exceptions
+from app.services.metrics import StatsCollector
+
+# Quota budget for the Gemini project (requests and tokens per minute)
+GEMINI_RPM = float(os.getenv("GEMINI_RPM", "60"))
+GEMINI_TPM = float(os.getenv("GEMINI_TPM", "1000000"))
+
+# AIMD concurrency limit bounds
+GEMINI_CONCURRENCY_INITIAL = float(os.getenv("GEMINI_CONCURRENCY_INITIAL", "8"))
+GEMINI_CONCURRENCY_MIN = float(os.getenv("GEMINI_CONCURRENCY_MIN", "1"))
+GEMINI_CONCURRENCY_MAX = float(os.getenv("GEMINI_CONCURRENCY_MAX", "64"))
+
+# Calls slower than this shrink the concurrency limit
+GEMINI_LATENCY_TARGET = float(os.getenv("GEMINI_LATENCY_TARGET", "20"))
+
+# Seconds to stop sending after a 429 when the server gives no retry delay
+GEMINI_THROTTLE_COOLDOWN = float(os.getenv("GEMINI_THROTTLE_COOLDOWN", "10"))
+
+# How long a request may wait for capacity before it is served the fallback
+GEMINI_QUEUE_TIMEOUT = float(os.getenv("GEMINI_QUEUE_TIMEOUT", "30"))
+GEMINI_BATCH_QUEUE_TIMEOUT = float(os.getenv("GEMINI_BATCH_QUEUE_TIMEOUT", "600"))
+
+# Lower value is served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+
+
+class QuotaExceededError(RuntimeError):
+    """Raised when Gemini throttled a call or no capacity freed up in time"""
+
+
+def is_quota_error(error: Exception) -> bool:
+    """
+    Return True for 429 / quota exhausted errors from the Gemini SDK.
+
+    Classified by exception type or HTTP status only: messages such as
+    "504 Deadline Exceeded" must not halve the concurrency limit.
+    """
+    if isinstance(error, (QuotaExceededError, google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests)):
+        return True
+    status = getattr(error, "code", None)
+    if status is None:
+        status = getattr(error, "status_code", None)
+    return status == 429
+
+
+class SharedPriority:
+    """
+    Priority of work shared by several callers (single-flight): that of the
+    most urgent caller so far. Raising it moves the work's queued calls up.
+    """
+
+    def __init__(self, priority: int):
+        self.value = priority
+        self._listeners: List[Callable[[], None]] = []
+
+    def raise_to(self, priority: int) -> None:
+        """Lower the value (serve sooner) to ``priority`` if that is more urgent"""
+        if priority < self.value:
+            self.value = priority
+            for listener in list(self._listeners):
+                listener()
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at ``per_minute`` tokens per minute.
+    
+    The balance may go negative when a caller takes more than is available
+    (e.g. a request larger than the whole bucket); later callers then wait.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = per_minute
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` tokens (capped at capacity) are available"""
+        self._refill(now)
+        needed = min(amount, self.capacity)
+        if self.tokens >= needed:
+            return 0.0
+        return (needed - self.tokens) / self.rate
+
+    def take(self, amount: float, now: float) -> None:
+        self._refill(now)
+        self.tokens -= amount
+
+    def drain(self, now: float) -> None:
+        self._refill(now)
+        self.tokens = min(self.tokens, 0.0)
+
+
+class Slot:
+    """
+    An admitted call, yielded by ``GeminiScheduler.slot``.
+    
+    Work that cannot be cancelled, like a call on a thread pool, is
+    registered with ``hold_until``. If the ``async with`` block is left
+    (timeout, cancellation) while it still runs, the slot is only returned
+    once it finishes, so ``in_flight`` never undercounts the calls Gemini
+    is actually serving.
+    
+    Streamed calls mark their first chunk with ``first_response``; the
+    latency compared with the target then ends there, since a long answer
+    streaming normally is not a sign of overload.
+    """
+
+    def __init__(self):
+        self.first_response_at: Optional[float] = None
+        self._pending: List[concurrent.futures.Future] = []
+
+    def first_response(self) -> None:
+        """Record that the first part of a streamed answer arrived"""
+        if self.first_response_at is None:
+            self.first_response_at = time.monotonic()
+
+    def hold_until(self, future: concurrent.futures.Future) -> concurrent.futures.Future:
+        """Keep the slot until ``future`` is done; returns it"""
+        self._pending.append(future)
+        return future
+
+
+class GeminiScheduler:
+    """
+    Admission control in front of Gemini calls.
+    
+    Requests wait in a priority queue (interactive before batch, FIFO within
+    a priority) and are admitted only when the RPM/TPM token buckets have
+    budget and fewer calls are in flight than the AIMD limit. The limit grows
+    by one per limit-worth of successful calls, shrinks by 10% when calls
+    (for streams, their first chunk) exceed the latency target and halves
+    on a 429, which also pauses admission for the cooldown so queued calls
+    are not wasted on throttling.
+    """
+
+    def __init__(
+        self,
+        rpm: float = GEMINI_RPM,
+        tpm: float = GEMINI_TPM,
+        initial_limit: float = GEMINI_CONCURRENCY_INITIAL,
+        min_limit: float = GEMINI_CONCURRENCY_MIN,
+        max_limit: float = GEMINI_CONCURRENCY_MAX,
+        latency_target: float = GEMINI_LATENCY_TARGET
+    ):
+        self.limit = initial_limit
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.in_flight = 0
+        self.admitted = 0
+        self.throttled = 0
+        self.rejected = 0
+        # Slots whose caller gave up while their thread pool call still runs
+        self.held = 0
+        self._requests = TokenBucket(rpm)
+        self._tokens = TokenBucket(tpm)
+        self._blocked_until = 0.0
+        self._waiters: List[list] = []
+        self._sequence = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        priority: Union[int, SharedPriority] = PRIORITY_INTERACTIVE,
+        tokens: float = 0,
+        timeout: Optional[float] = None
+    ) -> AsyncIterator[Slot]:
+        """
+        Hold one admission slot around a Gemini call and feed back its outcome.
+        
+        Args:
+            priority: PRIORITY_INTERACTIVE or PRIORITY_BATCH, or a
+                SharedPriority whose raises re-queue the waiting call
+            tokens: Estimated prompt + response tokens for the call
+            timeout: Max seconds to wait in the queue, capped at the
+                default for the priority the call starts with
+            
+        Raises:
+            QuotaExceededError: If no capacity freed up within ``timeout``
+        """
+        initial = priority.value if isinstance(priority, SharedPriority) else priority
+        limit = GEMINI_QUEUE_TIMEOUT if initial == PRIORITY_INTERACTIVE else GEMINI_BATCH_QUEUE_TIMEOUT
+        if timeout is not None:
+            limit = min(limit, timeout)
+        await self._acquire(priority, tokens, limit)
+        slot = Slot()
+        start = time.monotonic()
+        try:
+            yield slot
+        except Exception as e:
+            self._release_after(slot, (slot.first_response_at or time.monotonic()) - start, is_quota_error(e))
+            raise
+        except BaseException:
+            self._release_after(slot, None, False)
+            raise
+        else:
+            self._release_after(slot, (slot.first_response_at or time.monotonic()) - start, False)
+
+    def stats(self) -> dict:
+        """Return the current limit, queue depth and counters"""
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "held": self.held,
+            "queued": self.queued(),
+            "admitted": self.admitted,
+            "throttled": self.throttled,
+            "rejected": self.rejected
+        }
+
+    def queued(self) -> int:
+        """Number of callers waiting for admission"""
+        return sum(1 for waiter in self._waiters if not waiter[2].done())
+
+    async def _acquire(self, priority: Union[int, SharedPriority], tokens: float, timeout: float) -> None:
+        future = asyncio.get_running_loop().create_future()
+        shared = priority if isinstance(priority, SharedPriority) else None
+        waiter = [shared.value if shared else priority, next(self._sequence), future, tokens]
+        heapq.heappush(self._waiters, waiter)
+        if shared is not None:
+            listener = functools.partial(self._reprioritize, waiter, shared)
+            shared._listeners.append(listener)
+        self._dispatch()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # Admitted just as we gave up; hand the slot back
+                self._release(None, False)
+            else:
+                future.cancel()
+            if isinstance(e, asyncio.TimeoutError):
+                self.rejected += 1
+                raise QuotaExceededError("Gemini quota exceeded: no capacity within the queue timeout")
+            raise
+        finally:
+            if shared is not None:
+                shared._listeners.remove(listener)
+
+    def _reprioritize(self, waiter: list, shared: SharedPriority) -> None:
+        """Move a still queued waiter to the shared work's new priority"""
+        if waiter[2].done() or waiter[0] <= shared.value:
+            return
+        waiter[0] = shared.value
+        heapq.heapify(self._waiters)
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Admit queued waiters in priority order while limit and budget allow"""
+        now = time.monotonic()
+        while self._waiters:
+            _, _, future, tokens = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            if self.in_flight >= max(1, int(self.limit)):
+                return
+            wait = max(
+                self._blocked_until - now,
+                self._requests.wait_time(1, now),
+                self._tokens.wait_time(tokens, now)
+            )
+            if wait > 0:
+                self._schedule(wait)
+                return
+            heapq.heappop(self._waiters)
+            self._requests.take(1, now)
+            self._tokens.take(tokens, now)
+            self.in_flight += 1
+            self.admitted += 1
+            future.set_result(None)
+
+    def _schedule(self, delay: float) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._dispatch()
+
+    def _release_after(self, slot: Slot, latency: Optional[float], throttled: bool) -> None:
+        """Release now, or once the slot's thread pool work has finished"""
+        running = [future for future in slot._pending if not future.done()]
+        if not running:
+            self._release(latency, throttled)
+            return
+        self.held += 1
+        loop = asyncio.get_running_loop()
+        remaining = len(running)
+        
+        def finished() -> None:
+            nonlocal remaining
+            remaining -= 1
+            if remaining == 0:
+                self.held -= 1
+                self._release(latency, throttled)
+        
+        for future in running:
+            # Runs on the worker thread (or right here if it just finished)
+            future.add_done_callback(lambda _: loop.call_soon_threadsafe(finished))
+
+    def _release(self, latency: Optional[float], throttled: bool) -> None:
+        """Return a slot and adjust the limit (AIMD) from the call's outcome"""
+        self.in_flight -= 1
+        if throttled:
+            self.throttled += 1
+            self.limit = max(self.min_limit, self.limit / 2)
+            now = time.monotonic()
+            self._blocked_until = max(self._blocked_until, now + GEMINI_THROTTLE_COOLDOWN)
+            self._requests.drain(now)
+        elif latency is not None:
+            if latency > self.latency_target:
+                self.limit = max(self.min_limit, self.limit * 0.9)
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        self._dispatch()
+
+
+# Shared scheduler for all Gemini generation calls in this worker
+gemini_scheduler = GeminiScheduler()
+StatsCollector(
+    "gemini_scheduler", "Gemini call scheduler", gemini_scheduler.stats,
+    counters=("admitted", "throttled", "rejected")
+)
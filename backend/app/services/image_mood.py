@@ -0,0 +1,185 @@
+"""
+Inspiration image mood analysis: perceptual hashing, the prompt and
+response format of the multimodal Gemini call, and a cache of analyses
+that near-duplicate images (resized, recompressed) share.
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+from PIL import Image
+from app.services.json_stream import extract_json_object
+from app.services.metrics import StatsCollector
+from app.services.single_flight import SingleFlight
+
+# Perceptual hashes this many bits apart (of 64) count as the same picture
+IMAGE_MOOD_MAX_DISTANCE = int(os.getenv("IMAGE_MOOD_MAX_DISTANCE", "6"))
+IMAGE_MOOD_CACHE_ENTRIES = int(os.getenv("IMAGE_MOOD_CACHE_ENTRIES", "10000"))
+# Seconds the mood call may take before the itinerary goes ahead without it
+IMAGE_MOOD_TIMEOUT = float(os.getenv("IMAGE_MOOD_TIMEOUT", "8"))
+
+HASH_BITS = 64
+# The hash is split into 16-bit bands for near-duplicate lookups (see MoodCache)
+_BANDS = 4
+_BAND_BITS = HASH_BITS // _BANDS
+_BAND_MASK = (1 << _BAND_BITS) - 1
+_BAND_FLIPS = tuple(1 << bit for bit in range(_BAND_BITS))
+
+# Roughly one image (258 tokens) plus the instructions and a short answer
+IMAGE_MOOD_TOKENS = 450
+
+IMAGE_MOOD_PROMPT = """
+You are helping a travel planner. Look at this inspiration photo and describe the travel mood it conveys.
+Respond ONLY with JSON of this form, without markdown:
+
+{"mood": "one short sentence, e.g. Serene and peaceful coastal setting", "styleKeywords": ["up to 3 single words, e.g. Relaxing, Beach, Romantic"]}
+"""
+
+
+class MoodAnalysis(NamedTuple):
+    """What an inspiration image says about the trip"""
+    summary: str
+    style_keywords: Tuple[str, ...] = ()
+
+
+def perceptual_hash(image: Image.Image) -> int:
+    """
+    64-bit difference hash (dHash) of an image.
+
+    The image is reduced to 9x8 grey pixels and each bit records whether a
+    pixel is brighter than its right neighbour. Resizing, recompression and
+    small colour changes flip few bits, so similar images have hashes a
+    small Hamming distance apart.
+    """
+    small = image.convert("L").resize((9, 8), Image.Resampling.BOX)
+    pixels = small.tobytes()
+    value = 0
+    for row in range(8):
+        offset = row * 9
+        for column in range(8):
+            value = (value << 1) | (pixels[offset + column] > pixels[offset + column + 1])
+    return value
+
+
+def perceptual_hash_file(path: str) -> int:
+    """``perceptual_hash`` of an image file"""
+    with Image.open(path) as image:
+        return perceptual_hash(image)
+
+
+def hash_distance(first: int, second: int) -> int:
+    """Number of differing bits between two perceptual hashes"""
+    return bin(first ^ second).count("1")
+
+
+def parse_mood_response(raw_text: str) -> MoodAnalysis:
+    """
+    Parse the model's answer to ``IMAGE_MOOD_PROMPT``.
+
+    Raises:
+        ValueError: No JSON object with a non-empty ``mood`` was found
+            (``json.JSONDecodeError`` is a ValueError)
+    """
+    data = extract_json_object(raw_text)
+    summary = str(data.get("mood") or "").strip()
+    if not summary:
+        raise ValueError("Mood response has no mood")
+    keywords = data.get("styleKeywords") or []
+    if not isinstance(keywords, list):
+        keywords = []
+    return MoodAnalysis(summary, tuple(str(keyword).strip().capitalize() for keyword in keywords if str(keyword).strip())[:3])
+
+
+class MoodCache:
+    """
+    LRU of mood analyses keyed by perceptual hash, with lookup by Hamming
+    distance.
+
+    Every hash is indexed under each of its four 16-bit bands. Two hashes
+    at most 7 bits apart differ in at most one bit in at least one band
+    (pigeonhole), so a lookup probes each of the query's bands and its 16
+    one-bit neighbours, 68 dictionary lookups, and only compares the query
+    with the few hashes filed there instead of scanning the whole cache.
+    """
+
+    def __init__(self, max_distance: int = IMAGE_MOOD_MAX_DISTANCE, max_entries: int = IMAGE_MOOD_CACHE_ENTRIES):
+        if max_distance >= 2 * _BANDS:
+            raise ValueError(f"max_distance must be below {2 * _BANDS}")
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[int, MoodAnalysis]" = OrderedDict()
+        self._bands: List[Dict[int, Set[int]]] = [{} for _ in range(_BANDS)]
+        self._lock = threading.Lock()
+
+    def get(self, image_hash: int) -> Optional[MoodAnalysis]:
+        """
+        Find the analysis of the same or a visually similar image.
+
+        Args:
+            image_hash: ``perceptual_hash`` of the image
+
+        Returns:
+            The analysis of the closest cached hash within the distance
+            limit, or None
+        """
+        with self._lock:
+            analysis = self._entries.get(image_hash)
+            if analysis is not None:
+                self._entries.move_to_end(image_hash)
+                self.exact_hits += 1
+                return analysis
+            best = None
+            best_distance = self.max_distance + 1
+            for band, key in enumerate(_band_keys(image_hash)):
+                buckets = self._bands[band]
+                for probe in (key, *(key ^ flip for flip in _BAND_FLIPS)):
+                    for candidate in buckets.get(probe, ()):
+                        distance = hash_distance(image_hash, candidate)
+                        if distance < best_distance:
+                            best, best_distance = candidate, distance
+            if best is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best)
+            self.similar_hits += 1
+            return self._entries[best]
+
+    def put(self, image_hash: int, analysis: MoodAnalysis) -> None:
+        """Cache an analysis, evicting the least recently used ones beyond ``max_entries``"""
+        with self._lock:
+            if image_hash not in self._entries:
+                for band, key in enumerate(_band_keys(image_hash)):
+                    self._bands[band].setdefault(key, set()).add(image_hash)
+            self._entries[image_hash] = analysis
+            self._entries.move_to_end(image_hash)
+            while len(self._entries) > self.max_entries:
+                oldest, _ = self._entries.popitem(last=False)
+                for band, key in enumerate(_band_keys(oldest)):
+                    members = self._bands[band][key]
+                    members.discard(oldest)
+                    if not members:
+                        del self._bands[band][key]
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and current size"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "exact_hits": self.exact_hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses
+            }
+
+
+def _band_keys(image_hash: int) -> List[int]:
+    return [(image_hash >> (band * _BAND_BITS)) & _BAND_MASK for band in range(_BANDS)]
+
+
+# Shared by every request; concurrent uploads of the same picture share one call
+mood_cache = MoodCache()
+StatsCollector("image_mood_cache", "Image mood analyses reused by perceptual hash", mood_cache.stats, counters=("exact_hits", "similar_hits", "misses"))
+image_mood_flights = SingleFlight()
+StatsCollector("image_mood_single_flight", "Coalesced image mood calls", image_mood_flights.stats, counters=("executions", "coalesced"))
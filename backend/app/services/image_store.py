@@ -0,0 +1,415 @@
+"""
+Content-addressed store for trip inspiration images.
+
+Uploads are hashed while they are read, so the digest of the original bytes
+is known as soon as the last chunk arrives. A digest that is already stored
+skips decoding, downscaling and mood inference entirely. New images are
+decoded with Pillow, downscaled to at most ``IMAGE_MAX_DIMENSION`` pixels on
+the long side and written as JPEG; only that small copy is used afterwards.
+
+Layout under ``IMAGE_STORE_DIR``:
+
+    <first two hex digits>/<sha256>.jpg    downscaled image
+    <first two hex digits>/<sha256>.json   size of the original, dimensions,
+                                           perceptual hash, mood analysis
+
+The directory is capped at ``IMAGE_STORE_MAX_BYTES``; the least recently
+used images are deleted beyond it.
+"""
+import os
+import json
+import time
+import base64
+import asyncio
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import AsyncIterable, BinaryIO, NamedTuple, Optional, Tuple
+from PIL import Image, ImageOps, UnidentifiedImageError
+from schemas import TripRequest
+from app.services.metrics import Counter, Histogram, StatsCollector
+from app.services.image_mood import MoodAnalysis, perceptual_hash
+from app.services.logging_config import get_logger, annotate_request
+
+logger = get_logger("image_store")
+
+IMAGE_STORE_DIR = os.getenv("IMAGE_STORE_DIR") or os.path.join(tempfile.gettempdir(), "travel-planner-images")
+IMAGE_MAX_UPLOAD_BYTES = int(os.getenv("IMAGE_MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+IMAGE_MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", "1024"))
+# Metadata of recently used images kept in memory
+IMAGE_STORE_MAX_ENTRIES = int(os.getenv("IMAGE_STORE_MAX_ENTRIES", "4096"))
+# Disk space for stored images; least recently used ones are deleted beyond it
+IMAGE_STORE_MAX_BYTES = int(os.getenv("IMAGE_STORE_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+# Uploads stay in memory up to this size, then spill to a temporary file
+SPOOL_BYTES = 1024 * 1024
+JPEG_QUALITY = 85
+
+image_uploads = Counter("image_uploads_total", "Inspiration images received, by outcome", ("outcome",))
+image_processing_latency = Histogram("image_processing_seconds", "Time to decode, downscale and store a new image")
+
+
+class ImageTooLarge(ValueError):
+    """The upload exceeds ``IMAGE_MAX_UPLOAD_BYTES``"""
+
+
+class InvalidImage(ValueError):
+    """The upload is not an image Pillow can decode"""
+
+
+class StoredImage(NamedTuple):
+    """A downscaled image in the store, addressed by the SHA-256 of the original"""
+    digest: str
+    path: str
+    width: int
+    height: int
+    source_bytes: int
+    perceptual_hash: Optional[int] = None
+    mood: Optional[str] = None
+    style_keywords: Tuple[str, ...] = ()
+
+    @property
+    def analysis(self) -> Optional[MoodAnalysis]:
+        """The recorded mood analysis, if the image was analysed"""
+        return MoodAnalysis(self.mood, self.style_keywords) if self.mood else None
+
+
+def is_image_digest(value: str) -> bool:
+    """True for a lower-case hex SHA-256 digest"""
+    return len(value) == 64 and all(char in "0123456789abcdef" for char in value)
+
+
+class ImageStore:
+    """
+    Downscaled inspiration images on disk, keyed by the SHA-256 of the
+    uploaded bytes, with an in-memory LRU of their metadata.
+
+    Uploads are spooled (to disk beyond ``SPOOL_BYTES``) while they are
+    hashed rather than buffered whole, Pillow's draft mode lets JPEGs
+    decode straight at a reduced scale, and the image is shrunk before any
+    other copy of it is made.
+
+    Disk use is bounded by ``max_bytes``. The files already on disk are
+    indexed (oldest modification first) on the first write; lookups move
+    an image to the back, and each write deletes images from the front
+    until the total fits. Every worker enforces the cap on the images it
+    has seen, so with several workers the directory can briefly exceed it.
+    """
+
+    def __init__(
+        self,
+        root: str = IMAGE_STORE_DIR,
+        max_dimension: int = IMAGE_MAX_DIMENSION,
+        max_upload_bytes: int = IMAGE_MAX_UPLOAD_BYTES,
+        max_entries: int = IMAGE_STORE_MAX_ENTRIES,
+        max_bytes: int = IMAGE_STORE_MAX_BYTES
+    ):
+        self.root = root
+        self.max_dimension = max_dimension
+        self.max_upload_bytes = max_upload_bytes
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.processed = 0
+        self.evicted = 0
+        self._entries: "OrderedDict[str, StoredImage]" = OrderedDict()
+        # digest -> bytes on disk (image + metadata), least recently used first
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+        self._scanned = False
+        self._lock = threading.Lock()
+
+    async def put_stream(self, chunks: AsyncIterable[bytes]) -> Tuple[StoredImage, bool]:
+        """
+        Store an image from a stream of byte chunks.
+
+        Args:
+            chunks: Request body or upload chunks
+
+        Returns:
+            The stored image and whether it was already in the store
+
+        Raises:
+            ImageTooLarge: The stream exceeds ``max_upload_bytes``
+            InvalidImage: The bytes are not a decodable image
+        """
+        hasher = hashlib.sha256()
+        size = 0
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+        try:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > self.max_upload_bytes:
+                    image_uploads.inc(outcome="too_large")
+                    raise ImageTooLarge(f"Image exceeds {self.max_upload_bytes} bytes")
+                hasher.update(chunk)
+                spool.write(chunk)
+            return await self._store(hasher.hexdigest(), spool, size)
+        finally:
+            spool.close()
+
+    async def put_base64(self, data: str) -> Tuple[StoredImage, bool]:
+        """
+        Store an image sent inline as base64 (optionally a ``data:`` URL).
+
+        Args:
+            data: Base64 text
+
+        Returns:
+            The stored image and whether it was already in the store
+
+        Raises:
+            ImageTooLarge: The decoded image exceeds ``max_upload_bytes``
+            InvalidImage: The text is not base64 or not a decodable image
+        """
+        if data.startswith("data:"):
+            data = data.partition(",")[2]
+        if len(data) * 3 // 4 > self.max_upload_bytes:
+            image_uploads.inc(outcome="too_large")
+            raise ImageTooLarge(f"Image exceeds {self.max_upload_bytes} bytes")
+        try:
+            raw = await asyncio.to_thread(base64.b64decode, data)
+        except ValueError as e:
+            image_uploads.inc(outcome="invalid")
+            raise InvalidImage("Inspiration image is not valid base64") from e
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+        try:
+            spool.write(raw)
+            digest = hashlib.sha256(raw).hexdigest()
+            size = len(raw)
+            del raw
+            return await self._store(digest, spool, size)
+        finally:
+            spool.close()
+
+    def get(self, digest: str) -> Optional[StoredImage]:
+        """
+        Look up a stored image.
+
+        Args:
+            digest: SHA-256 of the original upload
+
+        Returns:
+            The stored image, or None if it is unknown
+        """
+        with self._lock:
+            image = self._entries.get(digest)
+            if image is not None:
+                self._entries.move_to_end(digest)
+                if digest in self._disk:
+                    self._disk.move_to_end(digest)
+                self.hits += 1
+                return image
+        image = self._load(digest) if is_image_digest(digest) else None
+        with self._lock:
+            if image is None:
+                self.misses += 1
+                return None
+            if digest in self._disk:
+                self._disk.move_to_end(digest)
+            self.hits += 1
+        self._remember(image)
+        return image
+
+    def set_analysis(self, digest: str, analysis: MoodAnalysis, image_hash: Optional[int] = None) -> Optional[StoredImage]:
+        """Record the mood analysis so repeat uses of the image skip inference"""
+        image = self.get(digest)
+        if image is None:
+            return None
+        image = image._replace(
+            mood=analysis.summary,
+            style_keywords=tuple(analysis.style_keywords),
+            perceptual_hash=image.perceptual_hash if image_hash is None else image_hash
+        )
+        self._write_metadata(image)
+        self._remember(image)
+        return image
+
+    def stats(self) -> dict:
+        """Return lookup counters and the number of images held in memory"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "disk_bytes": self._disk_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "processed": self.processed,
+                "evicted": self.evicted
+            }
+
+    async def _store(self, digest: str, source: BinaryIO, size: int) -> Tuple[StoredImage, bool]:
+        annotate_request(image_bytes=size)
+        existing = self.get(digest)
+        if existing is not None:
+            image_uploads.inc(outcome="duplicate")
+            return existing, True
+        source.seek(0)
+        start = time.perf_counter()
+        image = await asyncio.to_thread(self._process, digest, source, size)
+        elapsed = time.perf_counter() - start
+        image_processing_latency.observe(elapsed)
+        annotate_request(image_processing_ms=round(elapsed * 1000, 2))
+        image_uploads.inc(outcome="stored")
+        return image, False
+
+    def _process(self, digest: str, source: BinaryIO, size: int) -> StoredImage:
+        """Decode, downscale and write a new image (runs in a worker thread)"""
+        bounds = (self.max_dimension, self.max_dimension)
+        try:
+            with Image.open(source) as original:
+                # JPEGs decode directly at 1/2, 1/4 or 1/8 scale
+                original.draft("RGB", bounds)
+                # Shrink before rotating, so no full-size copy is ever made
+                original.thumbnail(bounds)
+                picture = ImageOps.exif_transpose(original)
+                if picture.mode != "RGB":
+                    picture = picture.convert("RGB")
+        except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+            image_uploads.inc(outcome="invalid")
+            raise InvalidImage("Inspiration image could not be decoded") from e
+
+        path = self._path(digest, ".jpg")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write under a temporary name so concurrent readers never see a partial file
+        partial = f"{path}.{threading.get_ident()}.tmp"
+        picture.save(partial, "JPEG", quality=JPEG_QUALITY)
+        os.replace(partial, path)
+
+        image = StoredImage(digest, path, picture.width, picture.height, size, perceptual_hash(picture))
+        self._write_metadata(image)
+        self._remember(image)
+        with self._lock:
+            self.processed += 1
+        self._account(digest, os.path.getsize(path) + os.path.getsize(self._path(digest, ".json")))
+        logger.debug("Stored inspiration image", extra={"fields": {"digest": digest, "bytes": size, "width": image.width, "height": image.height}})
+        return image
+
+    def _load(self, digest: str) -> Optional[StoredImage]:
+        """Read an image's metadata from disk (after a restart or LRU eviction)"""
+        path = self._path(digest, ".jpg")
+        try:
+            with open(self._path(digest, ".json")) as metadata_file:
+                metadata = json.load(metadata_file)
+        except (OSError, ValueError):
+            return None
+        if not os.path.exists(path):
+            return None
+        return StoredImage(
+            digest, path, metadata["width"], metadata["height"], metadata["source_bytes"],
+            metadata.get("perceptual_hash"), metadata.get("mood"), tuple(metadata.get("style_keywords", ()))
+        )
+
+    def _write_metadata(self, image: StoredImage) -> None:
+        path = self._path(image.digest, ".json")
+        partial = f"{path}.{threading.get_ident()}.tmp"
+        with open(partial, "w") as metadata_file:
+            json.dump({
+                "width": image.width,
+                "height": image.height,
+                "source_bytes": image.source_bytes,
+                "perceptual_hash": image.perceptual_hash,
+                "mood": image.mood,
+                "style_keywords": list(image.style_keywords)
+            }, metadata_file)
+        os.replace(partial, path)
+
+    def _account(self, digest: str, size: int) -> None:
+        """Record a newly written image and delete the least recently used ones beyond ``max_bytes``"""
+        self._scan()
+        with self._lock:
+            self._disk_bytes += size - self._disk.pop(digest, 0)
+            self._disk[digest] = size
+            victims = []
+            # Never the image just written, even if it alone exceeds the cap
+            while self._disk_bytes > self.max_bytes and len(self._disk) > 1:
+                victim, victim_size = self._disk.popitem(last=False)
+                self._disk_bytes -= victim_size
+                self._entries.pop(victim, None)
+                self.evicted += 1
+                victims.append(victim)
+        for victim in victims:
+            for suffix in (".jpg", ".json"):
+                try:
+                    os.remove(self._path(victim, suffix))
+                except FileNotFoundError:
+                    pass
+        if victims:
+            logger.info("Evicted inspiration images", extra={"fields": {"images": len(victims), "disk_bytes": self._disk_bytes}})
+
+    def _scan(self) -> None:
+        """Index the images already on disk, oldest first (once, on the first write)"""
+        if self._scanned:
+            return
+        found = []
+        try:
+            with os.scandir(self.root) as prefixes:
+                for prefix in prefixes:
+                    if not prefix.is_dir():
+                        continue
+                    with os.scandir(prefix.path) as files:
+                        for entry in files:
+                            digest, _, suffix = entry.name.partition(".")
+                            if suffix in ("jpg", "json") and is_image_digest(digest):
+                                stat = entry.stat()
+                                found.append((stat.st_mtime, digest, stat.st_size))
+        except FileNotFoundError:
+            pass
+        found.sort()
+        with self._lock:
+            if self._scanned:
+                return
+            for _, digest, size in found:
+                if digest not in self._disk:
+                    self._disk[digest] = 0
+                self._disk[digest] += size
+                self._disk_bytes += size
+            self._scanned = True
+
+    def _remember(self, image: StoredImage) -> None:
+        with self._lock:
+            self._entries[image.digest] = image
+            self._entries.move_to_end(image.digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _path(self, digest: str, suffix: str) -> str:
+        return os.path.join(self.root, digest[:2], digest + suffix)
+
+
+def has_inline_image(request: TripRequest) -> bool:
+    """True when ``store_inline_image`` would write the request's image to the store"""
+    data = request.inspiration_image
+    return bool(data) and not request.inspiration_image_id and not data.startswith(("http://", "https://"))
+
+
+async def store_inline_image(request: TripRequest) -> TripRequest:
+    """
+    Move a base64 ``inspiration_image`` into the store.
+
+    Returns a copy of the request that refers to the image by digest
+    instead, so the large string is released before planning and the
+    cache key no longer has to hash it. URLs, requests without an inline
+    image and inline values that do not decode as an image are returned
+    unchanged, as they were accepted before the store existed.
+
+    Raises:
+        ImageTooLarge: The decoded image exceeds the upload limit
+    """
+    if not has_inline_image(request):
+        return request
+    try:
+        image, _ = await image_store.put_base64(request.inspiration_image)
+    except InvalidImage as e:
+        logger.warning("Inline inspiration image not decodable, passing it through", extra={"fields": {"error": str(e)}})
+        return request
+    return request.model_copy(update={"inspiration_image": None, "inspiration_image_id": image.digest})
+
+
+# Shared store for uploads and the planner
+image_store = ImageStore()
+StatsCollector(
+    "image_store", "Inspiration image store lookups and disk use", image_store.stats,
+    counters=("hits", "misses", "processed", "evicted")
+)
@@ -0,0 +1,151 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+from schemas import TripRequest, Itinerary
+from app.services.metrics import StatsCollector
+
+ITINERARY_CACHE_MAX_ENTRIES = int(os.getenv("ITINERARY_CACHE_MAX_ENTRIES", "1024"))
+ITINERARY_CACHE_MAX_BYTES = int(os.getenv("ITINERARY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+ITINERARY_CACHE_TTL = float(os.getenv("ITINERARY_CACHE_TTL", "3600"))
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = ".,;:!?"
+
+
+def _normalize_text(value: Optional[str]) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation"""
+    if not value:
+        return ""
+    return _WHITESPACE.sub(" ", value).strip().lower().rstrip(_TRAILING_PUNCTUATION).strip()
+
+
+def request_cache_key(request: TripRequest) -> str:
+    """
+    Build the canonical cache key for a trip request.
+    
+    Requests that only differ in case, whitespace, trailing punctuation or
+    tag order map to the same key. The start date is part of the key because
+    the generated days carry dates.
+    
+    Args:
+        request: Incoming trip request
+        
+    Returns:
+        Hex digest identifying the request
+    """
+    # Stored images are already content-addressed
+    image_hash = request.inspiration_image_id
+    if image_hash is None and request.inspiration_image:
+        image_hash = hashlib.sha256(request.inspiration_image.encode()).hexdigest()
+    
+    canonical = [
+        _normalize_text(request.destination),
+        request.days,
+        _normalize_text(request.budget_level),
+        sorted({_normalize_text(tag) for tag in request.trip_tags}),
+        _normalize_text(request.trip_description),
+        (request.start_date or "").strip(),
+        image_hash
+    ]
+    return hashlib.sha256(json.dumps(canonical, separators=(",", ":")).encode()).hexdigest()
+
+
+class ItineraryCache:
+    """
+    In-memory LRU + TTL cache of generated itineraries.
+    
+    Memory is bounded both by entry count and by the serialized size of the
+    cached itineraries. Cached objects are shared between requests and must
+    not be mutated by callers.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = ITINERARY_CACHE_MAX_ENTRIES,
+        max_bytes: int = ITINERARY_CACHE_MAX_BYTES,
+        ttl: float = ITINERARY_CACHE_TTL
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.current_bytes = 0
+        self._entries: "OrderedDict[str, Tuple[Itinerary, float, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Itinerary]:
+        """
+        Look up a cached itinerary.
+        
+        Args:
+            key: Key from ``request_cache_key``
+            
+        Returns:
+            The cached itinerary, or None on a miss or expired entry
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            itinerary, expires_at, size = entry
+            if time.monotonic() > expires_at:
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return itinerary
+
+    def put(self, key: str, itinerary: Itinerary) -> None:
+        """
+        Store an itinerary, evicting least recently used entries as needed.
+        
+        Args:
+            key: Key from ``request_cache_key``
+            itinerary: Generated itinerary to cache
+        """
+        size = len(itinerary.model_dump_json())
+        if size > self.max_bytes or self.max_entries <= 0:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (itinerary, time.monotonic() + self.ttl, size)
+            self.current_bytes += size
+            while len(self._entries) > self.max_entries or self.current_bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and current size"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+    def _remove(self, key: str) -> None:
+        _, _, size = self._entries.pop(key)
+        self.current_bytes -= size
+
+
+# Shared cache for the planner
+itinerary_cache = ItineraryCache()
+StatsCollector("itinerary_cache", "Itinerary response cache", itinerary_cache.stats, counters=("hits", "misses", "evictions"))
@@ -0,0 +1,202 @@
+import re
+import json
+from typing import List, Optional
+
+# Characters that change scanner state outside and inside JSON strings
+_STRUCTURAL = re.compile(r'[{}\[\]"]')
+_STRING_SPECIAL = re.compile(r'["\\]')
+
+
+_decoder = json.JSONDecoder()
+
+
+def extract_json_object(raw_text: str) -> dict:
+    """
+    Parse the first JSON object in a model response in a single scan.
+    
+    Skips any preamble or code fence before the first ``{`` and decodes in
+    place with ``raw_decode``, which stops at the end of that object, so the
+    text is never copied or re-scanned, and trailing text (even with braces)
+    is ignored.
+    
+    Args:
+        raw_text: Full model response
+        
+    Returns:
+        The decoded object
+        
+    Raises:
+        json.JSONDecodeError: If no valid JSON object is found
+    """
+    start = raw_text.find('{')
+    if start < 0:
+        raise json.JSONDecodeError("No JSON object in model response", raw_text, 0)
+    obj, _ = _decoder.raw_decode(raw_text, start)
+    return obj
+
+
+def extract_itinerary_json(raw_text: str) -> dict:
+    """
+    Parse the itinerary object in a Gemini response (see ``extract_json_object``).
+    
+    ``timeOfDay`` values are normalized later by the ``Activity`` schema.
+    
+    Raises:
+        json.JSONDecodeError: If no valid JSON object is found
+    """
+    return extract_json_object(raw_text)
+
+
+class ItineraryStreamParser:
+    """
+    Incremental parser for an itinerary JSON document arriving in chunks.
+    
+    Text before the first ``{`` (code fences, preamble) is skipped. Each
+    object in the top-level ``days`` array is returned from ``feed`` as soon
+    as its closing brace arrives, and its text is then discarded, so only
+    one day plus the small document skeleton is buffered at any time.
+    """
+
+    def __init__(self):
+        self.header: Optional[dict] = None
+        self._skeleton: List[str] = []
+        self._day: List[str] = []
+        self._key: List[str] = []
+        self._last_key: Optional[str] = None
+        self._depth = 0
+        self._started = False
+        self._done = False
+        self._in_string = False
+        self._in_key = False
+        self._escape = False
+        self._in_days = False
+        self._in_day = False
+        self._new_header = False
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    def feed(self, chunk: str) -> List[dict]:
+        """
+        Consume the next chunk of model output.
+        
+        Args:
+            chunk: Next piece of streamed text
+            
+        Returns:
+            Day objects completed by this chunk, in order
+        """
+        completed: List[dict] = []
+        pos = 0
+        length = len(chunk)
+        while pos < length and not self._done:
+            if not self._started:
+                pos = chunk.find("{", pos)
+                if pos < 0:
+                    break
+                self._started = True
+            
+            if self._in_string:
+                if self._escape:
+                    self._write(chunk[pos])
+                    self._escape = False
+                    pos += 1
+                    continue
+                match = _STRING_SPECIAL.search(chunk, pos)
+                if match is None:
+                    self._write(chunk[pos:])
+                    break
+                index = match.start()
+                self._write(chunk[pos:index + 1])
+                if chunk[index] == "\\":
+                    self._escape = True
+                else:
+                    self._in_string = False
+                    if self._in_key:
+                        # Drop the closing quote captured with the key text
+                        self._last_key = "".join(self._key)[:-1]
+                        self._in_key = False
+                pos = index + 1
+                continue
+            
+            match = _STRUCTURAL.search(chunk, pos)
+            if match is None:
+                self._write(chunk[pos:])
+                break
+            index = match.start()
+            self._write(chunk[pos:index])
+            pos = index + 1
+            char = chunk[index]
+            
+            if char == '"':
+                self._write(char)
+                self._in_string = True
+                if self._depth == 1:
+                    self._in_key = True
+                    self._key = []
+            elif char in "{[":
+                if self._in_days and not self._in_day and char == "{":
+                    self._in_day = True
+                    self._day = []
+                    self._write(char)
+                elif self._depth == 1 and char == "[" and self._last_key == "days":
+                    self._write(char)
+                    self._in_days = True
+                    self._capture_header()
+                else:
+                    self._write(char)
+                self._depth += 1
+            else:
+                self._depth -= 1
+                self._write(char)
+                if self._in_day and self._depth == 2:
+                    completed.append(_decoder.decode("".join(self._day)))
+                    self._in_day = False
+                    self._day = []
+                elif self._in_days and self._depth == 1:
+                    self._in_days = False
+                elif self._depth == 0:
+                    self._done = True
+        return completed
+
+    def take_header(self) -> Optional[dict]:
+        """Return the document fields that precede ``days`` once, when first available"""
+        if not self._new_header:
+            return None
+        self._new_header = False
+        return self.header
+
+    def close(self) -> dict:
+        """
+        Finish parsing and return the document without its days.
+        
+        Raises:
+            ValueError: If the stream ended before the top-level object closed
+        """
+        if not self._done:
+            raise ValueError("Incomplete JSON document in model stream")
+        return _decoder.decode("".join(self._skeleton))
+
+    def _write(self, text: str) -> None:
+        """Route scanned text to the current day buffer or the skeleton"""
+        if not text:
+            return
+        if self._in_day:
+            self._day.append(text)
+        elif self._in_days:
+            # Separators between days are not needed in the skeleton
+            if text == "]":
+                self._skeleton.append(text)
+        else:
+            self._skeleton.append(text)
+            if self._in_key:
+                self._key.append(text)
+
+    def _capture_header(self) -> None:
+        try:
+            self.header = json.loads("".join(self._skeleton) + "]}")
+            self.header.pop("days", None)
+            self._new_header = True
+        except ValueError:
+            self.header = None
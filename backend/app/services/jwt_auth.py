@@ -0,0 +1,175 @@
+"""
+Access tokens: signing keys loaded once at import, issuing, and
+verification with a cache of already verified tokens.
+
+Keys rotate through ``JWT_KEYS`` (``kid:secret`` pairs). New tokens are
+signed with the first key and carry its ``kid`` header; tokens signed
+with any listed key stay valid until they expire, so a key can be
+retired by moving it out of first place one token lifetime before
+removing it.
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+import jwt
+from dotenv import load_dotenv
+from app.services.metrics import StatsCollector
+
+load_dotenv()
+
+ALGORITHM = "HS256"
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+# Key for tokens without a kid header (all tokens issued before JWT_KEYS was set)
+JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
+DEFAULT_SECRET_KEY = "your-secret-key-change-in-production"
+# Comma-separated kid:secret pairs; the first one signs new tokens
+JWT_KEYS = os.getenv("JWT_KEYS", "")
+# Verified tokens remembered, so repeat requests skip the HMAC check
+JWT_CACHE_ENTRIES = int(os.getenv("JWT_CACHE_ENTRIES", "10000"))
+
+
+class InvalidToken(Exception):
+    """The token is malformed, expired, signed with an unknown key or lacks a subject"""
+
+
+def _load_keys(spec: str, legacy_secret: Optional[str]) -> Tuple[Optional[str], Dict[Optional[str], str]]:
+    """
+    Parse ``JWT_KEYS``.
+
+    Returns:
+        The signing kid (None when only ``JWT_SECRET_KEY`` is used) and the
+        verification keys by kid. ``None`` maps to ``JWT_SECRET_KEY``; with
+        ``JWT_KEYS`` set it is only present when ``JWT_SECRET_KEY`` is set
+        too, so the public default secret never verifies anything then.
+
+    Raises:
+        ValueError: Malformed or duplicate entry
+    """
+    keys: Dict[Optional[str], str] = {}
+    if legacy_secret or not spec.strip():
+        keys[None] = legacy_secret or DEFAULT_SECRET_KEY
+    signing_kid = None
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        kid, _, secret = entry.partition(":")
+        kid = kid.strip()
+        if not kid or not secret or kid in keys:
+            raise ValueError(f"Invalid or duplicate JWT_KEYS entry for kid {kid!r}, expected kid:secret")
+        keys[kid] = secret
+        if signing_kid is None:
+            signing_kid = kid
+    return signing_kid, keys
+
+
+SIGNING_KID, _KEYS = _load_keys(JWT_KEYS, JWT_SECRET_KEY)
+
+
+class TokenCache:
+    """
+    Bounded LRU of verified token -> claims.
+
+    An entry is only used until the token's ``exp``, so a cached token
+    expires exactly when a fresh verification would reject it. Keys are the
+    full token strings, so only byte-identical tokens that already passed
+    the signature check can hit.
+    """
+
+    def __init__(self, max_entries: int = JWT_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[dict, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str, now: float) -> Optional[dict]:
+        """Return the claims of a verified, unexpired token, or None"""
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            claims, expires_at = entry
+            if expires_at <= now:
+                del self._entries[token]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return claims
+
+    def put(self, token: str, claims: dict, expires_at: float) -> None:
+        """Remember verified claims until ``expires_at`` (epoch seconds)"""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[token] = (claims, expires_at)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and current size"""
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+token_cache = TokenCache()
+StatsCollector("jwt_token_cache", "Verified access tokens reused without an HMAC check", token_cache.stats, counters=("hits", "misses"))
+
+
+def issue_access_token(subject: str, expires_minutes: int = ACCESS_TOKEN_EXPIRE_MINUTES) -> str:
+    """
+    Sign an access token for ``subject`` with the current signing key.
+
+    Args:
+        subject: User email, stored as ``sub``
+        expires_minutes: Token lifetime
+
+    Returns:
+        Encoded JWT
+    """
+    claims = {"sub": subject, "exp": datetime.now(timezone.utc) + timedelta(minutes=expires_minutes)}
+    headers = {"kid": SIGNING_KID} if SIGNING_KID else None
+    return jwt.encode(claims, _KEYS[SIGNING_KID], algorithm=ALGORITHM, headers=headers)
+
+
+def decode_access_token(token: str) -> dict:
+    """
+    Verify a token and return its claims.
+
+    Repeated tokens are answered from ``token_cache`` until they expire;
+    others get the full signature and expiry check against the key named
+    by their ``kid`` header.
+
+    Args:
+        token: Encoded JWT
+
+    Returns:
+        Claims, with at least ``sub`` and ``exp``. Shared with the cache,
+        so do not modify them.
+
+    Raises:
+        InvalidToken: The token does not verify
+    """
+    now = time.time()
+    claims = token_cache.get(token, now)
+    if claims is not None:
+        return claims
+    try:
+        kid = jwt.get_unverified_header(token).get("kid")
+        key = _KEYS.get(kid) if kid is None or isinstance(kid, str) else None
+        if key is None:
+            raise InvalidToken("Unknown signing key")
+        claims = jwt.decode(token, key, algorithms=[ALGORITHM], options={"require": ["exp", "sub"]})
+    except jwt.PyJWTError as e:
+        raise InvalidToken(str(e)) from e
+    if not isinstance(claims.get("sub"), str):
+        raise InvalidToken("Token subject is not a string")
+    token_cache.put(token, claims, float(claims["exp"]))
+    return claims
@@ -0,0 +1,188 @@
+import os
+import sys
+import json
+import time
+import queue
+import random
+import atexit
+import logging
+import contextvars
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+from app.services.metrics import Counter, Histogram
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# "json" for one JSON object per line, "text" for human-readable lines
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+# Records waiting for the writer thread; further records are dropped, never blocked on
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Fraction of requests whose large debug payloads (raw model output) are logged
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0.01"))
+
+ROOT_LOGGER = "travel_planner"
+
+# Fields collected for the current request's summary line
+_request_fields: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("request_fields", default=None)
+
+_listener: Optional[QueueListener] = None
+
+http_requests = Counter("http_requests_total", "HTTP requests, by method, route and status", ("method", "route", "status"))
+http_latency = Histogram("http_request_duration_seconds", "HTTP request duration until the last byte, by route", ("route",))
+
+
+def _exc_text(formatter: logging.Formatter, record: logging.LogRecord) -> Optional[str]:
+    """Traceback of ``record``; after the queue handler only ``exc_text`` is left"""
+    if record.exc_info and not record.exc_text:
+        record.exc_text = formatter.formatException(record.exc_info)
+    return record.exc_text
+
+
+class JsonFormatter(logging.Formatter):
+    """Render a record and its structured ``fields`` as one JSON object"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        exc_text = _exc_text(self, record)
+        if exc_text:
+            entry["exc"] = exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Render a record as ``time level logger msg key=value ...``"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = f"{self.formatTime(record)} {record.levelname:<7} {record.name} {record.getMessage()}"
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        exc_text = _exc_text(self, record)
+        if exc_text:
+            line += "\n" + exc_text
+        return line
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Keep the structured fields; the formatting happens on the writer thread
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+def configure_logging() -> None:
+    """
+    Route application logs through a bounded queue to a background writer.
+    
+    Request handlers only enqueue records; formatting and the write to
+    stdout happen on the listener thread, so a slow terminal or log sink
+    never slows down the event loop. Safe to call more than once.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+    
+    log_queue: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    logger = logging.getLogger(ROOT_LOGGER)
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+    logger.addHandler(DroppingQueueHandler(log_queue))
+    
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Return a logger under the application root, e.g. ``get_logger("ai_planner")``"""
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def should_sample_payload(logger: logging.Logger) -> bool:
+    """True when a large debug payload should be logged for this call"""
+    return logger.isEnabledFor(logging.DEBUG) and random.random() < LOG_PAYLOAD_SAMPLE_RATE
+
+
+def start_request_log() -> dict:
+    """Begin collecting summary fields for the current request"""
+    fields = {"_start": time.perf_counter()}
+    _request_fields.set(fields)
+    return fields
+
+
+def annotate_request(**fields) -> None:
+    """Add fields (timings, sizes, outcome) to the current request's summary line"""
+    current = _request_fields.get()
+    if current is not None:
+        current.update(fields)
+
+
+def log_request_summary(logger: logging.Logger, fields: dict, **extra) -> None:
+    """Emit the single per-request summary line"""
+    start = fields.pop("_start", None)
+    if start is not None:
+        fields["duration_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    fields.update(extra)
+    logger.info("request", extra={"fields": fields})
+
+
+class RequestSummaryMiddleware:
+    """
+    Pure ASGI middleware that logs one summary line per HTTP request,
+    including streamed responses, once the last byte has been sent, and
+    records the request in the HTTP metrics.
+    
+    Unrouted paths share the ``unmatched`` route label so scanners cannot
+    grow the metric series.
+    """
+
+    def __init__(self, app, logger: logging.Logger):
+        self.app = app
+        self.logger = logger
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        fields = start_request_log()
+        status = 500
+        
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router adds the matched endpoint to the shared scope
+            route = scope["path"] if "endpoint" in scope else "unmatched"
+            http_requests.inc(method=scope["method"], route=route, status=status)
+            http_latency.observe(time.perf_counter() - fields["_start"], route=route)
+            log_request_summary(self.logger, fields, method=scope["method"], route=scope["path"], status=status)
@@ -0,0 +1,228 @@
+import time
+import bisect
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from sub-millisecond cache hits to slow Gemini calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+# Size buckets in characters, for prompts and model responses
+SIZE_BUCKETS = (256, 512, 1024, 2048, 4096, 8192, 16384, 32768, 65536, 131072)
+
+# Content type of the Prometheus text exposition format (Starlette appends the charset)
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Every metric created in this process, in creation order
+registry: List["_Metric"] = []
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+
+class Counter(_Metric):
+    """Monotonic counter, optionally split by label values"""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            return dict(self._values)
+
+
+class Histogram(_Metric):
+    """
+    Fixed-bucket histogram with a bucket-interpolated quantile estimate.
+    
+    Observing is a binary search plus two additions, cheap enough for the
+    request path.
+    """
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [bucket counts..., +Inf count], sum
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = ([0] * (len(self.buckets) + 1), [0.0])
+                self._series[key] = series
+            series[0][index] += 1
+            series[1][0] += value
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return sum(series[0]) if series else 0
+
+    def quantile(self, q: float, **labels) -> Optional[float]:
+        """
+        Estimate the ``q`` quantile (0-1) by linear interpolation inside the bucket.
+        
+        Returns:
+            The estimate, or None if nothing was observed
+        """
+        series = self._series.get(self._key(labels))
+        if not series:
+            return None
+        counts = series[0]
+        total = sum(counts)
+        if total == 0:
+            return None
+        rank = q * total
+        cumulative = 0
+        for index, bucket_count in enumerate(counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+    def samples(self) -> Dict[Tuple[str, ...], Tuple[List[int], float]]:
+        with self._lock:
+            return {key: (list(counts), total[0]) for key, (counts, total) in self._series.items()}
+
+
+class StatsCollector(_Metric):
+    """
+    Exposes an existing ``stats()`` dict (cache, single-flight, scheduler)
+    at scrape time, so the hot path keeps its plain integer counters.
+    
+    Each key becomes ``<prefix>_<key>``; keys listed in ``counters`` are
+    exported as counters with a ``_total`` suffix, the rest as gauges.
+    """
+    kind = "stats"
+
+    def __init__(self, prefix: str, documentation: str, stats: Callable[[], dict], counters: Sequence[str] = ()):
+        super().__init__(prefix, documentation)
+        self.stats = stats
+        self.counters = frozenset(counters)
+
+
+class Span:
+    """
+    Times a block into a histogram, e.g.
+    ``with Span(stage_latency, stage="parse"):``.
+    
+    The elapsed seconds stay available as ``span.elapsed`` afterwards.
+    """
+    __slots__ = ("histogram", "labels", "start", "elapsed")
+
+    def __init__(self, histogram: Histogram, **labels):
+        self.histogram = histogram
+        self.labels = labels
+        self.elapsed = 0.0
+
+    def __enter__(self) -> "Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.elapsed = time.perf_counter() - self.start
+        self.histogram.observe(self.elapsed, **self.labels)
+
+
+def render_prometheus(metrics: Optional[Iterable[_Metric]] = None) -> str:
+    """
+    Render metrics in the Prometheus text exposition format.
+    
+    Args:
+        metrics: Metrics to render; defaults to every registered metric
+        
+    Returns:
+        The exposition text, ending with a newline
+    """
+    lines: List[str] = []
+    for metric in registry if metrics is None else metrics:
+        if isinstance(metric, StatsCollector):
+            _render_stats(metric, lines)
+            continue
+        lines.append(f"# HELP {metric.name} {_escape_help(metric.documentation)}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        if isinstance(metric, Histogram):
+            for key, (counts, total) in sorted(metric.samples().items()):
+                cumulative = 0
+                for bound, bucket_count in zip(metric.buckets, counts):
+                    cumulative += bucket_count
+                    labels = _format_labels(metric.labelnames + ("le",), key + (_format_value(bound),))
+                    lines.append(f"{metric.name}_bucket{labels} {cumulative}")
+                cumulative += counts[-1]
+                labels = _format_labels(metric.labelnames + ("le",), key + ("+Inf",))
+                lines.append(f"{metric.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(metric.labelnames, key)
+                lines.append(f"{metric.name}_sum{labels} {_format_value(total)}")
+                lines.append(f"{metric.name}_count{labels} {cumulative}")
+        else:
+            for key, value in sorted(metric.samples().items()):
+                lines.append(f"{metric.name}{_format_labels(metric.labelnames, key)} {_format_value(value)}")
+    lines.append("")
+    return "\n".join(lines)
+
+
+def _render_stats(collector: StatsCollector, lines: List[str]) -> None:
+    for key, value in collector.stats().items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        if key in collector.counters:
+            name, kind = f"{collector.name}_{key}_total", "counter"
+        else:
+            name, kind = f"{collector.name}_{key}", "gauge"
+        lines.append(f"# HELP {name} {_escape_help(collector.documentation)}: {key}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"{name} {_format_value(value)}")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape_label(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
@@ -1,18 +1,20 @@
 import random
-import time
-from typing import Dict, Optional, Tuple
-import os
 from dotenv import load_dotenv
-from app.services.emailjs_service import send_otp_email
+from app.services.emailjs_service import EMAILJS_CONFIGURED
+from app.services.email_queue import OtpEmailQueue
+from app.services.metrics import StatsCollector
+from app.services.otp_store import otp_store, OTP_TTL
+from app.services.logging_config import get_logger
 
 # Load environment variables
 load_dotenv()
 
-# In-memory storage for OTPs (in production, use Redis or database)
-otp_storage: Dict[str, Tuple[str, float]] = {}
+logger = get_logger("otp")
+
+
+class OtpDeliveryError(Exception):
+    """The OTP email could not be queued for delivery"""
 
-# Flag to track if EmailJS is working
-emailjs_working = True
 
 def generate_random_otp() -> str:
     """
@@ -23,58 +25,65 @@ def generate_random_otp() -> str:
     """
     return ''.join([str(random.randint(0, 9)) for _ in range(6)])
 
-def store_otp(email: str, otp: str) -> None:
+async def store_otp(email: str, otp: str) -> None:
     """
-    Store OTP with 10-minute expiration (600 seconds).
+    Store OTP with ``OTP_TTL`` expiration (10 minutes by default).
     
     Args:
         email: User's email address
         otp: OTP to store
+        
+    Raises:
+        OtpStoreError: The OTP backend is unavailable
     """
-    expiration_time = time.time() + 600
-    otp_storage[email] = (otp, expiration_time)
+    await otp_store.put(email, otp, OTP_TTL)
+
+# Background EmailJS delivery, started by the FastAPI lifespan in main.py.
+# Failed deliveries are logged and counted by the queue; the user asks for a new code.
+otp_email_queue = OtpEmailQueue()
+StatsCollector(
+    "otp_email_queue", "OTP email delivery queue: depth, retries waiting, in flight and outcomes", otp_email_queue.stats,
+    counters=("delivered", "failed", "retries", "dropped")
+)
 
-def create_otp(email: str) -> str:
+
+async def create_otp(email: str) -> str:
     """
     Generate a random 6-digit OTP, store it with expiration time, and send it via EmailJS.
     
+    The email is only queued (see ``otp_email_queue``) and this returns
+    right after the OTP is stored. Without EmailJS settings (development)
+    the OTP is logged instead of sent.
+    
     Args:
         email: User's email address
         
     Returns:
         Generated OTP string
+        
+    Raises:
+        OtpStoreError: The OTP backend is unavailable
+        OtpDeliveryError: The email queue is full
     """
-    global emailjs_working
-    
     # Generate 6-digit OTP
     otp = generate_random_otp()
     
     # Store OTP with expiration
-    store_otp(email, otp)
+    await store_otp(email, otp)
     
-    # Try to send via EmailJS
-    try:
-        success = send_otp_email(email, otp)
-        if success:
-            print("✅ EmailJS sent OTP successfully")
-            emailjs_working = True
-        else:
-            print("⚠️ EmailJS failed to send OTP, enabling fallback mode")
-            emailjs_working = False
-            # Print OTP to console for fallback
-            print(f"🔐 Fallback Mode: OTP for {email}: {otp}")
-    except Exception as e:
-        print(f"⚠️ EmailJS error: {e}")
-        emailjs_working = False
-        # Print OTP to console for fallback
-        print(f"🔐 Fallback Mode: OTP for {email}: {otp}")
+    if not EMAILJS_CONFIGURED:
+        logger.warning("EmailJS not configured, OTP logged instead of sent", extra={"fields": {"email": email, "otp": otp}})
+        return otp
     
+    if not otp_email_queue.submit(email, otp):
+        logger.warning("OTP email queue full, OTP not sent", extra={"fields": {"email": email}})
+        raise OtpDeliveryError("OTP email queue is full")
     return otp
 
-def verify_otp(email: str, otp: str) -> bool:
+async def verify_otp(email: str, otp: str) -> bool:
     """
     Verify that the provided OTP matches the stored one and is not expired.
-    If EmailJS is not working, accepts any 6-digit code.
+    A matching OTP is used up.
     
     Args:
         email: User's email address
@@ -82,30 +91,8 @@ def verify_otp(email: str, otp: str) -> bool:
         
     Returns:
         True if OTP is valid and not expired, False otherwise
+        
+    Raises:
+        OtpStoreError: The OTP backend is unavailable
     """
-    global emailjs_working
-    
-    # If EmailJS is not working, accept any 6-digit code
-    if not emailjs_working:
-        print("🔓 Fallback Mode: Accepting any 6-digit code")
-        return otp.isdigit() and len(otp) == 6
-    
-    # Normal verification when EmailJS is working
-    if email not in otp_storage:
-        return False
-    
-    stored_otp, expiration_time = otp_storage[email]
-    
-    # Check if OTP is expired
-    if time.time() > expiration_time:
-        # Remove expired OTP
-        del otp_storage[email]
-        return False
-    
-    # Check if OTP matches
-    if stored_otp != otp:
-        return False
-    
-    # Remove used OTP
-    del otp_storage[email]
-    return True
\ No newline at end of file
+    return await otp_store.consume(email, otp)
@@ -0,0 +1,210 @@
+"""
+Where pending OTPs live between request-otp and verify-otp.
+
+``MemoryOtpStore`` keeps them in the worker process and expires them from
+a heap ordered by expiry time. ``RedisOtpStore`` keeps them in Redis (or
+any server speaking its protocol) with native key expiry, so every uvicorn
+worker sees the same OTPs. ``OTP_STORE_URL`` picks the backend.
+"""
+import os
+import time
+import heapq
+import hashlib
+from typing import Dict, List, Optional, Tuple
+from app.services.metrics import StatsCollector
+from app.services.redis_client import RedisClient, RedisError
+
+# Seconds an OTP stays valid
+OTP_TTL = int(os.getenv("OTP_TTL", "600"))
+# redis://[:password@]host[:port][/db] shares OTPs between workers; empty keeps them in memory
+OTP_STORE_URL = os.getenv("OTP_STORE_URL", "")
+# Memory backend only; the OTPs closest to expiry are dropped beyond this
+OTP_STORE_MAX_ENTRIES = int(os.getenv("OTP_STORE_MAX_ENTRIES", "100000"))
+
+OTP_KEY_PREFIX = "otp:"
+
+# Deletes the OTP only if it matches, in one atomic step on the server
+CONSUME_OTP_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+_CONSUME_OTP_SHA = hashlib.sha1(CONSUME_OTP_SCRIPT.encode()).hexdigest()
+
+
+class OtpStoreError(Exception):
+    """The OTP backend could not be reached"""
+
+
+class OtpStore:
+    """
+    Interface of the OTP backends.
+
+    An email has at most one pending OTP; storing a new one replaces it.
+    """
+
+    async def put(self, email: str, otp: str, ttl: int = OTP_TTL) -> None:
+        """
+        Store ``otp`` for ``email`` for ``ttl`` seconds.
+
+        Raises:
+            OtpStoreError: The backend is unavailable
+        """
+        raise NotImplementedError
+
+    async def consume(self, email: str, otp: str) -> bool:
+        """
+        Check ``otp`` against the pending one and delete it if it matches.
+
+        A wrong code leaves the pending OTP in place.
+
+        Returns:
+            True if ``otp`` matched an unexpired OTP
+
+        Raises:
+            OtpStoreError: The backend is unavailable
+        """
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        """Return backend counters"""
+        return {}
+
+    async def close(self) -> None:
+        """Release connections"""
+
+
+class MemoryOtpStore(OtpStore):
+    """
+    Per-process store with heap-ordered expiry.
+
+    Every write pushes ``(expires_at, email)`` on a min-heap. Each call
+    first pops the entries whose time has passed, so expired OTPs are
+    removed even for emails that never verify, and memory is bounded by
+    the signup rate times the TTL (and by ``max_entries``). Heap items of
+    replaced or consumed OTPs are skipped when they surface, and the heap
+    is rebuilt when they outnumber the live ones.
+    """
+
+    def __init__(self, max_entries: int = OTP_STORE_MAX_ENTRIES):
+        self.max_entries = max(1, max_entries)
+        self.expired = 0
+        self.evicted = 0
+        self._entries: Dict[str, Tuple[str, float]] = {}
+        self._heap: List[Tuple[float, str]] = []
+
+    async def put(self, email: str, otp: str, ttl: int = OTP_TTL) -> None:
+        now = time.monotonic()
+        self._expire(now)
+        expires_at = now + ttl
+        self._entries[email] = (otp, expires_at)
+        heapq.heappush(self._heap, (expires_at, email))
+        while len(self._entries) > self.max_entries:
+            self._pop_live()
+            self.evicted += 1
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [(expires_at, email) for email, (_, expires_at) in self._entries.items()]
+            heapq.heapify(self._heap)
+
+    async def consume(self, email: str, otp: str) -> bool:
+        now = time.monotonic()
+        self._expire(now)
+        entry = self._entries.get(email)
+        if entry is None or entry[0] != otp:
+            return False
+        del self._entries[email]
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "heap_size": len(self._heap),
+            "expired": self.expired,
+            "evicted": self.evicted
+        }
+
+    def _expire(self, now: float) -> None:
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            expires_at, email = heapq.heappop(heap)
+            entry = self._entries.get(email)
+            if entry is not None and entry[1] == expires_at:
+                del self._entries[email]
+                self.expired += 1
+
+    def _pop_live(self) -> None:
+        """Drop the live entry that expires first"""
+        while self._heap:
+            expires_at, email = heapq.heappop(self._heap)
+            entry = self._entries.get(email)
+            if entry is not None and entry[1] == expires_at:
+                del self._entries[email]
+                return
+
+
+class RedisOtpStore(OtpStore):
+    """
+    OTPs as ``otp:<email>`` keys with a Redis TTL, shared by all workers.
+
+    ``put`` is a single ``SET ... EX``. ``consume`` runs a Lua
+    compare-and-delete (``CONSUME_OTP_SCRIPT``) by its SHA, so a correct
+    code is deleted atomically and cannot be used twice, even by concurrent
+    requests on different workers, and a wrong code never touches the key.
+    The script text is only sent again when the server answers NOSCRIPT
+    (after a restart or ``SCRIPT FLUSH``).
+    """
+
+    def __init__(self, client: RedisClient):
+        self.client = client
+        self.script_loads = 0
+
+    async def put(self, email: str, otp: str, ttl: int = OTP_TTL) -> None:
+        try:
+            await self.client.execute("SET", OTP_KEY_PREFIX + email, otp, "EX", ttl)
+        except RedisError as e:
+            raise OtpStoreError(str(e)) from e
+
+    async def consume(self, email: str, otp: str) -> bool:
+        key = OTP_KEY_PREFIX + email
+        try:
+            try:
+                deleted = await self.client.execute("EVALSHA", _CONSUME_OTP_SHA, 1, key, otp)
+            except RedisError as e:
+                if not str(e).startswith("NOSCRIPT"):
+                    raise
+                # EVAL also caches the script for the next EVALSHA
+                self.script_loads += 1
+                deleted = await self.client.execute("EVAL", CONSUME_OTP_SCRIPT, 1, key, otp)
+            return deleted == 1
+        except RedisError as e:
+            raise OtpStoreError(str(e)) from e
+
+    def stats(self) -> dict:
+        return {**self.client.stats(), "script_loads": self.script_loads}
+
+    async def close(self) -> None:
+        await self.client.close()
+
+
+def create_otp_store(url: Optional[str] = OTP_STORE_URL) -> OtpStore:
+    """
+    Build the OTP backend named by ``url``.
+
+    Args:
+        url: ``redis://`` URL, or empty for the in-process store
+
+    Returns:
+        The store
+    """
+    if not url:
+        return MemoryOtpStore()
+    return RedisOtpStore(RedisClient(url))
+
+
+# Shared by the auth endpoints of this worker
+otp_store = create_otp_store()
+StatsCollector(
+    "otp_store", "Pending OTP backend", otp_store.stats,
+    counters=("expired", "evicted", "commands", "round_trips", "errors", "script_loads")
+)
@@ -0,0 +1,157 @@
+"""
+Itinerary prompt, split into a static system instruction compiled once at
+import (role, compact schema, rules) and a small per-request part that is
+kept within a token budget.
+
+The system instruction is identical for every request, so it is sent as
+the model's ``system_instruction`` and, when enabled, stored once with
+Gemini context caching (see ``GeminiRegistry.cache_context``).
+"""
+import os
+import json
+import math
+from typing import NamedTuple, Optional
+from schemas import TripRequest
+
+# Upper bound on the prompt (system instruction + request part), in tokens
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "2048"))
+
+# Gemini averages about 4 characters per token for English text
+CHARS_PER_TOKEN = 4
+# Other request fields are short in practice; clip them so they cannot eat the budget
+MAX_FIELD_CHARS = 100
+MAX_PROMPT_TAGS = 20
+TRUNCATION_MARK = " [...]"
+
+ITINERARY_SCHEMA = """{
+            "destination": "string",
+            "numDays": "integer",
+            "styleKeywords": ["string"],
+            "imageMoodSummary": "string or null",
+            "days": [
+                {
+                    "dayNumber": "integer",
+                    "date": "string or null",
+                    "theme": "string",
+                    "summary": "string",
+                    "activities": [
+                        {
+                            "timeOfDay": "morning|afternoon|evening",
+                            "title": "string",
+                            "description": "string",
+                            "location": "string",
+                            "category": "string",
+                            "estimatedCost": "number",
+                            "bookingRequired": "boolean",
+                            "latitude": "number or null (approximate GPS latitude of the location)",
+                            "longitude": "number or null (approximate GPS longitude of the location)"
+                        }
+                    ]
+                }
+            ],
+            "meta": {
+                "currency": "string",
+                "budgetLevel": "string",
+                "notes": "string"
+            }
+        }"""
+
+INSTRUCTIONS = (
+    "Respond ONLY with valid JSON that matches the schema exactly",
+    "Do not include any markdown, explanations, or other text",
+    "Make the itinerary realistic and engaging",
+    "Ensure all fields are populated appropriately",
+    "For estimated costs, use reasonable values in the local currency",
+    "Activities should be appropriate for the destination and trip type",
+    "Include 2-4 activities per day",
+    "Use the destination given in the request, not the one mentioned in the trip description",
+    "Generate specific tourist attractions and activities for the given destination",
+    "Include approximate latitude and longitude coordinates for each activity location",
+    "If you don't know the exact coordinates, estimate them based on the location name and destination",
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Conservative local token estimate, without a count_tokens round trip.
+
+    ASCII text counts ``CHARS_PER_TOKEN`` characters per token; every other
+    character (accents, CJK, emoji) counts as a whole token.
+    """
+    non_ascii = len(text) - len(text.encode("ascii", "ignore"))
+    return math.ceil((len(text) - non_ascii) / CHARS_PER_TOKEN) + non_ascii
+
+
+def _compile_system_instruction() -> str:
+    # Same schema, without the indentation (about a third of its tokens)
+    schema = json.dumps(json.loads(ITINERARY_SCHEMA), separators=(",", ":"))
+    rules = "\n".join(f"{number}. {rule}" for number, rule in enumerate(INSTRUCTIONS, 1))
+    return (
+        "You are an AI travel planner. Generate a detailed, realistic travel itinerary "
+        "for the trip request as JSON only, matching this exact schema:\n"
+        f"{schema}\n\nImportant instructions:\n{rules}\n"
+    )
+
+
+SYSTEM_INSTRUCTION = _compile_system_instruction()
+SYSTEM_INSTRUCTION_TOKENS = estimate_tokens(SYSTEM_INSTRUCTION)
+
+
+class RequestPrompt(NamedTuple):
+    """The per-request part of the prompt"""
+    text: str
+    # Estimated tokens of the whole prompt, system instruction included
+    tokens: int
+    truncated: bool
+
+
+def build_request_prompt(request: TripRequest, image_hint: str, budget: int = PROMPT_TOKEN_BUDGET) -> RequestPrompt:
+    """
+    Render the per-request prompt, truncating the trip description to fit.
+
+    Args:
+        request: Trip request
+        image_hint: Text for the image mood line
+        budget: Token budget for the whole prompt
+
+    Returns:
+        The prompt text, its estimated size and whether the description
+        was cut
+    """
+    tags = ", ".join(_clip(tag) for tag in request.trip_tags[:MAX_PROMPT_TAGS]) or "None"
+    details = (
+        f"Destination: {_clip(request.destination) or 'Not specified'}\n"
+        f"Start date: {_clip(request.start_date) or 'Not specified'}\n"
+        f"Days: {request.days or 'Not specified'}\n"
+        f"Budget level: {_clip(request.budget_level) or 'Not specified'}\n"
+        f"Trip tags: {tags}\n"
+        f"Image mood hint: {image_hint}\n"
+    )
+    label = "Trip description: "
+    fixed = SYSTEM_INSTRUCTION_TOKENS + estimate_tokens(label + details)
+    description, truncated = _truncate(request.trip_description, max(0, budget - fixed))
+    text = f"{label}{description}\n{details}"
+    return RequestPrompt(text, SYSTEM_INSTRUCTION_TOKENS + estimate_tokens(text), truncated)
+
+
+def _clip(value: Optional[str]) -> str:
+    if not value:
+        return ""
+    return value if len(value) <= MAX_FIELD_CHARS else value[:MAX_FIELD_CHARS]
+
+
+def _truncate(text: str, max_tokens: int):
+    """Cut ``text`` at a word boundary so it fits ``max_tokens``; returns (text, truncated)"""
+    tokens = estimate_tokens(text)
+    if tokens <= max_tokens:
+        return text, False
+    limit = max(0, max_tokens - estimate_tokens(TRUNCATION_MARK))
+    # Proportional cut, tightened until the estimate fits (non-ASCII text can need a second pass)
+    keep = len(text) * limit // tokens
+    while keep > 0 and estimate_tokens(text[:keep]) > limit:
+        keep = keep * limit // estimate_tokens(text[:keep])
+    cut = text[:keep]
+    space = cut.rfind(" ")
+    if space > keep // 2:
+        cut = cut[:space]
+    return cut.rstrip() + TRUNCATION_MARK, True
@@ -0,0 +1,324 @@
+"""
+Sliding-window rate limits for the auth endpoints, keyed by email and by
+client IP.
+
+Each rule counts hits in fixed windows and weighs the previous window by
+how much of it still overlaps the sliding window ending now, so a key
+needs two small counters instead of a timestamp log. Counters live in
+process memory, or in Redis (``RATE_LIMIT_STORE_URL``) to be shared by
+all workers. Once a key is rejected it is blocked locally until its
+Retry-After passes, so repeated rejections are answered without touching
+the store.
+"""
+import os
+import time
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+from app.services.metrics import Counter, StatsCollector
+from app.services.otp_store import OTP_STORE_URL
+from app.services.redis_client import RedisClient, RedisError
+from app.services.logging_config import get_logger
+
+logger = get_logger("rate_limit")
+
+AUTH_RATE_LIMIT_ENABLED = os.getenv("AUTH_RATE_LIMIT_ENABLED", "true").lower() == "true"
+# Defaults to the OTP store, so both are shared (or not) together
+RATE_LIMIT_STORE_URL = os.getenv("RATE_LIMIT_STORE_URL", OTP_STORE_URL)
+# Rules as "<requests>/<seconds>"
+AUTH_RATE_LIMIT_REQUEST_EMAIL = os.getenv("AUTH_RATE_LIMIT_REQUEST_EMAIL", "5/600")
+AUTH_RATE_LIMIT_REQUEST_IP = os.getenv("AUTH_RATE_LIMIT_REQUEST_IP", "30/600")
+AUTH_RATE_LIMIT_VERIFY_EMAIL = os.getenv("AUTH_RATE_LIMIT_VERIFY_EMAIL", "10/600")
+AUTH_RATE_LIMIT_VERIFY_IP = os.getenv("AUTH_RATE_LIMIT_VERIFY_IP", "60/600")
+# Behind a reverse proxy, key by the X-Forwarded-For address the proxy added instead of the peer
+AUTH_TRUST_FORWARDED_FOR = os.getenv("AUTH_TRUST_FORWARDED_FOR", "false").lower() == "true"
+# Proxies in front of the backend that each append to X-Forwarded-For
+AUTH_TRUSTED_PROXY_HOPS = max(1, int(os.getenv("AUTH_TRUSTED_PROXY_HOPS", "1")))
+
+RATE_LIMIT_KEY_PREFIX = "rl:"
+# Local block list size before expired blocks are swept
+_MAX_BLOCKED = 10000
+
+rate_limited_requests = Counter("auth_rate_limited_total", "Auth requests rejected with 429, by rule", ("rule",))
+
+
+class RateRule(NamedTuple):
+    """At most ``limit`` hits per ``window`` seconds per key"""
+    name: str
+    limit: int
+    window: float
+
+
+def parse_rule(name: str, spec: str) -> RateRule:
+    """
+    Parse a ``"<requests>/<seconds>"`` rule.
+
+    Raises:
+        ValueError: Malformed rule
+    """
+    limit, _, window = spec.partition("/")
+    rule = RateRule(name, int(limit), float(window or 0))
+    if rule.limit < 1 or rule.window <= 0:
+        raise ValueError(f"Invalid rate limit {name}={spec!r}, expected '<requests>/<seconds>'")
+    return rule
+
+
+class RateLimited(Exception):
+    """A rule rejected the request; ``retry_after`` is in seconds"""
+
+    def __init__(self, rule: str, retry_after: float):
+        super().__init__(f"Rate limit {rule} exceeded")
+        self.rule = rule
+        self.retry_after = retry_after
+
+
+class MemoryRateStore:
+    """
+    Per-process window counters: ``key -> (window index, count, previous count)``,
+    in one dict per window length.
+
+    Keys whose last hit is two windows old count nothing, so a dict is
+    swept whenever it has doubled since its last sweep.
+    """
+
+    def __init__(self):
+        self._counters: Dict[float, Dict[str, Tuple[int, int, int]]] = {}
+        self._sweep_at: Dict[float, int] = {}
+
+    async def hit_many(self, hits: Sequence[Tuple[str, int, float]]) -> List[Tuple[int, int]]:
+        """
+        Count a hit per ``(key, window index, window)``.
+
+        Returns:
+            (current, previous) window counts per hit
+        """
+        return [self._hit(key, window_index, window) for key, window_index, window in hits]
+
+    def _hit(self, key: str, window_index: int, window: float) -> Tuple[int, int]:
+        counters = self._counters.get(window)
+        if counters is None:
+            counters = self._counters[window] = {}
+            self._sweep_at[window] = 1024
+        index, count, previous = counters.get(key, (window_index, 0, 0))
+        if index == window_index:
+            entry = (index, count + 1, previous)
+        elif index == window_index - 1:
+            entry = (window_index, 1, count)
+        else:
+            entry = (window_index, 1, 0)
+        counters[key] = entry
+        if len(counters) >= self._sweep_at[window]:
+            self._sweep(window, window_index)
+        return entry[1], entry[2]
+
+    def size(self) -> int:
+        return sum(len(counters) for counters in self._counters.values())
+
+    def _sweep(self, window: float, window_index: int) -> None:
+        counters = {key: entry for key, entry in self._counters[window].items() if entry[0] >= window_index - 1}
+        self._counters[window] = counters
+        self._sweep_at[window] = max(1024, 2 * len(counters))
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisRateStore:
+    """
+    Window counters as ``rl:<rule>:<key>:<window index>`` Redis keys.
+
+    Per rule, ``INCR`` of the current window, ``PEXPIRE`` so it outlives
+    the next window, and ``GET`` of the previous window; the commands of
+    all rules of a request go out as one pipeline, one round trip per
+    check. ``INCR`` is atomic, so every worker counts against the same
+    total.
+    """
+
+    def __init__(self, client: RedisClient):
+        self.client = client
+
+    async def hit_many(self, hits: Sequence[Tuple[str, int, float]]) -> List[Tuple[int, int]]:
+        commands = []
+        for key, window_index, window in hits:
+            current_key = f"{key}:{window_index}"
+            commands += [
+                ("INCR", current_key),
+                ("PEXPIRE", current_key, int(window * 2000)),
+                ("GET", f"{key}:{window_index - 1}")
+            ]
+        replies = await self.client.pipeline(commands)
+        counts = []
+        for offset in range(0, len(replies), 3):
+            current, _, previous = replies[offset:offset + 3]
+            for reply in (current, previous):
+                if isinstance(reply, RedisError):
+                    raise reply
+            counts.append((int(current), int(previous or 0)))
+        return counts
+
+    def size(self) -> int:
+        return 0
+
+    async def close(self) -> None:
+        await self.client.close()
+
+
+class RateLimiter:
+    """
+    Checks requests against sliding-window rules.
+
+    The estimated count of a key is the current window's hits plus the
+    previous window's, weighted by the fraction of it inside the sliding
+    window. Rejected hits are counted too, so a client hammering the
+    endpoint stays limited.
+
+    Store failures let the request through (fail open): a rate limiter
+    outage should not lock everyone out of logging in.
+
+    Args:
+        store: ``MemoryRateStore`` or ``RedisRateStore``
+        enabled: False turns every check into a no-op
+    """
+
+    def __init__(self, store, enabled: bool = AUTH_RATE_LIMIT_ENABLED):
+        self.store = store
+        self.enabled = enabled
+        self.checks = 0
+        self.rejected = 0
+        self.local_rejections = 0
+        self.store_errors = 0
+        self._blocked: Dict[str, float] = {}
+
+    async def check(self, checks: Sequence[Tuple[RateRule, str]]) -> None:
+        """
+        Count one hit against each ``(rule, key)`` pair.
+
+        Args:
+            checks: Rules and the key (email, IP) each applies to
+
+        Raises:
+            RateLimited: A rule is exceeded; carries the longest Retry-After
+        """
+        if not self.enabled:
+            return
+        self.checks += 1
+        now = time.time()
+        # Keys already blocked are rejected without touching the store
+        for rule, key in checks:
+            blocked_until = self._blocked.get(self._key(rule, key))
+            if blocked_until is not None and blocked_until > now:
+                self.rejected += 1
+                self.local_rejections += 1
+                raise RateLimited(rule.name, blocked_until - now)
+        positions = [now / rule.window for rule, _ in checks]
+        hits = [(self._key(rule, key), int(position), rule.window) for (rule, key), position in zip(checks, positions)]
+        try:
+            counts = await self.store.hit_many(hits)
+        except RedisError as e:
+            self.store_errors += 1
+            logger.warning("Rate limit store unavailable, allowing request", extra={"fields": {"error": str(e)}})
+            return
+        rejection: Optional[RateLimited] = None
+        for (rule, _), position, (full_key, window_index, _), (current, previous) in zip(checks, positions, hits, counts):
+            elapsed = position - window_index
+            if current + previous * (1 - elapsed) > rule.limit:
+                retry_after = _retry_after(rule, current, previous, elapsed)
+                self._block(full_key, now + retry_after)
+                if rejection is None or retry_after > rejection.retry_after:
+                    rejection = RateLimited(rule.name, retry_after)
+        if rejection is not None:
+            self.rejected += 1
+            raise rejection
+
+    def stats(self) -> dict:
+        """Return check counters and tracked key counts"""
+        return {
+            "checks": self.checks,
+            "rejected": self.rejected,
+            "local_rejections": self.local_rejections,
+            "store_errors": self.store_errors,
+            "blocked_keys": len(self._blocked),
+            "tracked_keys": self.store.size()
+        }
+
+    async def close(self) -> None:
+        await self.store.close()
+
+    @staticmethod
+    def _key(rule: RateRule, key: str) -> str:
+        return f"{RATE_LIMIT_KEY_PREFIX}{rule.name}:{key}"
+
+    def _block(self, key: str, until: float) -> None:
+        if len(self._blocked) >= _MAX_BLOCKED:
+            now = time.time()
+            self._blocked = {blocked: end for blocked, end in self._blocked.items() if end > now}
+            if len(self._blocked) >= _MAX_BLOCKED:
+                return
+        self._blocked[key] = until
+
+
+def _retry_after(rule: RateRule, current: int, previous: int, elapsed: float) -> float:
+    """Seconds until the sliding estimate is back within the limit (assuming no new hits)"""
+    window_left = (1 - elapsed) * rule.window
+    if current >= rule.limit or previous == 0:
+        # Only the next window clears it; the current hits then weigh in as the previous window
+        excess_share = 1 - (rule.limit - 1) / current if current else 0
+        return window_left + max(0.0, excess_share) * rule.window
+    # The previous window's share has to shrink to the room left in this one, next hit included
+    share_needed = (rule.limit - 1 - current) / previous
+    return max(0.0, (1 - share_needed - elapsed) * rule.window)
+
+
+def client_ip(headers, peer: Optional[str]) -> str:
+    """
+    Address to rate limit a request by.
+
+    Clients can send any ``X-Forwarded-For`` they like, and proxies append
+    to it, so only the entries added by our own proxies are trusted: with
+    ``AUTH_TRUSTED_PROXY_HOPS`` proxies that is the entry that many places
+    from the right.
+
+    Args:
+        headers: Request headers (Starlette ``Headers``, or a plain mapping)
+        peer: Address of the TCP peer
+
+    Returns:
+        That ``X-Forwarded-For`` entry when ``AUTH_TRUST_FORWARDED_FOR`` is
+        set and the header has enough entries, else the peer address
+    """
+    if AUTH_TRUST_FORWARDED_FOR:
+        values = headers.getlist("x-forwarded-for") if hasattr(headers, "getlist") else [headers.get("x-forwarded-for") or ""]
+        # Repeated headers count as one list, in order
+        forwarded = [entry.strip() for value in values for entry in value.split(",") if entry.strip()]
+        if len(forwarded) >= AUTH_TRUSTED_PROXY_HOPS:
+            return forwarded[-AUTH_TRUSTED_PROXY_HOPS]
+    return peer or "unknown"
+
+
+def create_rate_limiter(url: Optional[str] = RATE_LIMIT_STORE_URL) -> RateLimiter:
+    """
+    Build the auth rate limiter on the store named by ``url``.
+
+    Args:
+        url: ``redis://`` URL, or empty for per-process counters
+
+    Returns:
+        The limiter
+    """
+    store = RedisRateStore(RedisClient(url)) if url else MemoryRateStore()
+    return RateLimiter(store)
+
+
+REQUEST_OTP_RULES: List[RateRule] = [
+    parse_rule("request_otp_email", AUTH_RATE_LIMIT_REQUEST_EMAIL),
+    parse_rule("request_otp_ip", AUTH_RATE_LIMIT_REQUEST_IP)
+]
+VERIFY_OTP_RULES: List[RateRule] = [
+    parse_rule("verify_otp_email", AUTH_RATE_LIMIT_VERIFY_EMAIL),
+    parse_rule("verify_otp_ip", AUTH_RATE_LIMIT_VERIFY_IP)
+]
+
+# Shared by the auth endpoints of this worker
+auth_rate_limiter = create_rate_limiter()
+StatsCollector(
+    "auth_rate_limiter", "Auth endpoint rate limiting", auth_rate_limiter.stats,
+    counters=("checks", "rejected", "local_rejections", "store_errors")
+)
@@ -0,0 +1,164 @@
+"""
+Minimal asyncio client for the Redis protocol (RESP2), enough for the
+shared auth state: single commands and pipelines over a small pool of
+keep-alive connections. Works with Redis, Valkey, KeyDB and the local
+stand-in in ``benchmarks/fake_redis.py``.
+"""
+import os
+import asyncio
+from typing import Any, List, Optional, Sequence, Tuple, Union
+from urllib.parse import urlparse, unquote
+
+# Seconds a command or pipeline may take, connecting included
+REDIS_TIMEOUT = float(os.getenv("REDIS_TIMEOUT", "2"))
+REDIS_POOL_SIZE = int(os.getenv("REDIS_POOL_SIZE", "8"))
+
+Command = Sequence[Union[str, bytes, int, float]]
+
+
+class RedisError(Exception):
+    """Connection failure, timeout, or an error reply from the server"""
+
+
+class RedisClient:
+    """
+    Pooled RESP client.
+
+    ``pipeline`` writes all commands in one go and then reads the replies,
+    so N commands cost one round trip. Error replies inside a pipeline are
+    returned in place as ``RedisError`` instances; connection errors and
+    timeouts raise and discard the connection.
+
+    Args:
+        url: ``redis://[:password@]host[:port][/db]``
+        pool_size: Connections kept open
+        timeout: Seconds per command or pipeline
+    """
+
+    def __init__(self, url: str, pool_size: int = REDIS_POOL_SIZE, timeout: float = REDIS_TIMEOUT):
+        parsed = urlparse(url)
+        if parsed.scheme != "redis":
+            raise ValueError(f"Unsupported Redis URL scheme: {parsed.scheme!r}")
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.pool_size = max(1, pool_size)
+        self.timeout = timeout
+        self.commands = 0
+        self.round_trips = 0
+        self.errors = 0
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def execute(self, *args) -> Any:
+        """
+        Run one command.
+
+        Raises:
+            RedisError: The server answered with an error, or the call failed
+        """
+        reply = (await self.pipeline([args]))[0]
+        if isinstance(reply, RedisError):
+            raise reply
+        return reply
+
+    async def pipeline(self, commands: Sequence[Command]) -> List[Any]:
+        """
+        Run several commands in one round trip.
+
+        Returns:
+            One reply per command, ``RedisError`` for error replies
+
+        Raises:
+            RedisError: Connection failure or timeout
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.pool_size)
+        payload = b"".join(_encode(command) for command in commands)
+        async with self._slots:
+            connection = None
+            try:
+                connection = self._idle.pop() if self._idle else await asyncio.wait_for(self._connect(), self.timeout)
+                reader, writer = connection
+                writer.write(payload)
+                replies = await asyncio.wait_for(self._read_replies(reader, writer, len(commands)), self.timeout)
+            except (OSError, EOFError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+                self.errors += 1
+                if connection is not None:
+                    connection[1].close()
+                raise RedisError(f"Redis {self.host}:{self.port} unavailable: {e!r}") from e
+            except BaseException:
+                # Cancelled mid-reply: the connection is out of sync
+                if connection is not None:
+                    connection[1].close()
+                raise
+            self._idle.append(connection)
+        self.commands += len(commands)
+        self.round_trips += 1
+        return replies
+
+    async def close(self) -> None:
+        """Close the idle connections"""
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+
+    def stats(self) -> dict:
+        """Return command and connection counters"""
+        return {
+            "idle_connections": len(self._idle),
+            "commands": self.commands,
+            "round_trips": self.round_trips,
+            "errors": self.errors
+        }
+
+    async def _connect(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        setup = []
+        if self.password:
+            setup.append(("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        if setup:
+            writer.write(b"".join(_encode(command) for command in setup))
+            for reply in await self._read_replies(reader, writer, len(setup)):
+                if isinstance(reply, RedisError):
+                    writer.close()
+                    raise reply
+        return reader, writer
+
+    async def _read_replies(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, count: int) -> List[Any]:
+        await writer.drain()
+        return [await _read_reply(reader) for _ in range(count)]
+
+
+def _encode(command: Command) -> bytes:
+    parts = [b"*%d\r\n" % len(command)]
+    for arg in command:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(parts)
+
+
+async def _read_reply(reader: asyncio.StreamReader) -> Any:
+    line = await reader.readuntil(b"\r\n")
+    kind, rest = line[:1], line[1:-2]
+    if kind == b"+":
+        return rest.decode()
+    if kind == b"-":
+        return RedisError(rest.decode())
+    if kind == b":":
+        return int(rest)
+    if kind == b"$":
+        length = int(rest)
+        if length < 0:
+            return None
+        return (await reader.readexactly(length + 2))[:-2].decode()
+    if kind == b"*":
+        length = int(rest)
+        if length < 0:
+            return None
+        return [await _read_reply(reader) for _ in range(length)]
+    raise EOFError(f"Unexpected RESP reply: {line[:40]!r}")
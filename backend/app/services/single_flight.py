@@ -0,0 +1,62 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional
+from app.services.metrics import StatsCollector
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into one in-flight execution.
+    
+    The first caller for a key starts the work as a task; callers arriving
+    while it runs await the same task and receive its result or exception.
+    The task is shielded, so a cancelled caller does not cancel the work for
+    the others.
+    """
+
+    def __init__(self):
+        self.executions = 0
+        self.coalesced = 0
+        self._in_flight: Dict[str, asyncio.Task] = {}
+
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Any]],
+        on_join: Optional[Callable[[], None]] = None
+    ) -> Any:
+        """
+        Run ``fn`` once per key among concurrent callers.
+        
+        Args:
+            key: Identity of the work, e.g. a canonical request key
+            fn: Zero-argument coroutine function doing the work
+            on_join: Called instead of ``fn`` when joining an execution
+                already in flight, e.g. to raise its priority
+            
+        Returns:
+            The result of the shared execution
+        """
+        task = self._in_flight.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+            if on_join is not None:
+                on_join()
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        """Return execution and coalescing counters"""
+        return {
+            "in_flight": len(self._in_flight),
+            "executions": self.executions,
+            "coalesced": self.coalesced
+        }
+
+
+# Shared single-flight group for Gemini itinerary generation
+itinerary_flights = SingleFlight()
+StatsCollector("itinerary_single_flight", "Coalesced Gemini itinerary generations", itinerary_flights.stats, counters=("executions", "coalesced"))
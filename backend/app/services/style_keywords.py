@@ -0,0 +1,106 @@
+import string
+from functools import lru_cache
+from typing import Dict, Iterable, List, Set, Tuple
+
+# Style category -> words that suggest it, in the order categories are reported
+STYLE_CATEGORIES: Dict[str, Tuple[str, ...]] = {
+    "relaxing": ("relax", "relaxing", "chill", "peaceful", "serene", "calm", "spa", "beach"),
+    "adventure": ("adventure", "thrill", "exciting", "explore", "hiking", "trekking", "outdoor"),
+    "luxury": ("luxury", "luxurious", "expensive", "high-end", "premium", "five-star"),
+    "budget": ("budget", "cheap", "affordable", "low-cost", "economical"),
+    "family": ("family", "kids", "children", "parents"),
+    "romantic": ("romantic", "couple", "honeymoon", "love", "date"),
+    "cultural": ("cultural", "culture", "museum", "art", "heritage", "local"),
+    "historical": ("historical", "history", "ancient", "historic", "monument"),
+    "beach": ("beach", "coast", "ocean", "sea", "sand", "surf"),
+    "mountain": ("mountain", "hills", "peak", "summit", "alpine"),
+    "city": ("city", "urban", "metropolitan", "downtown"),
+    "nature": ("nature", "wildlife", "forest", "park", "natural"),
+}
+
+# Reported when nothing matches
+DEFAULT_STYLE = "Cultural"
+
+# Punctuation splits words, except hyphens inside words ("high-end", "five-star")
+_PUNCTUATION = str.maketrans({char: " " for char in string.punctuation if char != "-"})
+
+
+def tokenize(text: str) -> Set[str]:
+    """Distinct lower-cased words of ``text``, with punctuation removed"""
+    return {word.strip("-") for word in set(text.lower().translate(_PUNCTUATION).split())}
+
+
+@lru_cache(maxsize=65536)
+def stem(word: str) -> str:
+    """
+    Light suffix stripping so inflections meet their keyword.
+
+    "hikes", "hiking" and "hiked" all become "hik", "museums" becomes
+    "museum", "cities" becomes "city". The same function stems the
+    keywords, so it only has to be consistent, not linguistically exact.
+    Stems are memoized; trip descriptions reuse a small vocabulary.
+    """
+    if len(word) <= 3:
+        return word
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    for suffix in ("ing", "ed", "es", "s"):
+        if word.endswith(suffix) and not word.endswith("ss") and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            # "trekking" -> "trek", "swimming" -> "swim"
+            if suffix in ("ing", "ed") and len(word) > 3 and word[-1] == word[-2] and word[-1] not in "lsz":
+                word = word[:-1]
+            break
+    if word.endswith("e") and len(word) > 3:
+        word = word[:-1]
+    return word
+
+
+class StyleClassifier:
+    """
+    Maps trip descriptions and tags to style categories with an inverted
+    index from stemmed keyword to category, built once.
+
+    Classification tokenizes the input once, stems the distinct words and
+    looks each up in the index; the cost no longer grows with the number
+    of categories or keywords.
+    """
+
+    def __init__(self, categories: Dict[str, Iterable[str]]):
+        self.categories = list(categories)
+        # Stemmed keyword -> positions of the categories it suggests
+        self._index: Dict[str, Tuple[int, ...]] = {}
+        for position, keywords in enumerate(categories.values()):
+            for keyword in keywords:
+                key = stem(keyword)
+                if position not in self._index.get(key, ()):
+                    self._index[key] = self._index.get(key, ()) + (position,)
+
+    def classify(self, description: str, tags: Iterable[str] = (), limit: int = 3) -> List[str]:
+        """
+        Return the style categories suggested by a description and tags.
+
+        Args:
+            description: Free-text trip description
+            tags: Trip tags chosen by the user
+            limit: Maximum number of categories to return
+
+        Returns:
+            Capitalized category names in category order, or
+            ``[DEFAULT_STYLE]`` when nothing matched
+        """
+        words = tokenize(description)
+        words.update(tokenize(" ".join(tags)))
+        found = set()
+        index = self._index
+        for word in words:
+            positions = index.get(stem(word))
+            if positions:
+                found.update(positions)
+        if not found:
+            return [DEFAULT_STYLE]
+        return [self.categories[position].capitalize() for position in sorted(found)[:limit]]
+
+
+# Built once at import and shared by every request
+style_classifier = StyleClassifier(STYLE_CATEGORIES)
@@ -0,0 +1,284 @@
+"""
+Registered users, persisted so they survive restarts and are shared by
+all uvicorn workers on the host.
+
+``UserRepository`` is the interface the auth router uses;
+``SqliteUserRepository`` implements it on a SQLite database in WAL mode,
+so readers never wait for the writer and commits need no fsync each.
+``USER_STORE_URL`` picks the backend; another database (Postgres) only
+needs its own repository class and URL scheme in ``create_user_repository``.
+"""
+import os
+import time
+import sqlite3
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, NamedTuple, Optional, Tuple, TypeVar
+from app.services.metrics import Histogram, StatsCollector
+from app.services.logging_config import get_logger
+
+logger = get_logger("user_store")
+
+# sqlite:///<path>; empty uses data/users.db next to the backend code
+USER_STORE_URL = os.getenv("USER_STORE_URL", "")
+DEFAULT_USER_DB_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data", "users.db"
+)
+# Connections, one per pool thread
+USER_STORE_POOL_SIZE = int(os.getenv("USER_STORE_POOL_SIZE", "4"))
+# Users kept in memory by the read-through cache; 0 disables it
+USER_CACHE_ENTRIES = int(os.getenv("USER_CACHE_ENTRIES", "10000"))
+# Seconds a connection waits for the write lock held by another connection or worker
+USER_STORE_BUSY_TIMEOUT = float(os.getenv("USER_STORE_BUSY_TIMEOUT", "5"))
+
+user_store_latency = Histogram("user_store_seconds", "User repository calls, pool wait included", ("operation",))
+
+T = TypeVar("T")
+
+
+class User(NamedTuple):
+    email: str
+    # Epoch seconds of the first successful login
+    created_at: float
+
+
+class UserStoreError(Exception):
+    """The user database could not be read or written"""
+
+
+class UserRepository:
+    """Interface of the user backends"""
+
+    async def ensure_user(self, email: str) -> Tuple[User, bool]:
+        """
+        Return the user for ``email``, creating it on first login.
+
+        Returns:
+            The user and whether it was created by this call
+
+        Raises:
+            UserStoreError: The database failed
+        """
+        raise NotImplementedError
+
+    async def get_user(self, email: str) -> Optional[User]:
+        """
+        Look a user up.
+
+        Raises:
+            UserStoreError: The database failed
+        """
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        """Return backend counters"""
+        return {}
+
+    async def close(self) -> None:
+        """Release connections"""
+
+
+class UserCache:
+    """
+    LRU of known users.
+
+    Users are never deleted and ``created_at`` never changes, so cached
+    entries cannot go stale, even with several workers writing.
+    """
+
+    def __init__(self, max_entries: int = USER_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, User]" = OrderedDict()
+
+    def get(self, email: str) -> Optional[User]:
+        user = self._entries.get(email)
+        if user is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(email)
+        self.hits += 1
+        return user
+
+    def put(self, user: User) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[user.email] = user
+        self._entries.move_to_end(user.email)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Fixed SQL text, so each connection's statement cache prepares every statement once
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    email TEXT PRIMARY KEY,
+    created_at REAL NOT NULL
+) WITHOUT ROWID
+"""
+_INSERT_USER = "INSERT INTO users (email, created_at) VALUES (?, ?) ON CONFLICT (email) DO NOTHING"
+_SELECT_USER = "SELECT email, created_at FROM users WHERE email = ?"
+
+
+class SqliteUserRepository(UserRepository):
+    """
+    Users in a SQLite database, accessed from a small thread pool.
+
+    Each pool thread opens its own connection on first use, so
+    ``pool_size`` is both the number of connections and of concurrent
+    queries; the event loop never blocks on the database. Connections run
+    in WAL mode with ``synchronous=NORMAL`` and reuse their prepared
+    statements through sqlite3's statement cache.
+
+    ``ensure_user`` answers known users from the read-through ``UserCache``.
+    On a miss it reads the row, and only for a first login takes the write
+    lock for an ``INSERT ... ON CONFLICT DO NOTHING`` followed by a read of
+    the row, in one transaction. Concurrent first logins for the same
+    email, from any worker, all return the same ``created_at``.
+
+    Args:
+        path: Database file, created with its directory if missing
+        pool_size: Connections
+        cache_entries: Read-through cache size; 0 disables it
+    """
+
+    def __init__(self, path: str, pool_size: int = USER_STORE_POOL_SIZE, cache_entries: int = USER_CACHE_ENTRIES):
+        self.path = path
+        self.pool_size = max(1, pool_size)
+        self.cache = UserCache(cache_entries)
+        self.created = 0
+        self.queries = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    async def ensure_user(self, email: str) -> Tuple[User, bool]:
+        user = self.cache.get(email)
+        if user is not None:
+            return user, False
+        start = time.perf_counter()
+        user, created = await self._run(self._ensure, email)
+        user_store_latency.observe(time.perf_counter() - start, operation="ensure_user")
+        if created:
+            self.created += 1
+        self.cache.put(user)
+        return user, created
+
+    async def get_user(self, email: str) -> Optional[User]:
+        user = self.cache.get(email)
+        if user is not None:
+            return user
+        start = time.perf_counter()
+        user = await self._run(self._select, email)
+        user_store_latency.observe(time.perf_counter() - start, operation="get_user")
+        if user is not None:
+            self.cache.put(user)
+        return user
+
+    def stats(self) -> dict:
+        return {
+            "connections": len(self._connections),
+            "cached_users": len(self.cache),
+            "cache_hits": self.cache.hits,
+            "cache_misses": self.cache.misses,
+            "created": self.created,
+            "queries": self.queries
+        }
+
+    async def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections = []
+        self._local = threading.local()
+
+    async def _run(self, fn: Callable[[sqlite3.Connection, str], T], email: str) -> T:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="user-store")
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, self._with_connection, fn, email)
+        except sqlite3.Error as e:
+            logger.error("User store query failed", extra={"fields": {"error": str(e)}})
+            raise UserStoreError(str(e)) from e
+
+    def _with_connection(self, fn: Callable[[sqlite3.Connection, str], T], email: str) -> T:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+        self.queries += 1
+        return fn(connection, email)
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Autocommit mode; _ensure manages its own transaction
+        connection = sqlite3.connect(
+            self.path, timeout=USER_STORE_BUSY_TIMEOUT, isolation_level=None, check_same_thread=False
+        )
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(_SCHEMA)
+        with self._lock:
+            self._connections.append(connection)
+        return connection
+
+    @staticmethod
+    def _ensure(connection: sqlite3.Connection, email: str) -> Tuple[User, bool]:
+        # Known users only need a read, which WAL serves without the write lock
+        row = connection.execute(_SELECT_USER, (email,)).fetchone()
+        if row is not None:
+            return User(row[0], row[1]), False
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            created = connection.execute(_INSERT_USER, (email, time.time())).rowcount == 1
+            row = connection.execute(_SELECT_USER, (email,)).fetchone()
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return User(row[0], row[1]), created
+
+    @staticmethod
+    def _select(connection: sqlite3.Connection, email: str) -> Optional[User]:
+        row = connection.execute(_SELECT_USER, (email,)).fetchone()
+        return User(row[0], row[1]) if row else None
+
+
+def create_user_repository(url: Optional[str] = USER_STORE_URL) -> UserRepository:
+    """
+    Build the user backend named by ``url``.
+
+    Args:
+        url: ``sqlite:///<path>``, or empty for ``DEFAULT_USER_DB_PATH``
+
+    Returns:
+        The repository
+
+    Raises:
+        ValueError: Unsupported URL scheme
+    """
+    if not url:
+        return SqliteUserRepository(DEFAULT_USER_DB_PATH)
+    scheme, _, path = url.partition("://")
+    if scheme != "sqlite" or not path.startswith("/"):
+        raise ValueError(f"Unsupported USER_STORE_URL {url!r}, expected sqlite:///<path>")
+    return SqliteUserRepository(path[1:])
+
+
+# Shared by the auth endpoints of this worker
+user_repository = create_user_repository()
+StatsCollector(
+    "user_store", "Persistent user repository", user_repository.stats,
+    counters=("cache_hits", "cache_misses", "created", "queries")
+)
@@ -0,0 +1,362 @@
+"""
+Offline API benchmark: runs the backend (uvicorn, in a subprocess) against
+the fake Gemini server and drives the itinerary and auth endpoints at fixed
+concurrency levels. Reports throughput, p50/p95/p99 latency, error counts
+and the backend's memory, and can store or compare against a baseline.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_api --scenarios itinerary request_otp verify_otp \\
+        --levels 1 8 32 --latency 0.2 --error-rate 0.05
+
+    # OTP requests against a slow, flaky fake EmailJS instead of only logging the codes
+    python -m benchmarks.bench_api --scenarios request_otp --emailjs-latency 1.0 --emailjs-error-rate 0.2
+
+    # OTPs in a local Redis stand-in instead of worker memory
+    python -m benchmarks.bench_api --scenarios request_otp --redis
+
+    # Record a baseline, then check a later run against it
+    python -m benchmarks.bench_api --save-baseline benchmarks/baselines/default.json
+    python -m benchmarks.bench_api --compare benchmarks/baselines/default.json
+
+With ``--compare`` the exit status is 1 when any throughput drops, or any
+p95 rises, by more than ``--tolerance``.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import requests
+
+from benchmarks.fake_gemini import FakeGeminiServer
+from benchmarks.fake_emailjs import FakeEmailJSServer
+from benchmarks.fake_redis import FakeRedisServer
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _backend_env(
+    fake: FakeGeminiServer,
+    max_level: int,
+    emailjs: Optional[FakeEmailJSServer] = None,
+    redis: Optional[FakeRedisServer] = None,
+    user_db: Optional[str] = None
+) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "GEMINI_API_KEY": "fake-key-for-local-benchmarks-only",
+        "GEMINI_TRANSPORT": "rest",
+        "GEMINI_API_ENDPOINT": fake.endpoint,
+        # Empty EmailJS settings keep the OTP flow offline (codes are only logged)
+        "EMAILJS_SERVICE_ID": "",
+        "EMAILJS_PUBLIC_KEY": "",
+        "EMAILJS_TEMPLATE_ID": ""
+    })
+    if emailjs is not None:
+        env.update({
+            "EMAILJS_API_URL": emailjs.url,
+            "EMAILJS_SERVICE_ID": "bench_service",
+            "EMAILJS_PUBLIC_KEY": "bench_public_key",
+            "EMAILJS_TEMPLATE_ID": "bench_template"
+        })
+    if redis is not None:
+        env["OTP_STORE_URL"] = redis.url
+    # verify_otp logins create users; keep them out of data/users.db
+    if user_db is not None:
+        env.setdefault("USER_STORE_URL", "sqlite:///" + user_db)
+    env.setdefault("LOG_LEVEL", "WARNING")
+    # Measure raw pipeline throughput, not the production quota budget
+    env.setdefault("GEMINI_RPM", "1000000")
+    env.setdefault("GEMINI_CONCURRENCY_INITIAL", str(max_level))
+    env.setdefault("GEMINI_CONCURRENCY_MAX", str(max_level))
+    env.setdefault("GEMINI_THROTTLE_COOLDOWN", "1")
+    # Every benchmark request comes from 127.0.0.1; only the per-email rules apply
+    env.setdefault("AUTH_RATE_LIMIT_REQUEST_IP", "1000000000/600")
+    env.setdefault("AUTH_RATE_LIMIT_VERIFY_IP", "1000000000/600")
+    return env
+
+
+def _start_backend(port: int, env: Dict[str, str]) -> subprocess.Popen:
+    """Start uvicorn in a subprocess so its memory is measured on its own"""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+        # Application logs go to stdout; keep them out of the report
+        stdout=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Backend exited with status {process.returncode}")
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return process
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Backend did not start within 30 seconds")
+
+
+def _memory_mb(pid: int) -> Dict[str, Optional[float]]:
+    """Current and peak resident memory of a process (Linux only, else None)"""
+    values: Dict[str, Optional[float]] = {"rss_mb": None, "peak_rss_mb": None}
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    values["rss_mb"] = round(int(line.split()[1]) / 1024, 1)
+                elif line.startswith("VmHWM:"):
+                    values["peak_rss_mb"] = round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return values
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+# Scenario callables take (session, base_url, unique tag, **PREPARE results) and return the HTTP status
+
+def _itinerary(session: requests.Session, base_url: str, tag: str) -> int:
+    # Unique descriptions so the cache and request coalescing don't short-circuit Gemini
+    payload = {"trip_description": f"5 days in Paris, romantic ({tag})", "destination": "Paris", "days": 5}
+    return session.post(f"{base_url}/api/generate-itinerary", json=payload, timeout=60).status_code
+
+
+def _request_otp(session: requests.Session, base_url: str, tag: str) -> int:
+    return session.post(f"{base_url}/auth/request-otp", json={"email": f"bench-{tag}@example.com"}, timeout=30).status_code
+
+
+def _verify_otp(session: requests.Session, base_url: str, tag: str, otp: str) -> int:
+    # A valid code, so this measures the full token path
+    payload = {"email": f"bench-{tag}@example.com", "otp": otp}
+    return session.post(f"{base_url}/auth/verify-otp", json=payload, timeout=30).status_code
+
+
+def _issue_otp(session: requests.Session, base_url: str, tag: str, emailjs: FakeEmailJSServer) -> dict:
+    """Request an OTP for the tag's email and read it from the fake EmailJS (not timed)"""
+    _request_otp(session, base_url, tag)
+    return {"otp": emailjs.wait_for_otp(f"bench-{tag}@example.com")}
+
+
+def _request_otp_flood(session: requests.Session, base_url: str, tag: str) -> int:
+    # One email over and over: after the first few, these are rate-limited 429s
+    return session.post(f"{base_url}/auth/request-otp", json={"email": "bench-flood@example.com"}, timeout=30).status_code
+
+
+SCENARIOS: Dict[str, Callable[[requests.Session, str, str], int]] = {
+    "itinerary": _itinerary,
+    "request_otp": _request_otp,
+    "request_otp_flood": _request_otp_flood,
+    "verify_otp": _verify_otp
+}
+
+# Untimed setup before each request of a scenario; returns extra arguments for its callable
+PREPARE: Dict[str, Callable[[requests.Session, str, str, FakeEmailJSServer], dict]] = {
+    "verify_otp": _issue_otp
+}
+
+
+def run_level(
+    base_url: str, scenario: str, concurrency: int, total: int, pid: int, emailjs: Optional[FakeEmailJSServer] = None
+) -> dict:
+    """Send ``total`` requests with ``concurrency`` workers and summarize them"""
+    call = SCENARIOS[scenario]
+    prepare = PREPARE.get(scenario)
+    session = requests.Session()
+    session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=concurrency))
+
+    def timed(i: int):
+        tag = f"{scenario}-{concurrency}-{i}"
+        try:
+            prepared = prepare(session, base_url, tag, emailjs) if prepare else {}
+        except (requests.RequestException, TimeoutError):
+            return 0, 0.0
+        start = time.perf_counter()
+        try:
+            status = call(session, base_url, tag, **prepared)
+        except requests.RequestException:
+            status = 0
+        return status, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(timed, range(total)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for _, latency in results)
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": total,
+        "ok": sum(1 for status, _ in results if status == 200),
+        "seconds": round(elapsed, 3),
+        "throughput": round(total / elapsed, 2),
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 2),
+        **_memory_mb(pid)
+    }
+
+
+def compare(results: List[dict], baseline: dict, tolerance: float) -> List[str]:
+    """
+    Compare results with a stored baseline.
+
+    Returns:
+        One message per regression (throughput down or p95 up by more than
+        ``tolerance``); empty when nothing regressed
+    """
+    previous = {(row["scenario"], row["concurrency"]): row for row in baseline["results"]}
+    regressions = []
+    for row in results:
+        old = previous.get((row["scenario"], row["concurrency"]))
+        if old is None:
+            continue
+        if row["throughput"] < old["throughput"] * (1 - tolerance):
+            regressions.append(
+                f"{row['scenario']} @ {row['concurrency']}: throughput {old['throughput']} -> {row['throughput']} req/s"
+            )
+        if row["p95_ms"] > old["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{row['scenario']} @ {row['concurrency']}: p95 {old['p95_ms']} -> {row['p95_ms']} ms")
+    return regressions
+
+
+def _print_row(row: dict, baseline_row: Optional[dict]) -> None:
+    delta = ""
+    if baseline_row:
+        change = (row["throughput"] - baseline_row["throughput"]) / baseline_row["throughput"] * 100
+        delta = f" {change:>+7.1f}%"
+    rss = "-" if row["rss_mb"] is None else f"{row['rss_mb']:.1f}"
+    print(f"{row['scenario']:>17} {row['concurrency']:>5} {row['requests']:>6} {row['ok']:>5} "
+          f"{row['throughput']:>8.2f} {row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f} {rss:>7}{delta}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=["itinerary", "request_otp", "verify_otp"])
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--rounds", type=int, default=8, help="requests per worker at each level")
+    parser.add_argument("--latency", type=float, default=0.2, help="fake Gemini latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of Gemini calls that fail")
+    parser.add_argument("--error-status", type=int, default=500, help="HTTP status of injected Gemini failures")
+    parser.add_argument("--days", type=int, default=5, help="days per fake itinerary")
+    parser.add_argument("--padding", type=int, default=0, help="extra characters per activity description")
+    parser.add_argument("--seed", type=int, default=1234, help="seed for the error injection")
+    parser.add_argument("--emailjs-latency", type=float, help="send OTP emails to a fake EmailJS with this latency (default: only log them)")
+    parser.add_argument("--emailjs-error-rate", type=float, default=0.0, help="fraction of fake EmailJS sends that fail with 500")
+    parser.add_argument("--redis", action="store_true", help="keep OTPs in a fake Redis server (OTP_STORE_URL) instead of memory")
+    parser.add_argument("--save-baseline", metavar="PATH", help="write the results to a baseline file")
+    parser.add_argument("--compare", metavar="PATH", help="compare the results with a baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression for --compare")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    fake = FakeGeminiServer(
+        latency=args.latency, num_days=args.days, error_rate=args.error_rate,
+        error_status=args.error_status, padding=args.padding, seed=args.seed
+    ).start()
+    emailjs = None
+    if args.emailjs_latency is not None:
+        emailjs = FakeEmailJSServer(latency=args.emailjs_latency, error_rate=args.emailjs_error_rate, seed=args.seed).start()
+    elif "verify_otp" in args.scenarios:
+        # verify_otp logs in with the codes the fake EmailJS receives
+        emailjs = FakeEmailJSServer(latency=0).start()
+    redis = FakeRedisServer().start() if args.redis else None
+    port = _free_port()
+    user_dir = tempfile.mkdtemp(prefix="bench-api-users-")
+    backend = _start_backend(port, _backend_env(fake, max(args.levels), emailjs, redis, os.path.join(user_dir, "users.db")))
+    base_url = f"http://127.0.0.1:{port}"
+
+    config = {
+        "latency": args.latency,
+        **({"emailjs_latency": args.emailjs_latency, "emailjs_error_rate": args.emailjs_error_rate} if args.emailjs_latency is not None else {}),
+        **({"otp_store": "redis"} if redis else {}),
+        "error_rate": args.error_rate,
+        "error_status": args.error_status,
+        "response_chars": fake.response_chars,
+        "rounds": args.rounds
+    }
+    print("config: " + ", ".join(f"{key}={value}" for key, value in config.items()))
+    print(f"{'scenario':>17} {'conc':>5} {'reqs':>6} {'ok':>5} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'rss MB':>7}"
+          + (" vs base" if baseline else ""))
+
+    previous = {(row["scenario"], row["concurrency"]): row for row in baseline["results"]} if baseline else {}
+    results = []
+    try:
+        for scenario in args.scenarios:
+            # One warm-up request (imports, first Gemini connection, OTP email workers)
+            warmup = requests.Session()
+            prepared = PREPARE[scenario](warmup, base_url, f"{scenario}-warmup", emailjs) if scenario in PREPARE else {}
+            SCENARIOS[scenario](warmup, base_url, f"{scenario}-warmup", **prepared)
+            for level in args.levels:
+                row = run_level(base_url, scenario, level, level * args.rounds, backend.pid, emailjs)
+                results.append(row)
+                _print_row(row, previous.get((scenario, level)))
+    finally:
+        backend.terminate()
+        backend.wait(timeout=10)
+        shutil.rmtree(user_dir, ignore_errors=True)
+        fake.stop()
+        if emailjs is not None:
+            emailjs.stop()
+        if redis is not None:
+            redis.stop()
+    print(f"fake Gemini: {fake.requests} generate calls, {fake.errors} injected errors")
+    if emailjs is not None:
+        print(f"fake EmailJS: {emailjs.sent} emails sent, {emailjs.errors} injected errors")
+    if redis is not None:
+        print(f"fake Redis: {redis.commands} commands, {redis.keys()} live keys")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_baseline)), exist_ok=True)
+        with open(args.save_baseline, "w") as baseline_file:
+            json.dump({
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "config": config,
+                "results": results
+            }, baseline_file, indent=2)
+            baseline_file.write("\n")
+        print(f"Baseline written to {args.save_baseline}")
+
+    if baseline:
+        if baseline.get("config") != config:
+            print("Warning: baseline was recorded with a different configuration")
+        regressions = compare(results, baseline, args.tolerance)
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
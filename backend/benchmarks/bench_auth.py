@@ -0,0 +1,63 @@
+"""
+Cost of access-token checks: a full jwt.decode per request (the previous
+verify_token) against decode_access_token with its verified-token cache,
+for a population of users each sending many requests with one token.
+
+    python -m benchmarks.bench_auth --users 100 10000 --requests 200000
+"""
+import argparse
+import random
+import time
+
+import jwt
+
+from app.services import jwt_auth
+from app.services.jwt_auth import ALGORITHM, decode_access_token, issue_access_token, token_cache
+
+
+def legacy_verify(token: str) -> str:
+    """The per-request check previously done by main.verify_token"""
+    payload = jwt.decode(token, jwt_auth._KEYS[jwt_auth.SIGNING_KID], algorithms=[ALGORITHM])
+    return payload["sub"]
+
+
+def cached_verify(token: str) -> str:
+    return decode_access_token(token)["sub"]
+
+
+def _measure(fn, stream):
+    start = time.perf_counter()
+    for token in stream:
+        fn(token)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=[100, 10000, 50000], help="distinct tokens in the request stream")
+    parser.add_argument("--requests", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    print(f"cache capacity {token_cache.max_entries}, {args.requests} requests per run")
+    print(f"{'users':>7} {'legacy us':>10} {'cached us':>10} {'speedup':>8} {'hit rate':>9} {'cached req/s':>13}")
+    for users in args.users:
+        rng = random.Random(args.seed)
+        tokens = [issue_access_token(f"user{i}@example.com") for i in range(users)]
+        # Skewed like real traffic: a few active users send most requests
+        stream = rng.choices(tokens, weights=[1 / (rank + 1) for rank in range(users)], k=args.requests)
+
+        token_cache.clear()
+        hits_before, misses_before = token_cache.hits, token_cache.misses
+        legacy = _measure(legacy_verify, stream)
+        cached = _measure(cached_verify, stream)
+        hits = token_cache.hits - hits_before
+        misses = token_cache.misses - misses_before
+        print(
+            f"{users:>7} {legacy / args.requests * 1e6:>10.2f} {cached / args.requests * 1e6:>10.2f} "
+            f"{legacy / cached:>7.1f}x {hits / (hits + misses):>9.1%} {args.requests / cached:>13,.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
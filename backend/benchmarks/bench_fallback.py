@@ -0,0 +1,264 @@
+"""
+Micro-benchmarks for the fallback planner helpers, comparing each legacy
+implementation with the precomputed one on long trip descriptions.
+
+    python -m benchmarks.bench_fallback --sizes 200 2000 20000 --catalog-sizes 100 5000
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from schemas import Activity, DayPlan, TripRequest
+from app.services.ai_planner import (
+    _extract_destination, _extract_style_keywords, _generate_activities, _generate_mock_itinerary
+)
+from app.services.activity_catalog import ActivityCatalog, compile_catalog
+
+FILLER = "sunny morning walks through museums and markets with friends then long quiet dinners near the hotel".split()
+
+
+def legacy_extract_destination(description: str) -> str:
+    """The linear scans previously used by the planner"""
+    destinations = [
+        "Paris", "Tokyo", "New York", "London", "Rome", "Barcelona",
+        "Bangkok", "Dubai", "Sydney", "Bali", "Hawaii", "Swiss Alps",
+        "Amsterdam", "Prague", "Vienna", "Berlin", "Madrid", "Lisbon",
+        "Athens", "Istanbul", "Cairo", "Marrakech", "Cape Town", "Santorini",
+        "Buenos Aires", "Rio de Janeiro", "Mexico City", "Los Angeles",
+        "San Francisco", "Toronto", "Vancouver", "Seoul", "Singapore",
+        "Hong Kong", "Shanghai", "Beijing", "Moscow", "Stockholm",
+        "Oslo", "Helsinki", "Copenhagen", "Dublin", "Edinburgh", "Andhra Pradesh"
+    ]
+    desc_lower = description.lower()
+    for dest in destinations:
+        if dest.lower() in desc_lower:
+            return dest
+    destination_variations = {
+        "new york": ["new york", "nyc", "new york city"],
+        "los angeles": ["los angeles", "la", "l.a."],
+        "san francisco": ["san francisco", "sf", "sfo"],
+        "london": ["london", "england", "uk", "united kingdom"],
+        "paris": ["paris", "france"],
+        "tokyo": ["tokyo", "japan"],
+        "sydney": ["sydney", "australia"],
+        "rome": ["rome", "italy"],
+        "berlin": ["berlin", "germany"],
+        "madrid": ["madrid", "spain"]
+    }
+    for dest, variations in destination_variations.items():
+        proper_dest = {"new york": "New York", "san francisco": "San Francisco", "los angeles": "Los Angeles"}.get(dest, dest.title())
+        for variation in variations:
+            if variation in desc_lower:
+                return proper_dest
+    for word in description.split():
+        clean_word = ''.join(c for c in word if c.isalpha())
+        if clean_word and clean_word[0].isupper() and len(clean_word) > 2:
+            for dest in destinations:
+                if dest.lower() == clean_word.lower():
+                    return dest
+    return "Tokyo"
+
+
+def legacy_extract_style_keywords(description: str, tags) -> list:
+    """The nested category/keyword scan previously used by the planner"""
+    all_keywords = tags + description.lower().split()
+    style_categories = {
+        "relaxing": ["relax", "relaxing", "chill", "peaceful", "serene", "calm", "spa", "beach"],
+        "adventure": ["adventure", "thrill", "exciting", "explore", "hiking", "trekking", "outdoor"],
+        "luxury": ["luxury", "luxurious", "expensive", "high-end", "premium", "five-star"],
+        "budget": ["budget", "cheap", "affordable", "low-cost", "economical"],
+        "family": ["family", "kids", "children", "parents"],
+        "romantic": ["romantic", "couple", "honeymoon", "love", "date"],
+        "cultural": ["cultural", "culture", "museum", "art", "heritage", "local"],
+        "historical": ["historical", "history", "ancient", "historic", "monument"],
+        "beach": ["beach", "coast", "ocean", "sea", "sand", "surf"],
+        "mountain": ["mountain", "hills", "peak", "summit", "alpine"],
+        "city": ["city", "urban", "metropolitan", "downtown"],
+        "nature": ["nature", "wildlife", "forest", "park", "natural"]
+    }
+    found_keywords = []
+    for category, keywords in style_categories.items():
+        for keyword in keywords:
+            if keyword in [k.lower() for k in all_keywords]:
+                found_keywords.append(category.capitalize())
+                break
+    if not found_keywords:
+        found_keywords.append("Cultural")
+    return found_keywords[:3]
+
+
+def legacy_generic_activities(day_number: int, destination: str, tags) -> list:
+    """The per-call Activity construction previously used for generic destinations"""
+    activities = [
+        Activity(timeOfDay="morning", title=f"Morning Exploration in {destination}",
+                 description=f"Start your day with a guided tour of {destination}'s iconic landmarks.",
+                 location=f"Downtown {destination}", category="Sightseeing", estimatedCost=0.0, bookingRequired=False),
+        Activity(timeOfDay="afternoon", title="Local Cuisine Experience",
+                 description="Enjoy a traditional meal at a renowned local restaurant.",
+                 location=f"Local Restaurant in {destination}", category="Food & Drink", estimatedCost=25.0, bookingRequired=True),
+        Activity(timeOfDay="evening", title="Evening Entertainment",
+                 description="Experience the nightlife and entertainment options.",
+                 location=f"{destination} Entertainment District", category="Entertainment", estimatedCost=30.0, bookingRequired=False)
+    ]
+    if "Adventure" in tags:
+        activities.append(Activity(timeOfDay="morning", title="Adventure Activity", description="Thrilling outdoor adventure experience.",
+                                   location=f"{destination} Adventure Park", category="Adventure", estimatedCost=75.0, bookingRequired=True))
+    if "Romantic" in tags:
+        activities.append(Activity(timeOfDay="evening", title="Romantic Dinner", description="Intimate dinner for two at a romantic venue.",
+                                   location=f"Romantic Restaurant in {destination}", category="Dining", estimatedCost=150.0, bookingRequired=True))
+    start_idx = (day_number - 1) * 2
+    return activities[start_idx:start_idx + 3]
+
+
+def legacy_day_plans(num_days: int, destination: str, tags) -> list:
+    """Day plans the old way: theme/summary lists and all activities rebuilt for every day"""
+    days = []
+    for day_number in range(1, num_days + 1):
+        themes = ["Exploring the City", "Cultural Immersion", "Scenic Adventures",
+                  "Local Experiences", "Historical Journey", "Gastronomic Delights"]
+        summaries = [f"Discover the highlights of {destination} on day {day_number}",
+                     f"Immerse yourself in the local culture of {destination}",
+                     f"Experience the natural beauty surrounding {destination}",
+                     f"Taste the authentic flavors of {destination}",
+                     f"Uncover the history and heritage of {destination}"]
+        days.append(DayPlan(
+            dayNumber=day_number,
+            theme=themes[(day_number - 1) % len(themes)],
+            summary=summaries[(day_number - 1) % len(summaries)],
+            activities=legacy_generic_activities(day_number, destination, tags)
+        ))
+    return days
+
+
+def _synthetic_catalog(destinations: int) -> dict:
+    """A catalog with ``destinations`` entries of six activities each"""
+    entries = {}
+    for index in range(destinations):
+        name = f"Destination {index}"
+        entries[name] = {"activities": [
+            {"timeOfDay": time_of_day, "title": f"{name} highlight {slot}", "description": f"Activity {slot} in {name}.",
+             "location": f"{name} district {slot}", "category": "Sightseeing", "estimatedCost": 10.0 * slot,
+             "bookingRequired": slot % 2 == 0, "latitude": 10.0 + index / 1000, "longitude": 20.0 + slot / 100}
+            for slot, time_of_day in enumerate(("morning", "afternoon", "evening") * 2)
+        ]}
+    return {"destinations": entries}
+
+
+def _description(size: int, destination: str) -> str:
+    """Filler text of about ``size`` characters, naming the destination at the end"""
+    words = []
+    length = 0
+    while length < size:
+        word = FILLER[len(words) % len(FILLER)]
+        words.append(word)
+        length += len(word) + 1
+    if destination:
+        words.append(f"in {destination}.")
+    return " ".join(words)
+
+
+def _per_call(fn, *args, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(*args)
+    return (time.perf_counter() - start) / iterations
+
+
+def bench_destinations(args) -> None:
+    sizes, iterations = args.sizes, args.iterations
+    print("destination extraction")
+    print(f"{'chars':>7} {'destination':>12} {'legacy us':>10} {'index us':>10}")
+    for size in sizes:
+        for destination in ("Prague", ""):
+            text = _description(size, destination)
+            assert legacy_extract_destination(text) == _extract_destination(text)
+            legacy = _per_call(legacy_extract_destination, text, iterations=iterations)
+            indexed = _per_call(_extract_destination, text, iterations=iterations)
+            print(f"{len(text):>7} {destination or '(none)':>12} {legacy * 1e6:>10.1f} {indexed * 1e6:>10.1f}")
+
+
+def bench_keywords(args) -> None:
+    sizes, iterations = args.sizes, args.iterations
+    print("style keywords")
+    print(f"{'chars':>7} {'tags':>5} {'legacy us':>10} {'index us':>10}")
+    # The legacy scan rebuilds the word list per keyword; keep its iteration count bounded
+    iterations = max(1, iterations // 20)
+    for size in sizes:
+        for tag_count in (3, 500):
+            text = _description(size, "Prague") + " We love the beach."
+            tags = [f"Tag{i}" for i in range(tag_count - 1)] + ["Adventure"]
+            legacy = _per_call(legacy_extract_style_keywords, text, tags, iterations=iterations)
+            indexed = _per_call(_extract_style_keywords, text, tags, iterations=iterations)
+            print(f"{len(text):>7} {tag_count:>5} {legacy * 1e6:>10.1f} {indexed * 1e6:>10.1f}")
+
+
+def bench_catalog(args) -> None:
+    print("activity catalog")
+    print(f"{'destinations':>12} {'file KB':>8} {'open ms':>8} {'open KB':>8} {'first us':>9} {'cached us':>10}")
+    for count in args.catalog_sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "activities.bin")
+            compile_catalog(_synthetic_catalog(count), path)
+            catalog = ActivityCatalog(path)
+            tracemalloc.start()
+            start = time.perf_counter()
+            catalog.activities("Destination 0")
+            opened = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            start = time.perf_counter()
+            catalog.activities(f"Destination {count - 1}")
+            first = time.perf_counter() - start
+            cached = _per_call(catalog.activities, f"Destination {count - 1}", iterations=args.iterations)
+            print(f"{count:>12} {os.path.getsize(path) / 1024:>8.0f} {opened * 1000:>8.2f} {peak / 1024:>8.0f} "
+                  f"{first * 1e6:>9.1f} {cached * 1e6:>10.2f}")
+
+    print()
+    print("activities per day (generic destination, two tags)")
+    tags = ["Adventure", "Romantic"]
+    legacy = _per_call(legacy_generic_activities, 1, "Prague", tags, iterations=args.iterations)
+    catalog_based = _per_call(_generate_activities, 1, "Prague", tags, iterations=args.iterations)
+    print(f"{'legacy us':>10} {'catalog us':>11}")
+    print(f"{legacy * 1e6:>10.1f} {catalog_based * 1e6:>11.1f}")
+
+
+def bench_dayplans(args) -> None:
+    print("fallback day plans (generic destination, two tags)")
+    print(f"{'days':>5} {'legacy us/day':>14} {'empty days':>11} {'pooled us/day':>14} {'empty days':>11}")
+    tags = ["Adventure", "Romantic"]
+    for num_days in args.days:
+        request = TripRequest(trip_description="A trip", destination="Prague", days=num_days, trip_tags=tags)
+        legacy_empty = sum(1 for day in legacy_day_plans(num_days, "Prague", tags) if not day.activities)
+        pooled_empty = sum(1 for day in _generate_mock_itinerary(request).days if not day.activities)
+        iterations = max(1, args.iterations // num_days)
+        legacy = _per_call(legacy_day_plans, num_days, "Prague", tags, iterations=iterations) / num_days
+        pooled = _per_call(_generate_mock_itinerary, request, iterations=iterations) / num_days
+        print(f"{num_days:>5} {legacy * 1e6:>14.1f} {legacy_empty:>11} {pooled * 1e6:>14.1f} {pooled_empty:>11}")
+
+
+BENCHMARKS = {
+    "destinations": bench_destinations,
+    "keywords": bench_keywords,
+    "catalog": bench_catalog,
+    "dayplans": bench_dayplans
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--benchmarks", nargs="+", choices=sorted(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[200, 2000, 20000], help="description lengths in characters")
+    parser.add_argument("--catalog-sizes", type=int, nargs="+", default=[100, 5000], help="destinations in the synthetic catalog")
+    parser.add_argument("--days", type=int, nargs="+", default=[1, 7, 30], help="itinerary lengths for the day plan case")
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    for name in args.benchmarks:
+        BENCHMARKS[name](args)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Peak memory and latency of receiving an inspiration image: the legacy
+inline base64 JSON body against the streaming upload into the image store.
+
+Each case runs in a fresh interpreter so its peak RSS is measured on its
+own (Linux only; Pillow's pixel buffers are not visible to tracemalloc).
+
+    python -m benchmarks.bench_images --sizes 2000x1500 6000x4000
+"""
+import argparse
+import base64
+import hashlib
+import importlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from PIL import Image
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHUNK_BYTES = 64 * 1024
+
+
+def _memory_kb(field: str) -> int:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+def _make_image(path: str, width: int, height: int) -> None:
+    """A noisy photo-sized JPEG, so it compresses about as badly as a real photo"""
+    noise = Image.effect_noise((width, height), 48)
+    gradient = Image.linear_gradient("L").resize((width, height))
+    Image.merge("RGB", (noise, gradient, noise.transpose(Image.Transpose.FLIP_LEFT_RIGHT))).save(path, "JPEG", quality=90)
+
+
+def _run_legacy(path: str) -> None:
+    """Old request path: whole JSON body, parsed model, cache key and mood hashes over the base64 string"""
+    from schemas import TripRequest
+    from app.services.itinerary_cache import request_cache_key
+
+    with open(path, "rb") as image_file:
+        body = json.dumps({"trip_description": "5 days in Paris", "inspiration_image": base64.b64encode(image_file.read()).decode()}).encode()
+    request = TripRequest.model_validate_json(body)
+    request_cache_key(request)
+    hashlib.md5(request.inspiration_image.encode()).hexdigest()
+
+
+def _run_stream(path: str) -> None:
+    """New request path: raw body chunks hashed and spooled, then downscaled once"""
+    import asyncio
+    from app.services.image_store import ImageStore
+
+    async def chunks():
+        with open(path, "rb") as image_file:
+            while True:
+                chunk = image_file.read(CHUNK_BYTES)
+                if not chunk:
+                    break
+                yield chunk
+
+    with tempfile.TemporaryDirectory() as root:
+        store = ImageStore(root=root, max_upload_bytes=1 << 30)
+        asyncio.run(store.put_stream(chunks()))
+        # A repeat upload is answered from the store
+        start = time.perf_counter()
+        asyncio.run(store.put_stream(chunks()))
+        print(json.dumps({"repeat_ms": round((time.perf_counter() - start) * 1000, 1)}))
+
+
+CASES = {"legacy": _run_legacy, "stream": _run_stream}
+
+
+def _child(case: str, path: str) -> None:
+    # Import everything the case needs before taking the baseline
+    for module in ("schemas", "app.services.image_store", "app.services.itinerary_cache"):
+        importlib.import_module(module)
+    before = _memory_kb("VmRSS")
+    start = time.perf_counter()
+    CASES[case](path)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"ms": round(elapsed * 1000, 1), "peak_mb": round((_memory_kb("VmHWM") - before) / 1024, 1)}))
+
+
+def _measure(case: str, path: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_images", "--child", case, path],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    result = {}
+    for line in output.splitlines():
+        result.update(json.loads(line))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", default=["2000x1500", "4000x3000", "6000x4000"], help="image sizes, WIDTHxHEIGHT")
+    parser.add_argument("--child", nargs=2, metavar=("CASE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(*args.child)
+        return
+
+    print(f"{'size':>10} {'file MB':>8} {'legacy ms':>10} {'legacy MB':>10} {'stream ms':>10} {'stream MB':>10} {'repeat ms':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            width, height = (int(value) for value in size.split("x"))
+            path = os.path.join(directory, f"{size}.jpg")
+            _make_image(path, width, height)
+            legacy = _measure("legacy", path)
+            stream = _measure("stream", path)
+            print(f"{size:>10} {os.path.getsize(path) / 1e6:>8.1f} {legacy['ms']:>10.1f} {legacy['peak_mb']:>10.1f} "
+                  f"{stream['ms']:>10.1f} {stream['peak_mb']:>10.1f} {stream['repeat_ms']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Compare the old regex extraction + json.loads + timeOfDay walk with the
+single-scan extract_itinerary_json on large multi-day responses.
+
+    python -m benchmarks.bench_parsing --days 7 14 30
+"""
+import argparse
+import json
+import re
+import time
+import tracemalloc
+
+from app.services.json_stream import extract_itinerary_json
+from schemas import Itinerary
+from benchmarks.fake_gemini import build_itinerary_json
+
+
+def legacy_extract(raw_text: str) -> dict:
+    """The three-pass extraction previously used by the planner"""
+    json_match = re.search(r'\{.*\}', raw_text, re.DOTALL)
+    json_text = json_match.group(0) if json_match else raw_text
+    itinerary_dict = json.loads(json_text)
+    for day_data in itinerary_dict['days']:
+        for activity_data in day_data['activities']:
+            time_of_day = activity_data['timeOfDay'].lower()
+            if 'morning' in time_of_day:
+                activity_data['timeOfDay'] = 'morning'
+            elif 'evening' in time_of_day or 'night' in time_of_day:
+                activity_data['timeOfDay'] = 'evening'
+            else:
+                activity_data['timeOfDay'] = 'afternoon'
+    return itinerary_dict
+
+
+def _model_response(num_days: int) -> str:
+    """Wrap the document the way Gemini often does: preamble and a code fence"""
+    body = build_itinerary_json(num_days).replace('"evening"', '"Late Evening"')
+    return "Here is your itinerary:\n```json\n" + body + "\n```\nEnjoy your trip!"
+
+
+def _measure(fn, text: str, iterations: int):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(text)
+    per_call = (time.perf_counter() - start) / iterations
+
+    tracemalloc.start()
+    fn(text)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return per_call, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, nargs="+", default=[7, 14, 30])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'days':>5} {'bytes':>8} {'legacy us':>10} {'single us':>10} {'legacy peak':>12} {'single peak':>12}")
+    for num_days in args.days:
+        text = _model_response(num_days)
+        # timeOfDay is normalized by the Activity schema now, so compare validated itineraries
+        assert Itinerary.model_validate(legacy_extract(text)) == Itinerary.model_validate(extract_itinerary_json(text))
+        legacy_time, legacy_peak = _measure(legacy_extract, text, args.iterations)
+        single_time, single_peak = _measure(extract_itinerary_json, text, args.iterations)
+        print(f"{num_days:>5} {len(text):>8} {legacy_time * 1e6:>10.1f} {single_time * 1e6:>10.1f} "
+              f"{legacy_peak:>12} {single_peak:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+First-login latency of the SQLite user repository under concurrent
+verifications, against the in-memory dict it replaced, plus repeat logins
+with and without the read-through cache.
+
+    python -m benchmarks.bench_users --logins 2000 --concurrency 1 16 64 --pool-sizes 1 4 8
+"""
+import os
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+from typing import List
+
+from app.services.user_store import SqliteUserRepository
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+async def _drive(call, emails: List[str], concurrency: int):
+    """Run ``call(email)`` for every email with ``concurrency`` in flight; returns (seconds, latencies)"""
+    latencies: List[float] = []
+    queue = iter(emails)
+
+    async def worker():
+        for email in queue:
+            start = time.perf_counter()
+            await call(email)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - start, sorted(latencies)
+
+
+def _row(label: str, concurrency: int, count: int, elapsed: float, latencies: List[float]) -> str:
+    return (
+        f"{label:>18} {concurrency:>5} {count / elapsed:>10,.0f} "
+        f"{_percentile(latencies, 0.5) * 1000:>8.3f} {_percentile(latencies, 0.95) * 1000:>8.3f} "
+        f"{_percentile(latencies, 0.99) * 1000:>8.3f}"
+    )
+
+
+async def run(args) -> None:
+    directory = tempfile.mkdtemp(prefix="bench-users-")
+    print(f"{'store':>18} {'conc':>5} {'logins/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    try:
+        for concurrency in args.concurrency:
+            emails = [f"user{i}-{concurrency}@example.com" for i in range(args.logins)]
+
+            users = {}
+
+            async def legacy(email: str) -> None:
+                if email not in users:
+                    users[email] = {"email": email, "created_at": time.time()}
+
+            print(_row("dict", concurrency, args.logins, *await _drive(legacy, emails, concurrency)))
+
+            for pool_size in args.pool_sizes:
+                path = os.path.join(directory, f"users-{concurrency}-{pool_size}.db")
+                repository = SqliteUserRepository(path, pool_size=pool_size, cache_entries=0)
+                elapsed, latencies = await _drive(repository.ensure_user, emails, concurrency)
+                print(_row(f"sqlite pool={pool_size}", concurrency, args.logins, elapsed, latencies))
+                elapsed, latencies = await _drive(repository.ensure_user, emails, concurrency)
+                print(_row("  repeat, no cache", concurrency, args.logins, elapsed, latencies))
+                await repository.close()
+
+            cached = SqliteUserRepository(os.path.join(directory, f"users-{concurrency}-cached.db"), pool_size=max(args.pool_sizes))
+            await _drive(cached.ensure_user, emails, concurrency)
+            elapsed, latencies = await _drive(cached.ensure_user, emails, concurrency)
+            print(_row("  repeat, cached", concurrency, args.logins, elapsed, latencies))
+            await cached.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=2000, help="distinct first logins per run")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[1, 4, 8])
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
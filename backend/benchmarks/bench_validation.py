@@ -0,0 +1,75 @@
+"""
+Per-itinerary validation cost: hand-built nested models plus FastAPI's
+response_model re-validation versus one pydantic-core JSON-mode call plus a
+direct model_dump_json.
+
+    python -m benchmarks.bench_validation --days 1 7 30
+"""
+import argparse
+import json
+import time
+
+from pydantic import TypeAdapter
+
+from schemas import Activity, DayPlan, Itinerary, ItineraryMeta
+from benchmarks.fake_gemini import build_itinerary_json
+
+_response_adapter = TypeAdapter(Itinerary)
+
+
+def legacy_build(json_text: str) -> Itinerary:
+    """json.loads followed by the hand-built nested models the planner used to construct"""
+    itinerary_dict = json.loads(json_text)
+    days = []
+    for day_data in itinerary_dict['days']:
+        activities = [Activity(**activity_data) for activity_data in day_data['activities']]
+        days.append(DayPlan(
+            dayNumber=day_data['dayNumber'],
+            date=day_data.get('date'),
+            theme=day_data['theme'],
+            summary=day_data['summary'],
+            activities=activities
+        ))
+    return Itinerary(
+        destination=itinerary_dict['destination'],
+        numDays=itinerary_dict['numDays'],
+        styleKeywords=itinerary_dict['styleKeywords'],
+        imageMoodSummary=itinerary_dict.get('imageMoodSummary'),
+        days=days,
+        meta=ItineraryMeta(**itinerary_dict['meta'])
+    )
+
+
+def legacy_response(itinerary: Itinerary) -> bytes:
+    """What response_model=Itinerary does on the way out: dump, re-validate, serialize"""
+    validated = _response_adapter.validate_python(itinerary.model_dump())
+    return json.dumps(_response_adapter.dump_python(validated, mode="json")).encode()
+
+
+def _per_call(fn, arg, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(arg)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, nargs="+", default=[1, 7, 30])
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"{'days':>5} {'legacy build us':>16} {'json mode us':>13} {'legacy resp us':>15} {'dump_json us':>13}")
+    for num_days in args.days:
+        text = build_itinerary_json(num_days)
+        itinerary = Itinerary.model_validate_json(text)
+        assert legacy_build(text) == itinerary
+        print(f"{num_days:>5} "
+              f"{_per_call(legacy_build, text, args.iterations):>16.1f} "
+              f"{_per_call(Itinerary.model_validate_json, text, args.iterations):>13.1f} "
+              f"{_per_call(legacy_response, itinerary, args.iterations):>15.1f} "
+              f"{_per_call(Itinerary.model_dump_json, itinerary, args.iterations):>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Local stand-in for the EmailJS send endpoint, used for offline benchmarks.
+
+Point the backend at it with:
+    EMAILJS_API_URL=http://127.0.0.1:<port>/api/v1.0/email/send
+
+plus any non-placeholder EMAILJS_SERVICE_ID, EMAILJS_PUBLIC_KEY and
+EMAILJS_TEMPLATE_ID, or run it on its own:
+
+    python -m benchmarks.fake_emailjs --port 8766 --latency 1.0 --error-rate 0.2
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+SEND_PATH = "/api/v1.0/email/send"
+
+
+class FakeEmailJSServer:
+    """
+    Threaded HTTP server answering EmailJS sends with "OK" after ``latency``
+    seconds. The last OTP sent to each address is kept, so benchmarks can
+    log in with it (``wait_for_otp``).
+
+    Args:
+        latency: Seconds to sleep before answering
+        port: Port to bind (0 picks a free one)
+        error_rate: Fraction of sends answered with ``error_status``
+        error_status: HTTP status of injected errors (5xx and 429 are retried)
+        seed: Seed for the error injection, for repeatable runs
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.5,
+        port: int = 0,
+        error_rate: float = 0.0,
+        error_status: int = 500,
+        seed: Optional[int] = None
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.sent = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._otps: Dict[str, str] = {}
+        self._sent = threading.Condition()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._make_handler())
+        self._server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{SEND_PATH}"
+
+    def start(self) -> "FakeEmailJSServer":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def wait_for_otp(self, email: str, timeout: float = 30.0) -> str:
+        """
+        Return (and forget) the OTP last sent to ``email``, waiting for it.
+
+        Raises:
+            TimeoutError: No OTP arrived within ``timeout`` seconds
+        """
+        with self._sent:
+            if not self._sent.wait_for(lambda: email in self._otps, timeout):
+                raise TimeoutError(f"No OTP sent to {email} within {timeout} seconds")
+            return self._otps.pop(email)
+
+    def _record(self, body: bytes) -> None:
+        try:
+            params = json.loads(body)["template_params"]
+        except (ValueError, KeyError, TypeError):
+            return
+        with self._sent:
+            self._otps[params["to_email"]] = params["otp_code"]
+            self._sent.notify_all()
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive, like the real service
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                request_body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                time.sleep(fake.latency)
+                with fake._lock:
+                    failed = fake._random.random() < fake.error_rate
+                    if failed:
+                        fake.errors += 1
+                    else:
+                        fake.sent += 1
+                status, body = (fake.error_status, b"Internal error") if failed else (200, b"OK")
+                if self.path != SEND_PATH:
+                    status, body = 404, b"Not found"
+                elif not failed:
+                    fake._record(request_body)
+                self.send_response(status)
+                self.send_header("Content-Type", "text/plain")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake EmailJS server for offline benchmarks")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    args = parser.parse_args()
+    server = FakeEmailJSServer(args.latency, args.port, args.error_rate, args.error_status).start()
+    print(f"Fake EmailJS listening on {server.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+Local stand-in for the Gemini REST API, used for offline benchmarks.
+
+Point the backend at it with:
+    GEMINI_TRANSPORT=rest GEMINI_API_ENDPOINT=http://127.0.0.1:<port>
+
+or run it on its own:
+
+    python -m benchmarks.fake_gemini --port 8765 --latency 0.5 --error-rate 0.05
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+MODEL_NAME = "models/gemini-flash-latest"
+
+
+def build_itinerary_json(num_days: int = 5, destination: str = "Paris", padding: int = 0) -> str:
+    """
+    Build a schema-compatible itinerary document like the one Gemini returns.
+    
+    Args:
+        num_days: Number of days
+        destination: Destination name used throughout the text
+        padding: Extra characters appended to every activity description,
+            to grow the response without changing its shape
+    """
+    filler = " Lorem ipsum" * (padding // 12) + "." * (padding % 12)
+    days = []
+    for day_number in range(1, num_days + 1):
+        activities = []
+        for time_of_day in ("morning", "afternoon", "evening"):
+            activities.append({
+                "timeOfDay": time_of_day,
+                "title": f"Day {day_number} {time_of_day} in {destination}",
+                "description": f"A {time_of_day} activity exploring {destination}.{filler}",
+                "location": f"{destination} Old Town",
+                "category": "Sightseeing",
+                "estimatedCost": 25.0,
+                "bookingRequired": False,
+                "latitude": 48.8566,
+                "longitude": 2.3522
+            })
+        days.append({
+            "dayNumber": day_number,
+            "date": None,
+            "theme": f"Day {day_number} highlights",
+            "summary": f"Discover {destination} on day {day_number}",
+            "activities": activities
+        })
+    return json.dumps({
+        "destination": destination,
+        "numDays": num_days,
+        "styleKeywords": ["Cultural"],
+        "imageMoodSummary": None,
+        "days": days,
+        "meta": {"currency": "EUR", "budgetLevel": "Medium", "notes": "Fake Gemini response"}
+    })
+
+
+# Answer to multimodal (image mood) prompts
+FAKE_MOOD_JSON = json.dumps({"mood": "Serene and peaceful coastal setting", "styleKeywords": ["Relaxing", "Beach"]})
+
+
+class FakeGeminiServer:
+    """
+    Threaded HTTP server answering list_models, generateContent and
+    streamGenerateContent. Prompts carrying an inline image get a mood
+    analysis instead of an itinerary.
+
+    Args:
+        latency: Seconds to sleep before answering generateContent (spread
+            evenly across chunks when streaming)
+        num_days: Number of days in the generated itinerary
+        port: Port to bind (0 picks a free one)
+        error_rate: Fraction of generate calls answered with ``error_status``
+        error_status: HTTP status of injected errors (429 exercises the
+            scheduler's throttling, 500 the plain error fallback)
+        padding: Extra characters per activity description (response size)
+        seed: Seed for the error injection, for repeatable runs
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.5,
+        num_days: int = 5,
+        port: int = 0,
+        error_rate: float = 0.0,
+        error_status: int = 500,
+        padding: int = 0,
+        seed: Optional[int] = None
+    ):
+        self.latency = latency
+        self.num_days = num_days
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.padding = padding
+        self.requests = 0
+        self.errors = 0
+        self.image_requests = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeGeminiServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    @property
+    def response_chars(self) -> int:
+        """Size of the itinerary text in each response"""
+        return len(build_itinerary_json(self.num_days, padding=self.padding))
+
+    def _count(self) -> bool:
+        """Count a generate call; returns True when it should fail"""
+        with self._lock:
+            self.requests += 1
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+            return failed
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, body: dict) -> None:
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _send_stream(self, chunk_size: int = 512) -> None:
+                """Send the itinerary as a streamed JSON array of partial responses"""
+                text = build_itinerary_json(fake.num_days, padding=fake.padding)
+                pieces = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+                delay = fake.latency / max(len(pieces), 1)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                self.wfile.write(b"[")
+                for index, piece in enumerate(pieces):
+                    time.sleep(delay)
+                    chunk = {"candidates": [{"content": {"role": "model", "parts": [{"text": piece}]}, "index": 0}]}
+                    self.wfile.write((("," if index else "") + json.dumps(chunk)).encode())
+                    self.wfile.flush()
+                self.wfile.write(b"]")
+
+            def do_GET(self):
+                if self.path.split("?")[0].endswith("/models"):
+                    self._send_json(200, {"models": [{"name": MODEL_NAME}]})
+                else:
+                    self._send_json(404, {"error": {"code": 404, "message": "Not found"}})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length)
+                if ":generateContent" not in self.path and ":streamGenerateContent" not in self.path:
+                    self._send_json(404, {"error": {"code": 404, "message": "Not found"}})
+                    return
+                if fake._count():
+                    time.sleep(fake.latency)
+                    self._send_json(fake.error_status, {"error": {
+                        "code": fake.error_status,
+                        "message": "Resource has been exhausted (e.g. check quota)." if fake.error_status == 429 else "Internal error",
+                        "status": "RESOURCE_EXHAUSTED" if fake.error_status == 429 else "INTERNAL"
+                    }})
+                    return
+                if ":streamGenerateContent" in self.path:
+                    self._send_stream()
+                    return
+                time.sleep(fake.latency)
+                if b'"inline_data"' in body or b'"inlineData"' in body:
+                    with fake._lock:
+                        fake.image_requests += 1
+                    text = FAKE_MOOD_JSON
+                else:
+                    text = build_itinerary_json(fake.num_days, padding=fake.padding)
+                self._send_json(200, {
+                    "candidates": [{
+                        "content": {"role": "model", "parts": [{"text": text}]},
+                        "finishReason": "STOP",
+                        "index": 0
+                    }],
+                    # Rough counts; the request body is JSON, so slightly larger than the prompt
+                    "usageMetadata": {"promptTokenCount": len(body) // 4, "candidatesTokenCount": len(text) // 4}
+                })
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the fake Gemini server until interrupted")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per generate call")
+    parser.add_argument("--days", type=int, default=5, help="days per generated itinerary")
+    parser.add_argument("--padding", type=int, default=0, help="extra characters per activity description")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of generate calls that fail")
+    parser.add_argument("--error-status", type=int, default=500, help="HTTP status of injected failures")
+    args = parser.parse_args()
+
+    fake = FakeGeminiServer(
+        latency=args.latency, num_days=args.days, port=args.port,
+        error_rate=args.error_rate, error_status=args.error_status, padding=args.padding
+    ).start()
+    print(f"Fake Gemini listening on {fake.endpoint}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
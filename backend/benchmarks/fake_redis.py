@@ -0,0 +1,272 @@
+"""
+Local stand-in for a Redis server, used for offline benchmarks and for
+trying the shared auth backends without installing Redis.
+
+It speaks RESP2 and implements the commands the backend sends: PING,
+AUTH, SELECT, SET (EX/PX/NX/XX), GET, GETDEL, DEL, EXISTS, PTTL, TTL,
+INCR, PEXPIRE, DBSIZE and FLUSHALL, plus EVAL, EVALSHA and SCRIPT LOAD
+for the backend's own Lua scripts, which it emulates in Python rather
+than interpreting Lua. Point the backend at it with:
+
+    OTP_STORE_URL=redis://127.0.0.1:<port>/0
+
+or run it on its own:
+
+    python -m benchmarks.fake_redis --port 6390
+"""
+import time
+import hashlib
+import argparse
+import threading
+import socketserver
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.services.otp_store import CONSUME_OTP_SCRIPT
+
+
+class FakeRedisServer:
+    """
+    Threaded RESP server keeping keys in a dict with millisecond expiry.
+
+    Commands are handled one at a time under a lock, so every command is
+    atomic, as in Redis. Pipelined commands are answered in order.
+
+    Args:
+        port: Port to bind (0 picks a free one)
+        latency: Seconds to sleep before answering each batch of commands
+            received together (a pipeline), to emulate a network hop
+    """
+
+    def __init__(self, port: int = 0, latency: float = 0.0):
+        self.latency = latency
+        self.commands = 0
+        self._data: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        # Lua script text -> Python emulation taking (keys, args, now)
+        self._emulated: Dict[bytes, Callable[[List[bytes], List[bytes], float], object]] = {
+            CONSUME_OTP_SCRIPT.encode(): self._compare_and_delete
+        }
+        # SHA1 -> script text, for EVALSHA; filled by EVAL and SCRIPT LOAD like Redis
+        self._scripts: Dict[bytes, bytes] = {}
+        self._lock = threading.Lock()
+        self._server = socketserver.ThreadingTCPServer(("127.0.0.1", port), self._make_handler(), bind_and_activate=False)
+        self._server.allow_reuse_address = True
+        self._server.daemon_threads = True
+        self._server.server_bind()
+        self._server.server_activate()
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"redis://{host}:{port}/0"
+
+    def start(self) -> "FakeRedisServer":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def keys(self) -> int:
+        """Number of unexpired keys"""
+        with self._lock:
+            now = time.monotonic()
+            return sum(1 for _, expires_at in self._data.values() if expires_at is None or expires_at > now)
+
+    def _live(self, key: bytes, now: float) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= now:
+            del self._data[key]
+            return None
+        return value
+
+    def execute(self, args: List[bytes]) -> object:
+        """Run one command; returns the reply (``Exception`` for error replies)"""
+        name = args[0].upper().decode()
+        now = time.monotonic()
+        with self._lock:
+            self.commands += 1
+            if name == "PING":
+                return "PONG"
+            if name in ("AUTH", "SELECT"):
+                return "OK"
+            if name == "SET":
+                return self._set(args[1:], now)
+            if name == "GET":
+                return self._live(args[1], now)
+            if name == "GETDEL":
+                value = self._live(args[1], now)
+                self._data.pop(args[1], None)
+                return value
+            if name == "DEL":
+                return sum(1 for key in args[1:] if self._live(key, now) is not None and self._data.pop(key))
+            if name == "EXISTS":
+                return sum(1 for key in args[1:] if self._live(key, now) is not None)
+            if name in ("PTTL", "TTL"):
+                if self._live(args[1], now) is None:
+                    return -2
+                expires_at = self._data[args[1]][1]
+                if expires_at is None:
+                    return -1
+                remaining = expires_at - now
+                return int(remaining * 1000) if name == "PTTL" else int(remaining)
+            if name == "INCR":
+                value = int(self._live(args[1], now) or 0) + 1
+                expires_at = self._data[args[1]][1] if args[1] in self._data else None
+                self._data[args[1]] = (str(value).encode(), expires_at)
+                return value
+            if name == "PEXPIRE":
+                value = self._live(args[1], now)
+                if value is None:
+                    return 0
+                self._data[args[1]] = (value, now + int(args[2]) / 1000)
+                return 1
+            if name == "EVAL":
+                return self._eval(args[1], args[2:], now)
+            if name == "EVALSHA":
+                script = self._scripts.get(args[1].lower())
+                if script is None:
+                    return Exception("NOSCRIPT No matching script. Please use EVAL.")
+                return self._eval(script, args[2:], now)
+            if name == "SCRIPT" and len(args) == 3 and args[1].upper() == b"LOAD":
+                return self._load(args[2]) or Exception("ERR script not emulated by the fake server")
+            if name == "DBSIZE":
+                return len(self._data)
+            if name == "FLUSHALL":
+                self._data.clear()
+                return "OK"
+        return Exception(f"ERR unknown command '{name}'")
+
+    def _set(self, args: List[bytes], now: float) -> object:
+        key, value = args[0], args[1]
+        expires_at = None
+        only_new = only_existing = False
+        options = [arg.upper() for arg in args[2:]]
+        index = 0
+        while index < len(options):
+            option = options[index]
+            if option in (b"EX", b"PX"):
+                amount = int(options[index + 1])
+                if amount <= 0:
+                    return Exception("ERR invalid expire time in 'set' command")
+                expires_at = now + (amount if option == b"EX" else amount / 1000)
+                index += 1
+            elif option == b"NX":
+                only_new = True
+            elif option == b"XX":
+                only_existing = True
+            else:
+                return Exception("ERR syntax error")
+            index += 1
+        exists = self._live(key, now) is not None
+        if (only_new and exists) or (only_existing and not exists):
+            return None
+        self._data[key] = (value, expires_at)
+        return "OK"
+
+    def _load(self, script: bytes) -> Optional[bytes]:
+        """Register an emulated script; returns its SHA1, or None when it is unknown"""
+        if script not in self._emulated:
+            return None
+        sha = hashlib.sha1(script).hexdigest().encode()
+        self._scripts[sha] = script
+        return sha
+
+    def _eval(self, script: bytes, args: List[bytes], now: float) -> object:
+        if self._load(script) is None:
+            return Exception("ERR script not emulated by the fake server")
+        key_count = int(args[0])
+        return self._emulated[script](args[1:1 + key_count], args[1 + key_count:], now)
+
+    def _compare_and_delete(self, keys: List[bytes], args: List[bytes], now: float) -> object:
+        """``CONSUME_OTP_SCRIPT``: delete the key if it holds the given value"""
+        if self._live(keys[0], now) == args[0]:
+            del self._data[keys[0]]
+            return 1
+        return 0
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                buffer = b""
+                while True:
+                    try:
+                        chunk = self.request.recv(65536)
+                    except ConnectionError:
+                        return
+                    if not chunk:
+                        return
+                    buffer += chunk
+                    replies = []
+                    while True:
+                        parsed = _parse_command(buffer)
+                        if parsed is None:
+                            break
+                        args, buffer = parsed
+                        if args:
+                            replies.append(_encode_reply(fake.execute(args)))
+                    if replies:
+                        # One network hop per batch of pipelined commands
+                        if fake.latency:
+                            time.sleep(fake.latency)
+                        self.request.sendall(b"".join(replies))
+
+        return Handler
+
+
+def _parse_command(buffer: bytes) -> Optional[Tuple[List[bytes], bytes]]:
+    """Split one command off ``buffer``; None if it is still incomplete"""
+    end = buffer.find(b"\r\n")
+    if end < 0:
+        return None
+    if not buffer.startswith(b"*"):
+        # Inline command, as typed into telnet
+        return buffer[:end].split(), buffer[end + 2:]
+    args = []
+    position = end + 2
+    for _ in range(int(buffer[1:end])):
+        end = buffer.find(b"\r\n", position)
+        if end < 0:
+            return None
+        length = int(buffer[position + 1:end])
+        start = end + 2
+        if len(buffer) < start + length + 2:
+            return None
+        args.append(buffer[start:start + length])
+        position = start + length + 2
+    return args, buffer[position:]
+
+
+def _encode_reply(reply: object) -> bytes:
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, Exception):
+        return b"-%s\r\n" % str(reply).encode()
+    if isinstance(reply, str):
+        return b"+%s\r\n" % reply.encode()
+    if isinstance(reply, int):
+        return b":%d\r\n" % reply
+    return b"$%d\r\n%s\r\n" % (len(reply), reply)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Redis server for offline benchmarks")
+    parser.add_argument("--port", type=int, default=6390)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+    server = FakeRedisServer(args.port, args.latency).start()
+    print(f"Fake Redis listening on {server.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
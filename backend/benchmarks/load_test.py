@@ -0,0 +1,96 @@
+"""
+Load test for /api/generate-itinerary against the fake Gemini server.
+
+Shows that throughput grows with concurrency once Gemini calls no longer
+block the event loop. Run from the backend directory:
+
+    python -m benchmarks.load_test --latency 0.5 --levels 1 4 16 64
+"""
+import argparse
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.fake_gemini import FakeGeminiServer
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_backend(port: int):
+    """Import the FastAPI app (after env setup) and serve it in a thread"""
+    import uvicorn
+    from main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def _run_level(base_url: str, concurrency: int, total: int) -> dict:
+    session = requests.Session()
+    session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=concurrency))
+
+    def call(i):
+        # Unique descriptions so the cache and request coalescing don't short-circuit Gemini
+        payload = {"trip_description": f"5 days in Paris, romantic (run {concurrency}-{i})", "destination": "Paris", "days": 5}
+        response = session.post(f"{base_url}/api/generate-itinerary", json=payload, timeout=60)
+        return response.status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        statuses = list(pool.map(call, range(total)))
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "ok": sum(1 for status in statuses if status == 200),
+        "seconds": elapsed,
+        "throughput": total / elapsed
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.5, help="fake Gemini latency in seconds")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--rounds", type=int, default=2, help="requests per worker at each level")
+    args = parser.parse_args()
+
+    fake = FakeGeminiServer(latency=args.latency).start()
+    os.environ["GEMINI_API_KEY"] = "fake-key-for-local-benchmarks-only"
+    os.environ["GEMINI_TRANSPORT"] = "rest"
+    os.environ["GEMINI_API_ENDPOINT"] = fake.endpoint
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    # Measure raw pipeline throughput, not the production quota budget
+    os.environ.setdefault("GEMINI_RPM", "1000000")
+    os.environ.setdefault("GEMINI_CONCURRENCY_INITIAL", str(max(args.levels)))
+    os.environ.setdefault("GEMINI_CONCURRENCY_MAX", str(max(args.levels)))
+
+    port = _free_port()
+    server = _start_backend(port)
+    base_url = f"http://127.0.0.1:{port}"
+
+    print(f"{'concurrency':>11} {'requests':>8} {'ok':>5} {'seconds':>8} {'req/s':>8}")
+    try:
+        for level in args.levels:
+            result = _run_level(base_url, level, level * args.rounds)
+            print(f"{result['concurrency']:>11} {result['requests']:>8} {result['ok']:>5} "
+                  f"{result['seconds']:>8.2f} {result['throughput']:>8.2f}")
+    finally:
+        server.should_exit = True
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
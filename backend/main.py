@@ -1,33 +1,64 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import Depends, FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import Response, StreamingResponse
 from typing import List, Optional
-import base64
+from contextlib import asynccontextmanager
+import json
 import os
+import time
 from dotenv import load_dotenv
-import jwt
 
 # Load environment variables
 load_dotenv()
 
+from app.services.logging_config import configure_logging, get_logger, RequestSummaryMiddleware
+from app.services.metrics import render_prometheus, PROMETHEUS_CONTENT_TYPE
+
+configure_logging()
+logger = get_logger("api")
+
 # Check for required environment variables
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 if not GEMINI_API_KEY:
     raise RuntimeError("GEMINI_API_KEY not set. Please set the GEMINI_API_KEY environment variable.")
 
-# JWT configuration
-SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-in-production")
-ALGORITHM = "HS256"
+# Seconds an interactive itinerary request may take before the fallback is served
+ITINERARY_DEADLINE = float(os.getenv("ITINERARY_DEADLINE", "25"))
+
+# Upper bounds for the batch endpoint
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "50"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "32"))
 
-from app.services.ai_planner import generate_itinerary
+from app.services.ai_planner import generate_itinerary_async, stream_itinerary, generate_itineraries_batch, BATCH_CONCURRENCY
+from app.services.gemini_client import gemini_registry
+from app.services.prompts import SYSTEM_INSTRUCTION
+from app.services.otp_service import otp_email_queue
+from app.services.otp_store import otp_store
+from app.services.rate_limit import auth_rate_limiter
+from app.services.user_store import user_repository
+from app.services.image_store import has_inline_image, store_inline_image, ImageTooLarge
 from schemas import TripRequest, Itinerary
-from app.routers import auth
-from app.routers.auth import router as auth_router
+from app.routers.auth import router as auth_router, get_current_user, get_optional_user
+from app.routers.images import router as images_router
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Set up long-lived clients once per worker"""
+    await gemini_registry.start()
+    await gemini_registry.cache_context(SYSTEM_INSTRUCTION)
+    await otp_email_queue.start()
+    yield
+    await otp_email_queue.stop()
+    await otp_store.close()
+    await auth_rate_limiter.close()
+    await user_repository.close()
+    await gemini_registry.stop()
 
 app = FastAPI(
     title="Agentic Travel Planner API",
     description="API for generating travel itineraries using AI function calling",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -41,64 +72,113 @@ app.add_middleware(
 
 # Include routers
 app.include_router(auth_router)
+app.include_router(images_router)
 
-# Add this to validate authorization header
-async def get_authorization_header(authorization: str = None):
-    """Extract token from Authorization header"""
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Authorization header missing")
-    
-    if not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Invalid authorization header format")
-    
-    return authorization[7:]  # Remove "Bearer " prefix
+# One structured summary line per request with the collected timings
+app.add_middleware(RequestSummaryMiddleware, logger=logger)
 
-# Dependency for protected routes
-async def verify_token(authorization: str = Depends(get_authorization_header)):
-    """Verify JWT token and return user email"""
+# Dependency for protected routes: Depends(verify_token) returns the user email
+verify_token = get_current_user
+
+async def _with_stored_image(request: TripRequest, user: Optional[str]) -> TripRequest:
+    """
+    Move an inline base64 inspiration image into the image store before
+    planning. Like uploads, stored images need a signed-in user: every new
+    image takes disk space, and its mood analysis a Gemini call.
+    """
+    if user is None and (has_inline_image(request) or request.inspiration_image_id):
+        raise HTTPException(status_code=401, detail="Sign in to use an inspiration image")
     try:
-        payload = jwt.decode(authorization, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise HTTPException(status_code=401, detail="Invalid authentication credentials")
-        return email
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+        return await store_inline_image(request)
+    except ImageTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
     return {"status": "healthy"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """Prometheus metrics: stage latencies, Gemini calls, cache, scheduler and auth counters"""
+    return Response(content=render_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
+
 @app.post("/api/generate-itinerary", response_model=Itinerary)
-async def generate_itinerary_endpoint(request: TripRequest):
+async def generate_itinerary_endpoint(
+    request: TripRequest,
+    timeout: Optional[float] = Query(None, gt=0, description="Seconds to wait before serving the fallback itinerary"),
+    user: Optional[str] = Depends(get_optional_user)
+):
     """
     Generate a travel itinerary based on the provided trip request.
     """
+    deadline = time.monotonic() + min(timeout or ITINERARY_DEADLINE, ITINERARY_DEADLINE)
+    request = await _with_stored_image(request, user)
     try:
         # Validate required fields
         if not request.trip_description:
             raise HTTPException(status_code=400, detail="Trip description is required")
         
-        print("🔍 Starting itinerary generation...")
-        print(f"📝 Trip description: {request.trip_description}")
-        print(f"📅 Days: {request.days}")
-        print(f"🏷️ Tags: {request.trip_tags}")
-        print(f"💰 Budget: {request.budget_level}")
-        print(f"📅 Start date: {request.start_date}")
-        print(f"🖼️ Image provided: {'Yes' if request.inspiration_image else 'No'}")
-        
-        # Generate itinerary using the AI planner service
-        itinerary = generate_itinerary(request)
+        # Generate itinerary using the AI planner service (off the event loop)
+        itinerary = await generate_itinerary_async(request, deadline)
         
-        print("✅ Itinerary generated successfully")
-        return itinerary
+        # The itinerary is already validated; serialize it directly instead of
+        # letting response_model validate it a second time
+        return Response(content=itinerary.model_dump_json(), media_type="application/json")
     except Exception as e:
-        print(f"❌ Itinerary generation failed: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Itinerary generation failed")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/generate-itinerary/stream")
+async def generate_itinerary_stream_endpoint(
+    request: TripRequest,
+    timeout: Optional[float] = Query(None, gt=0, description="Seconds to wait before serving the fallback itinerary"),
+    user: Optional[str] = Depends(get_optional_user)
+):
+    """
+    Stream a travel itinerary as NDJSON: a header line, one line per day as
+    soon as it is generated, then a final meta line. Days Gemini has not
+    produced by the deadline come from the fallback itinerary.
+    """
+    deadline = time.monotonic() + min(timeout or ITINERARY_DEADLINE, ITINERARY_DEADLINE)
+    if not request.trip_description:
+        raise HTTPException(status_code=400, detail="Trip description is required")
+    request = await _with_stored_image(request, user)
+    
+    async def event_lines():
+        async for event in stream_itinerary(request, deadline):
+            yield json.dumps(event) + "\n"
+    
+    return StreamingResponse(event_lines(), media_type="application/x-ndjson")
+
+@app.post("/api/generate-itineraries:batch")
+async def generate_itineraries_batch_endpoint(
+    requests: List[TripRequest],
+    concurrency: int = Query(BATCH_CONCURRENCY, ge=1),
+    user: str = Depends(verify_token)
+):
+    """
+    Generate many itineraries (e.g. nightly pre-warming) with bounded
+    concurrency; requires a bearer token. Results stream back as NDJSON in
+    completion order, one line per item with its index and status
+    (success, cached, fallback or error).
+    """
+    if len(requests) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Batch is limited to {BATCH_MAX_ITEMS} requests")
+    for index, request in enumerate(requests):
+        if not request.trip_description:
+            raise HTTPException(status_code=400, detail=f"Trip description is required (item {index})")
+    requests = [await _with_stored_image(request, user) for request in requests]
+    
+    async def result_lines():
+        async for index, itinerary, status, error in generate_itineraries_batch(
+            requests, min(concurrency, BATCH_MAX_CONCURRENCY)
+        ):
+            item = itinerary.model_dump_json() if itinerary is not None else "null"
+            yield f'{{"index": {index}, "status": {json.dumps(status)}, "error": {json.dumps(error)}, "itinerary": {item}}}\n'
+    
+    return StreamingResponse(result_lines(), media_type="application/x-ndjson")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
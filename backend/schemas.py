@@ -1,8 +1,11 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 from typing import List, Optional, Literal
 
 
 class Activity(BaseModel):
+    # Fallback plans share Activity instances between requests
+    model_config = ConfigDict(frozen=True)
+
     timeOfDay: Literal["morning", "afternoon", "evening"]
     title: str
     description: str
@@ -13,6 +16,20 @@ class Activity(BaseModel):
     latitude: Optional[float] = None
     longitude: Optional[float] = None
 
+    @field_validator("timeOfDay", mode="before")
+    @classmethod
+    def normalize_time_of_day(cls, value):
+        """Map free-form values such as "Late afternoon" or "Night" onto the allowed ones"""
+        if not isinstance(value, str) or value in ("morning", "afternoon", "evening"):
+            return value
+        time_of_day = value.lower()
+        if "morning" in time_of_day:
+            return "morning"
+        if "evening" in time_of_day or "night" in time_of_day:
+            return "evening"
+        # Default to afternoon for any other values (including "late afternoon")
+        return "afternoon"
+
 
 class DayPlan(BaseModel):
     dayNumber: int
@@ -44,4 +61,6 @@ class TripRequest(BaseModel):
     days: Optional[int] = None
     budget_level: Optional[str] = None
     trip_tags: List[str] = []
-    inspiration_image: Optional[str] = None  # base64 or URL
\ No newline at end of file
+    inspiration_image: Optional[str] = None  # base64 or URL
+    # Digest returned by POST /api/inspiration-images; preferred over inline base64
+    inspiration_image_id: Optional[str] = Field(None, pattern=r"^[0-9a-f]{64}$")
\ No newline at end of file
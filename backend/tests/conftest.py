@@ -0,0 +1,114 @@
+"""
+Shared fixtures. Run from ``backend/`` with ``python -m pytest``.
+
+The service modules build their singletons from the environment at
+import, so the stores are pointed away from Redis, the real user
+database and the shared image directory before anything under ``app``
+is imported.
+"""
+import os
+import tempfile
+
+os.environ["OTP_STORE_URL"] = ""
+os.environ["RATE_LIMIT_STORE_URL"] = ""
+os.environ["USER_STORE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="tests-users-"), "users.db")
+os.environ["IMAGE_STORE_DIR"] = tempfile.mkdtemp(prefix="tests-images-")
+os.environ.pop("JWT_KEYS", None)
+# main.py refuses to start without one; tests never call Gemini
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from app.routers import auth
+from app.routers.auth import get_current_user
+from app.services import ai_planner, otp_service
+from app.services.gemini_scheduler import GeminiScheduler
+from app.services.itinerary_cache import ItineraryCache
+from app.services.jwt_auth import token_cache
+from app.services.otp_store import MemoryOtpStore
+from app.services.rate_limit import MemoryRateStore, RateLimiter
+from app.services.single_flight import SingleFlight
+from app.services.user_store import SqliteUserRepository
+from benchmarks.fake_gemini import build_itinerary_json
+from benchmarks.fake_redis import FakeRedisServer
+
+
+@pytest.fixture(autouse=True)
+def _clear_token_cache():
+    token_cache.clear()
+    yield
+    token_cache.clear()
+
+
+@pytest.fixture
+def fake_redis():
+    server = FakeRedisServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def users(tmp_path):
+    repository = SqliteUserRepository(str(tmp_path / "users.db"))
+    yield repository
+    asyncio.run(repository.close())
+
+
+@pytest.fixture
+def auth_client(monkeypatch, users):
+    """
+    TestClient for the auth router plus a ``/me`` route behind
+    ``get_current_user``, with fresh in-memory OTP and rate limit stores.
+    EmailJS is not configured, so OTPs are only logged.
+    """
+    monkeypatch.setattr(otp_service, "otp_store", MemoryOtpStore())
+    monkeypatch.setattr(auth, "auth_rate_limiter", RateLimiter(MemoryRateStore(), enabled=True))
+    monkeypatch.setattr(auth, "user_repository", users)
+
+    app = FastAPI()
+    app.include_router(auth.router)
+
+    @app.get("/me")
+    async def me(email: str = Depends(get_current_user)):
+        return {"email": email}
+
+    return TestClient(app)
+
+
+class FakeModel:
+    """
+    Stand-in for the Gemini model handle: answers every prompt with the
+    same itinerary after ``delay`` seconds, or raises ``error``.
+    """
+
+    def __init__(self, text: str = None, delay: float = 0.05, error: Exception = None):
+        self.text = text if text is not None else build_itinerary_json(num_days=3, destination="Lisbon")
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    async def generate_content_async(self, prompt):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return SimpleNamespace(text=self.text, usage_metadata=None)
+
+
+@pytest.fixture
+def planner(monkeypatch):
+    """
+    The planner with a fresh cache, single-flight group and scheduler, and
+    Gemini replaced by a ``FakeModel`` (returned, to count calls or make it fail).
+    """
+    model = FakeModel()
+    monkeypatch.setattr(ai_planner, "_itinerary_model", lambda: model)
+    monkeypatch.setattr(ai_planner, "itinerary_cache", ItineraryCache())
+    monkeypatch.setattr(ai_planner, "itinerary_flights", SingleFlight())
+    monkeypatch.setattr(ai_planner, "gemini_scheduler", GeminiScheduler(rpm=1_000_000, tpm=1_000_000_000, initial_limit=8))
+    return model
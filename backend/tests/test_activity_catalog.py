@@ -0,0 +1,83 @@
+import json
+import os
+
+from app.services.activity_catalog import ACTIVITY_CATALOG_PATH, ActivityCatalog, CatalogActivity, compile_catalog
+
+SOURCE = {
+    "destinations": {
+        "*": {
+            "activities": [
+                {"timeOfDay": "morning", "title": "Walk around {destination}", "description": "See {destination}.", "location": "{destination} centre", "category": "Sightseeing", "estimatedCost": 0.0, "bookingRequired": False}
+            ],
+            "tags": {
+                "Food": [
+                    {"timeOfDay": "evening", "title": "Street food", "description": "Taste local dishes.", "location": "Night market", "category": "Food & Drink", "estimatedCost": 12.5, "bookingRequired": False}
+                ]
+            }
+        },
+        "Tokyo": {
+            "activities": [
+                {"timeOfDay": "morning", "title": "Tsukiji Outer Market", "description": "Breakfast sushi.", "location": "Tsukiji", "category": "Food & Drink", "estimatedCost": 30.1, "bookingRequired": False, "latitude": 35.6655, "longitude": 139.7707},
+                {"timeOfDay": "afternoon", "title": "teamLab Planets", "description": "Digital art museum.", "location": "Toyosu", "category": "Culture", "estimatedCost": 25.0, "bookingRequired": True}
+            ],
+            "tags": {"Nightlife": []}
+        }
+    }
+}
+
+
+def _catalog(tmp_path) -> ActivityCatalog:
+    path = str(tmp_path / "activities.bin")
+    assert compile_catalog(SOURCE, path) == 4
+    return ActivityCatalog(path)
+
+
+def test_compiled_records_round_trip(tmp_path):
+    catalog = _catalog(tmp_path)
+    assert catalog.activities("Tokyo") == (
+        CatalogActivity("morning", "Tsukiji Outer Market", "Breakfast sushi.", "Tsukiji", "Food & Drink", 30.1, False, 35.6655, 139.7707),
+        CatalogActivity("afternoon", "teamLab Planets", "Digital art museum.", "Toyosu", "Culture", 25.0, True, None, None)
+    )
+    assert catalog.destinations() == ["tokyo"]
+
+
+def test_lookups_ignore_case_and_share_decoded_records(tmp_path):
+    catalog = _catalog(tmp_path)
+    assert catalog.activities("TOKYO") is catalog.activities("tokyo")
+    assert catalog.activities("*", "food")[0].title == "Street food"
+
+
+def test_unknown_destinations_use_the_generic_templates(tmp_path):
+    catalog = _catalog(tmp_path)
+    template = catalog.base_activities("Oslo")[0]
+    assert template.for_destination("Oslo").title == "Walk around Oslo"
+    assert catalog.tag_activities("Tokyo", "Food")[0].title == "Street food"
+    # Empty groups are not written, so they fall back as well
+    assert catalog.tag_activities("Tokyo", "Nightlife") == ()
+    assert catalog.base_activities("Tokyo")[0].title == "Tsukiji Outer Market"
+
+
+def test_misses_are_not_cached(tmp_path):
+    catalog = _catalog(tmp_path)
+    for index in range(100):
+        assert catalog.activities(f"nowhere-{index}") == ()
+    assert len(catalog._decoded) == 0
+
+
+def test_missing_or_invalid_file_gives_empty_results(tmp_path):
+    assert ActivityCatalog(str(tmp_path / "missing.bin")).activities("*") == ()
+    invalid = tmp_path / "invalid.bin"
+    invalid.write_bytes(b"not a catalog at all")
+    catalog = ActivityCatalog(str(invalid))
+    assert catalog.activities("*") == ()
+    assert catalog.destinations() == []
+
+
+def test_shipped_catalog_matches_its_source(tmp_path):
+    source_path = os.path.join(os.path.dirname(ACTIVITY_CATALOG_PATH), "activities.json")
+    with open(source_path) as source_file:
+        source = json.load(source_file)
+    compiled = tmp_path / "activities.bin"
+    compile_catalog(source, str(compiled))
+    with open(ACTIVITY_CATALOG_PATH, "rb") as shipped:
+        assert shipped.read() == compiled.read_bytes(), "recompile data/activities.bin from data/activities.json"
@@ -0,0 +1,91 @@
+import asyncio
+import threading
+
+from app.services.email_queue import OtpEmailQueue
+from app.services.emailjs_service import EmailDeliveryError
+
+
+class FakeDelivery:
+    """Blocking send function failing with the queued errors, then succeeding"""
+
+    def __init__(self, *errors: EmailDeliveryError):
+        self.errors = list(errors)
+        self.sent = []
+        self._lock = threading.Lock()
+
+    def __call__(self, email: str, otp: str) -> None:
+        with self._lock:
+            self.sent.append((email, otp))
+            if self.errors:
+                raise self.errors.pop(0)
+
+
+def _run(queue: OtpEmailQueue, jobs):
+    """Submit ``jobs`` and return the ``(email, otp, delivered)`` results once all are final"""
+    async def scenario():
+        results = []
+        finished = asyncio.Event()
+
+        def on_result(email, otp, delivered):
+            results.append((email, otp, delivered))
+            if len(results) == len(jobs):
+                finished.set()
+
+        queue.on_result = on_result
+        accepted = [queue.submit(email, otp) for email, otp in jobs]
+        assert all(accepted)
+        await asyncio.wait_for(finished.wait(), 5)
+        await queue.stop()
+        return results
+
+    return asyncio.run(scenario())
+
+
+def test_emails_are_delivered_in_the_background():
+    deliver = FakeDelivery()
+    queue = OtpEmailQueue(deliver, workers=2, max_size=10)
+
+    jobs = [(f"user{index}@example.com", f"{index:06d}") for index in range(5)]
+    results = _run(queue, jobs)
+    assert sorted(results) == sorted((email, otp, True) for email, otp in jobs)
+    assert sorted(deliver.sent) == sorted(jobs)
+    assert queue.stats()["delivered"] == 5
+
+
+def test_retryable_failures_are_retried_until_delivered():
+    deliver = FakeDelivery(EmailDeliveryError("503", retryable=True), EmailDeliveryError("timeout", retryable=True))
+    queue = OtpEmailQueue(deliver, workers=1, max_size=10, max_attempts=4, retry_base=0.01)
+
+    assert _run(queue, [("a@example.com", "123456")]) == [("a@example.com", "123456", True)]
+    assert len(deliver.sent) == 3
+    assert (queue.retries, queue.delivered, queue.failed) == (2, 1, 0)
+
+
+def test_rejections_are_not_retried():
+    deliver = FakeDelivery(EmailDeliveryError("400 bad template", retryable=False))
+    queue = OtpEmailQueue(deliver, workers=1, max_size=10, retry_base=0.01)
+
+    assert _run(queue, [("a@example.com", "123456")]) == [("a@example.com", "123456", False)]
+    assert len(deliver.sent) == 1
+    assert (queue.retries, queue.failed) == (0, 1)
+
+
+def test_delivery_gives_up_after_max_attempts():
+    deliver = FakeDelivery(*(EmailDeliveryError("503", retryable=True) for _ in range(5)))
+    queue = OtpEmailQueue(deliver, workers=1, max_size=10, max_attempts=3, retry_base=0.01)
+
+    assert _run(queue, [("a@example.com", "123456")]) == [("a@example.com", "123456", False)]
+    assert len(deliver.sent) == 3
+    assert (queue.retries, queue.failed) == (2, 1)
+
+
+def test_full_queue_rejects_submissions():
+    async def scenario():
+        queue = OtpEmailQueue(FakeDelivery(), workers=1, max_size=1)
+        accepted = [queue.submit("a@example.com", "111111"), queue.submit("b@example.com", "222222")]
+        await queue.stop()
+        return accepted, queue.stats()["dropped"]
+
+    accepted, dropped = asyncio.run(scenario())
+    assert accepted == [True, False]
+    assert dropped == 1
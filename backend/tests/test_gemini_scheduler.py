@@ -0,0 +1,207 @@
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.services import gemini_scheduler
+from app.services.gemini_scheduler import (
+    GeminiScheduler, PRIORITY_BATCH, PRIORITY_INTERACTIVE, QuotaExceededError, SharedPriority, TokenBucket
+)
+
+
+def _scheduler(**overrides) -> GeminiScheduler:
+    options = dict(rpm=1_000_000, tpm=1_000_000_000, initial_limit=1, min_limit=1, max_limit=8, latency_target=20)
+    options.update(overrides)
+    return GeminiScheduler(**options)
+
+
+def test_slot_is_held_until_abandoned_thread_call_finishes():
+    scheduler = _scheduler()
+    release = threading.Event()
+
+    async def scenario():
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            with pytest.raises(asyncio.TimeoutError):
+                async with scheduler.slot() as slot:
+                    call = asyncio.wrap_future(slot.hold_until(executor.submit(release.wait)))
+                    await asyncio.wait_for(call, 0.05)
+            held = (scheduler.in_flight, scheduler.held)
+            # The thread still runs, so nobody else is admitted
+            with pytest.raises(QuotaExceededError):
+                async with scheduler.slot(timeout=0.05):
+                    pass
+            release.set()
+            async with scheduler.slot(timeout=1):
+                admitted_after = scheduler.in_flight
+            return held, admitted_after
+
+    held, admitted_after = asyncio.run(scenario())
+    assert held == (1, 1)
+    assert admitted_after == 1
+    assert (scheduler.in_flight, scheduler.held) == (0, 0)
+
+
+def test_streams_are_judged_by_their_first_chunk():
+    scheduler = _scheduler(initial_limit=4, latency_target=0.05)
+
+    async def call(streamed: bool) -> float:
+        async with scheduler.slot() as slot:
+            if streamed:
+                slot.first_response()
+            await asyncio.sleep(0.1)
+        return scheduler.limit
+
+    async def scenario():
+        return await call(streamed=True), await call(streamed=False)
+
+    after_stream, after_slow_call = asyncio.run(scenario())
+    assert after_stream > 4
+    assert after_slow_call == pytest.approx(after_stream * 0.9)
+
+
+async def _admission_order(scheduler: GeminiScheduler, priorities) -> list:
+    """Queue one call per priority behind a held slot and return the admission order"""
+    order = []
+
+    async def call(name, priority):
+        async with scheduler.slot(priority):
+            order.append(name)
+
+    async with scheduler.slot():
+        tasks = []
+        for name, priority in priorities:
+            tasks.append(asyncio.ensure_future(call(name, priority)))
+            await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_interactive_calls_are_admitted_before_batch_calls():
+    order = asyncio.run(_admission_order(_scheduler(), [
+        ("batch-1", PRIORITY_BATCH),
+        ("interactive", PRIORITY_INTERACTIVE),
+        ("batch-2", PRIORITY_BATCH)
+    ]))
+    assert order == ["interactive", "batch-1", "batch-2"]
+
+
+def test_raised_shared_priority_moves_a_queued_call_up():
+    scheduler = _scheduler()
+    shared = SharedPriority(PRIORITY_BATCH)
+
+    async def scenario():
+        order = []
+
+        async def call(name, priority):
+            async with scheduler.slot(priority):
+                order.append(name)
+
+        async with scheduler.slot():
+            earlier = asyncio.ensure_future(call("earlier-batch", PRIORITY_BATCH))
+            await asyncio.sleep(0)
+            joined = asyncio.ensure_future(call("shared", shared))
+            await asyncio.sleep(0)
+            shared.raise_to(PRIORITY_INTERACTIVE)
+        await asyncio.gather(earlier, joined)
+        return order
+
+    assert asyncio.run(scenario()) == ["shared", "earlier-batch"]
+
+
+def test_token_bucket_refills_at_its_rate():
+    bucket = TokenBucket(per_minute=60)
+    now = time.monotonic()
+    bucket.take(60, now)
+    assert bucket.wait_time(1, now) == pytest.approx(1.0)
+    assert bucket.wait_time(1, now + 0.5) == pytest.approx(0.5)
+    assert bucket.wait_time(1, now + 2) == 0.0
+    # Requests larger than the bucket only wait for a full bucket
+    assert bucket.wait_time(1000, now + 60) == 0.0
+
+
+def test_exhausted_token_budget_delays_admission():
+    scheduler = _scheduler(tpm=6000, initial_limit=4)
+
+    async def scenario():
+        async with scheduler.slot(tokens=6000):
+            pass
+        start = time.monotonic()
+        async with scheduler.slot(tokens=30):
+            return time.monotonic() - start
+
+    assert asyncio.run(scenario()) >= 0.25
+
+
+def test_queue_timeout_raises_quota_exceeded():
+    scheduler = _scheduler(rpm=60)
+
+    async def scenario():
+        async with scheduler.slot():
+            pass
+        scheduler._requests.drain(time.monotonic())
+        with pytest.raises(QuotaExceededError):
+            async with scheduler.slot(timeout=0.05):
+                pass
+
+    asyncio.run(scenario())
+    assert scheduler.rejected == 1
+    assert scheduler.queued() == 0
+
+
+def test_limit_grows_additively_on_fast_successes():
+    scheduler = _scheduler(initial_limit=2)
+
+    async def scenario():
+        for _ in range(2):
+            async with scheduler.slot():
+                pass
+
+    asyncio.run(scenario())
+    assert scheduler.limit == pytest.approx(2 + 1 / 2 + 1 / 2.5)
+
+
+def test_quota_error_halves_the_limit_and_pauses_admission(monkeypatch):
+    monkeypatch.setattr(gemini_scheduler, "GEMINI_THROTTLE_COOLDOWN", 0.2)
+    scheduler = _scheduler(initial_limit=8)
+
+    async def scenario():
+        with pytest.raises(QuotaExceededError):
+            async with scheduler.slot():
+                raise QuotaExceededError("429 Resource has been exhausted")
+        start = time.monotonic()
+        async with scheduler.slot():
+            return time.monotonic() - start
+
+    waited = asyncio.run(scenario())
+    assert scheduler.throttled == 1
+    assert scheduler.limit == pytest.approx(4 + 1 / 4)
+    assert waited >= 0.15
+
+
+def test_other_errors_do_not_halve_the_limit():
+    scheduler = _scheduler(initial_limit=4)
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            async with scheduler.slot():
+                raise RuntimeError("504 Deadline Exceeded")
+
+    asyncio.run(scenario())
+    assert scheduler.throttled == 0
+    assert scheduler.limit == pytest.approx(4 + 1 / 4)
+
+
+def test_limit_stays_within_bounds():
+    scheduler = _scheduler(initial_limit=1.2, min_limit=1, max_limit=1.5, latency_target=0.01)
+
+    async def calls(count: int, duration: float):
+        for _ in range(count):
+            async with scheduler.slot():
+                await asyncio.sleep(duration)
+
+    asyncio.run(calls(3, 0))
+    assert scheduler.limit == 1.5
+    asyncio.run(calls(5, 0.02))
+    assert scheduler.limit == 1
@@ -0,0 +1,151 @@
+import io
+import asyncio
+import base64
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from PIL import Image
+
+import main
+from app.routers import images
+from app.services.image_store import ImageStore, ImageTooLarge, InvalidImage
+from app.services.jwt_auth import issue_access_token
+from schemas import TripRequest
+
+
+def _jpeg(width: int = 64, height: int = 48, color=(200, 40, 40)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+async def _chunks(data: bytes, size: int = 1000):
+    for offset in range(0, len(data), size):
+        yield data[offset:offset + size]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ImageStore(root=str(tmp_path / "images"), max_dimension=32)
+
+
+def test_same_image_is_stored_once_and_downscaled(store):
+    data = _jpeg()
+
+    async def scenario():
+        return await store.put_stream(_chunks(data)), await store.put_base64(base64.b64encode(data).decode())
+
+    (first, duplicate_first), (second, duplicate_second) = asyncio.run(scenario())
+    assert (duplicate_first, duplicate_second) == (False, True)
+    assert first.digest == second.digest
+    assert max(first.width, first.height) <= 32
+    assert store.get(first.digest) is not None and store.processed == 1
+
+
+def test_oversized_and_invalid_uploads_are_rejected(tmp_path):
+    store = ImageStore(root=str(tmp_path / "images"), max_upload_bytes=100)
+    with pytest.raises(ImageTooLarge):
+        asyncio.run(store.put_stream(_chunks(_jpeg(), size=10)))
+    with pytest.raises(InvalidImage):
+        asyncio.run(ImageStore(root=str(tmp_path / "other")).put_stream(_chunks(b"not an image" * 10)))
+
+
+def test_least_recently_used_images_are_evicted(tmp_path):
+    colors = [(255, 0, 0), (0, 255, 0), (0, 0, 255)]
+
+    async def put(store, color):
+        image, _ = await store.put_stream(_chunks(_jpeg(color=color)))
+        return image.digest
+
+    # Measure the disk use of the three images, then cap the store at two of them
+    probe = ImageStore(root=str(tmp_path / "probe"))
+    for color in colors:
+        asyncio.run(put(probe, color))
+    store = ImageStore(root=str(tmp_path / "images"), max_bytes=probe.stats()["disk_bytes"] * 2 // 3 + 1)
+
+    async def scenario():
+        first = await put(store, colors[0])
+        second = await put(store, colors[1])
+        store.get(first)
+        return first, second, await put(store, colors[2])
+
+    first, second, third = asyncio.run(scenario())
+    assert store.evicted == 1
+    assert store.get(second) is None
+    assert store.get(first) is not None and store.get(third) is not None
+
+
+@pytest.fixture
+def upload_client():
+    app = FastAPI()
+    app.include_router(images.router)
+    return TestClient(app)
+
+
+def _bearer() -> dict:
+    return {"Authorization": f"Bearer {issue_access_token('a@example.com')}"}
+
+
+def test_upload_needs_a_signed_in_user(upload_client):
+    data = _jpeg()
+
+    anonymous = upload_client.post("/api/inspiration-images", content=data, headers={"Content-Type": "image/jpeg"})
+    signed_in = upload_client.post("/api/inspiration-images", content=data, headers={"Content-Type": "image/jpeg", **_bearer()})
+
+    assert anonymous.status_code == 401
+    assert signed_in.status_code == 200 and len(signed_in.json()["image_id"]) == 64
+
+
+def test_multipart_upload(upload_client):
+    data = _jpeg(color=(10, 120, 200))
+
+    response = upload_client.post("/api/inspiration-images", files={"file": ("trip.jpg", data, "image/jpeg")}, headers=_bearer())
+    missing = upload_client.post("/api/inspiration-images", files={"photo": ("trip.jpg", data, "image/jpeg")}, headers=_bearer())
+
+    assert response.status_code == 200 and response.json()["duplicate"] is False
+    assert missing.status_code == 400
+
+
+def test_chunked_multipart_upload_is_cut_off_at_the_limit(upload_client, monkeypatch):
+    monkeypatch.setattr(images, "IMAGE_MAX_UPLOAD_BYTES", 10_000)
+    monkeypatch.setattr(images, "MULTIPART_OVERHEAD_BYTES", 1_000)
+    boundary = "limit-test"
+
+    def body():
+        # A generator body is sent chunked, without Content-Length
+        yield f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="big.jpg"\r\n\r\n'.encode()
+        for _ in range(100):
+            yield b"x" * 1_000
+        yield f"\r\n--{boundary}--\r\n".encode()
+
+    response = upload_client.post(
+        "/api/inspiration-images", content=body(),
+        headers={"Content-Type": f"multipart/form-data; boundary={boundary}", **_bearer()}
+    )
+
+    assert response.status_code == 413
+
+
+def test_inline_images_need_a_signed_in_user():
+    request = TripRequest(trip_description="3 days in Rome", inspiration_image=base64.b64encode(_jpeg()).decode())
+
+    with pytest.raises(HTTPException) as anonymous:
+        asyncio.run(main._with_stored_image(request, None))
+    stored = asyncio.run(main._with_stored_image(request, "a@example.com"))
+
+    assert anonymous.value.status_code == 401
+    assert stored.inspiration_image is None and stored.inspiration_image_id
+    # Image URLs are never downloaded or stored
+    url_request = TripRequest(trip_description="3 days in Rome", inspiration_image="https://example.com/rome.jpg")
+    assert asyncio.run(main._with_stored_image(url_request, None)) is url_request
+
+
+def test_stored_images_need_a_signed_in_user():
+    request = TripRequest(trip_description="3 days in Rome", inspiration_image_id="0" * 64)
+
+    with pytest.raises(HTTPException) as anonymous:
+        asyncio.run(main._with_stored_image(request, None))
+
+    assert anonymous.value.status_code == 401
+    assert asyncio.run(main._with_stored_image(request, "a@example.com")) is request
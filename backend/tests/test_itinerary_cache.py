@@ -0,0 +1,110 @@
+import asyncio
+import time
+
+from app.services import ai_planner
+from app.services.itinerary_cache import ItineraryCache, request_cache_key
+from benchmarks.fake_gemini import build_itinerary_json
+from schemas import Itinerary, TripRequest
+
+
+def _itinerary(destination: str = "Lisbon", padding: int = 0) -> Itinerary:
+    return Itinerary.model_validate_json(build_itinerary_json(num_days=2, destination=destination, padding=padding))
+
+
+def _request(**overrides) -> TripRequest:
+    fields = dict(trip_description="A relaxed week of food and museums", destination="Lisbon", days=3, trip_tags=["Food", "Culture"])
+    fields.update(overrides)
+    return TripRequest(**fields)
+
+
+def test_key_ignores_case_whitespace_punctuation_and_tag_order():
+    base = request_cache_key(_request())
+    variant = _request(
+        trip_description="  a RELAXED week of\tfood and museums!",
+        destination="lisbon ",
+        trip_tags=["culture", "FOOD"]
+    )
+    assert request_cache_key(variant) == base
+
+
+def test_key_separates_requests_that_change_the_itinerary():
+    base = request_cache_key(_request())
+    assert request_cache_key(_request(days=4)) != base
+    assert request_cache_key(_request(destination="Porto")) != base
+    assert request_cache_key(_request(start_date="2026-05-01")) != base
+    assert request_cache_key(_request(inspiration_image_id="ab" * 32)) != base
+
+
+def test_get_returns_stored_itinerary_and_counts():
+    cache = ItineraryCache(max_entries=4, max_bytes=1_000_000, ttl=60)
+    itinerary = _itinerary()
+    assert cache.get("a") is None
+    cache.put("a", itinerary)
+    assert cache.get("a") is itinerary
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+    assert stats["bytes"] == len(itinerary.model_dump_json())
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ItineraryCache(max_entries=2, max_bytes=1_000_000, ttl=60)
+    cache.put("a", _itinerary())
+    cache.put("b", _itinerary())
+    cache.get("a")
+    cache.put("c", _itinerary())
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_byte_bound_evicts_and_skips_oversized_entries():
+    size = len(_itinerary().model_dump_json())
+    cache = ItineraryCache(max_entries=100, max_bytes=size * 2, ttl=60)
+    for key in ("a", "b", "c"):
+        cache.put(key, _itinerary())
+    assert cache.get("a") is None
+    assert cache.stats()["bytes"] <= size * 2
+
+    cache.put("big", _itinerary(padding=size * 4))
+    assert cache.get("big") is None
+    assert cache.get("c") is not None
+
+
+def test_expired_entry_is_a_miss_and_removed():
+    cache = ItineraryCache(max_entries=4, max_bytes=1_000_000, ttl=0.01)
+    cache.put("a", _itinerary())
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_replacing_an_entry_keeps_the_byte_count_exact():
+    cache = ItineraryCache(max_entries=4, max_bytes=1_000_000, ttl=60)
+    cache.put("a", _itinerary(padding=500))
+    smaller = _itinerary()
+    cache.put("a", smaller)
+    assert cache.stats()["bytes"] == len(smaller.model_dump_json())
+
+
+def test_planner_serves_repeat_requests_from_the_cache(planner):
+    first, first_status = asyncio.run(ai_planner.generate_itinerary_with_status(_request()))
+    repeat, repeat_status = asyncio.run(
+        ai_planner.generate_itinerary_with_status(_request(trip_description="a relaxed week of food and museums."))
+    )
+    assert first_status == ai_planner.STATUS_SUCCESS
+    assert first.destination == "Lisbon"
+    assert repeat_status == ai_planner.STATUS_CACHED
+    assert repeat is first
+    assert planner.calls == 1
+
+
+def test_planner_does_not_cache_the_fallback(planner):
+    planner.error = RuntimeError("upstream unavailable")
+    itinerary, status = asyncio.run(ai_planner.generate_itinerary_with_status(_request()))
+    assert status == ai_planner.STATUS_FALLBACK
+    assert itinerary.meta.notes != "Fake Gemini response"
+
+    planner.error = None
+    itinerary, status = asyncio.run(ai_planner.generate_itinerary_with_status(_request()))
+    assert status == ai_planner.STATUS_SUCCESS
+    assert planner.calls == 2
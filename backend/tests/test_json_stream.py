@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+from app.services.json_stream import ItineraryStreamParser
+from benchmarks.fake_gemini import build_itinerary_json
+
+DOCUMENT = build_itinerary_json(num_days=3, destination='Kyoto "old town" {east}')
+EXPECTED = json.loads(DOCUMENT)
+
+
+def _parse(chunks):
+    parser = ItineraryStreamParser()
+    days = []
+    header = None
+    for chunk in chunks:
+        days.extend(parser.feed(chunk))
+        header = header or parser.take_header()
+    return parser, header, days
+
+
+def test_whole_document_yields_header_days_and_skeleton():
+    parser, header, days = _parse(["```json\n" + DOCUMENT + "\n```"])
+    assert days == EXPECTED["days"]
+    assert header == {key: value for key, value in EXPECTED.items() if key not in ("days", "meta")}
+    assert parser.done
+    skeleton = parser.close()
+    assert skeleton["meta"] == EXPECTED["meta"]
+    assert skeleton["days"] == []
+
+
+@pytest.mark.parametrize("split", range(0, len(DOCUMENT) + 1, 7))
+def test_any_split_point_gives_the_same_result(split):
+    parser, header, days = _parse([DOCUMENT[:split], DOCUMENT[split:]])
+    assert days == EXPECTED["days"]
+    assert header["destination"] == EXPECTED["destination"]
+    assert parser.close()["meta"] == EXPECTED["meta"]
+
+
+def test_character_by_character_stream():
+    parser, header, days = _parse(list(DOCUMENT))
+    assert days == EXPECTED["days"]
+    assert header["numDays"] == 3
+    assert parser.done
+
+
+def test_day_is_returned_as_soon_as_it_closes():
+    parser = ItineraryStreamParser()
+    first_day_end = DOCUMENT.index('"dayNumber": 2') - len(", {")
+    assert [day["dayNumber"] for day in parser.feed(DOCUMENT[:first_day_end])] == [1]
+    assert parser.take_header()["destination"] == EXPECTED["destination"]
+    assert parser.take_header() is None
+    assert [day["dayNumber"] for day in parser.feed(DOCUMENT[first_day_end:])] == [2, 3]
+
+
+def test_escaped_quotes_and_braces_inside_strings():
+    document = json.dumps({"destination": "x", "days": [{"theme": 'a \\"} ] {', "n": 1}], "meta": {}})
+    parser, _, days = _parse([document[:20], document[20:]])
+    assert days == [{"theme": 'a \\"} ] {', "n": 1}]
+
+
+def test_trailing_text_after_the_document_is_ignored():
+    parser, _, days = _parse([DOCUMENT + "\nHope you enjoy {your} trip!"])
+    assert len(days) == 3
+    assert parser.close()["destination"] == EXPECTED["destination"]
+
+
+def test_truncated_stream_cannot_be_closed():
+    parser, _, days = _parse([DOCUMENT[: len(DOCUMENT) // 2]])
+    assert not parser.done
+    with pytest.raises(ValueError):
+        parser.close()
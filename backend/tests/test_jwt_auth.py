@@ -0,0 +1,108 @@
+import jwt
+import pytest
+
+from app.services import jwt_auth
+from app.services.jwt_auth import (
+    _load_keys, decode_access_token, issue_access_token, token_cache, InvalidToken, TokenCache, DEFAULT_SECRET_KEY
+)
+
+OLD_KEY = "old:" + "1" * 32
+NEW_KEY = "new:" + "2" * 32
+
+
+def _use_keys(monkeypatch, spec, legacy_secret=None):
+    signing_kid, keys = _load_keys(spec, legacy_secret)
+    monkeypatch.setattr(jwt_auth, "SIGNING_KID", signing_kid)
+    monkeypatch.setattr(jwt_auth, "_KEYS", keys)
+    token_cache.clear()
+
+
+def test_load_keys():
+    assert _load_keys("", None) == (None, {None: DEFAULT_SECRET_KEY})
+    assert _load_keys("new:s2, old:s1", None) == ("new", {"new": "s2", "old": "s1"})
+    assert _load_keys("new:s2", "legacy") == ("new", {None: "legacy", "new": "s2"})
+    for spec in ("new", "new:s2,new:s3", ":s2"):
+        with pytest.raises(ValueError):
+            _load_keys(spec, None)
+
+
+def test_repeated_token_is_served_from_cache():
+    token = issue_access_token("a@example.com")
+    hits, misses = token_cache.hits, token_cache.misses
+
+    first = decode_access_token(token)
+    second = decode_access_token(token)
+
+    assert first["sub"] == "a@example.com"
+    assert second is first
+    assert (token_cache.hits - hits, token_cache.misses - misses) == (1, 1)
+
+
+def test_expired_and_tampered_tokens_are_rejected():
+    expired = issue_access_token("a@example.com", expires_minutes=-1)
+    with pytest.raises(InvalidToken):
+        decode_access_token(expired)
+    tampered = issue_access_token("a@example.com")[:-2] + "xx"
+    with pytest.raises(InvalidToken):
+        decode_access_token(tampered)
+
+
+def test_cached_claims_expire_with_the_token():
+    cache = TokenCache(max_entries=2)
+    cache.put("token", {"sub": "a@example.com"}, expires_at=100.0)
+
+    assert cache.get("token", now=99.0) == {"sub": "a@example.com"}
+    assert cache.get("token", now=100.0) is None
+    assert cache.stats() == {"entries": 0, "hits": 1, "misses": 1}
+
+
+def test_cache_is_bounded_lru():
+    cache = TokenCache(max_entries=2)
+    for token in ("a", "b"):
+        cache.put(token, {"sub": token}, expires_at=100.0)
+    cache.get("a", now=0.0)
+    cache.put("c", {"sub": "c"}, expires_at=100.0)
+
+    assert cache.get("b", now=0.0) is None
+    assert cache.get("a", now=0.0) is not None and cache.get("c", now=0.0) is not None
+
+
+def test_kid_rotation(monkeypatch):
+    _use_keys(monkeypatch, OLD_KEY)
+    old_token = issue_access_token("a@example.com")
+    assert jwt.get_unverified_header(old_token)["kid"] == "old"
+
+    # Rotated: new tokens use the new key, old ones still verify
+    _use_keys(monkeypatch, f"{NEW_KEY},{OLD_KEY}")
+    new_token = issue_access_token("a@example.com")
+    assert jwt.get_unverified_header(new_token)["kid"] == "new"
+    assert decode_access_token(old_token)["sub"] == "a@example.com"
+    assert decode_access_token(new_token)["sub"] == "a@example.com"
+
+    # Retired: the old key no longer verifies anything
+    _use_keys(monkeypatch, NEW_KEY)
+    with pytest.raises(InvalidToken):
+        decode_access_token(old_token)
+    assert decode_access_token(new_token)["sub"] == "a@example.com"
+
+
+def test_legacy_tokens_need_the_legacy_secret(monkeypatch):
+    _use_keys(monkeypatch, "")
+    legacy_token = issue_access_token("a@example.com")
+    assert "kid" not in jwt.get_unverified_header(legacy_token)
+
+    _use_keys(monkeypatch, NEW_KEY)
+    with pytest.raises(InvalidToken):
+        decode_access_token(legacy_token)
+
+    _use_keys(monkeypatch, NEW_KEY, legacy_secret=DEFAULT_SECRET_KEY)
+    assert decode_access_token(legacy_token)["sub"] == "a@example.com"
+
+
+def test_protected_route_needs_a_valid_bearer_token(auth_client):
+    token = issue_access_token("a@example.com")
+
+    assert auth_client.get("/me").status_code == 401
+    assert auth_client.get("/me", headers={"Authorization": token}).status_code == 401
+    assert auth_client.get("/me", headers={"Authorization": "Bearer not-a-token"}).status_code == 401
+    assert auth_client.get("/me", headers={"Authorization": f"Bearer {token}"}).json() == {"email": "a@example.com"}
@@ -0,0 +1,75 @@
+import io
+import json
+import queue
+import logging
+from logging.handlers import QueueListener
+
+import pytest
+
+from app.services.logging_config import DroppingQueueHandler, JsonFormatter, TextFormatter
+
+
+def _log_through_queue(formatter: logging.Formatter, emit, max_size: int = 100):
+    """Send records from ``emit(logger)`` through the queue handler; returns (output, handler)"""
+    output = io.StringIO()
+    stream_handler = logging.StreamHandler(output)
+    stream_handler.setFormatter(formatter)
+    log_queue: queue.Queue = queue.Queue(maxsize=max_size)
+    handler = DroppingQueueHandler(log_queue)
+    logger = logging.getLogger(f"tests.logging.{id(output)}")
+    logger.propagate = False
+    logger.addHandler(handler)
+    try:
+        emit(logger)
+    finally:
+        logger.removeHandler(handler)
+    listener = QueueListener(log_queue, stream_handler)
+    listener.start()
+    listener.stop()
+    return output.getvalue(), handler
+
+
+def _log_exception(logger: logging.Logger) -> None:
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.exception("failed", extra={"fields": {"stage": "parse"}})
+
+
+def test_json_keeps_fields_and_traceback():
+    output, _ = _log_through_queue(JsonFormatter(), _log_exception)
+    entry = json.loads(output)
+
+    assert entry["msg"] == "failed" and entry["stage"] == "parse"
+    assert "Traceback" in entry["exc"] and "ValueError: boom" in entry["exc"]
+
+
+def test_text_keeps_traceback():
+    output, _ = _log_through_queue(TextFormatter(), _log_exception)
+
+    assert "failed stage=parse" in output
+    assert "ValueError: boom" in output
+
+
+@pytest.mark.parametrize("formatter", [JsonFormatter(), TextFormatter()])
+def test_formatters_work_without_the_queue(formatter):
+    output = io.StringIO()
+    handler = logging.StreamHandler(output)
+    handler.setFormatter(formatter)
+    logger = logging.getLogger(f"tests.logging.direct.{id(output)}")
+    logger.propagate = False
+    logger.addHandler(handler)
+    _log_exception(logger)
+
+    assert "ValueError: boom" in output.getvalue()
+
+
+def test_full_queue_drops_instead_of_blocking():
+    def emit(logger):
+        for i in range(5):
+            logger.warning("line %d", i)
+
+    output, handler = _log_through_queue(JsonFormatter(), emit, max_size=2)
+
+    assert [json.loads(line)["msg"] for line in output.splitlines()] == ["line 0", "line 1"]
+    assert handler.dropped == 3
@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+
+from app.services import otp_service
+from app.services.otp_store import MemoryOtpStore, RedisOtpStore
+from app.services.redis_client import RedisClient
+
+
+def _run_with_store(kind, fake_redis, scenario):
+    """Run ``scenario(store)`` against a fresh store of ``kind`` in one event loop"""
+    async def main():
+        store = MemoryOtpStore() if kind == "memory" else RedisOtpStore(RedisClient(fake_redis.url))
+        try:
+            return await scenario(store)
+        finally:
+            await store.close()
+    return asyncio.run(main())
+
+
+@pytest.fixture(params=["memory", "redis"])
+def run_with_store(request):
+    fake_redis = request.getfixturevalue("fake_redis") if request.param == "redis" else None
+    return lambda scenario: _run_with_store(request.param, fake_redis, scenario)
+
+
+def test_correct_code_is_consumed_once(run_with_store):
+    async def scenario(store):
+        await store.put("a@example.com", "123456")
+        return [await store.consume("a@example.com", "123456") for _ in range(2)]
+
+    assert run_with_store(scenario) == [True, False]
+
+
+def test_wrong_code_leaves_pending_otp(run_with_store):
+    async def scenario(store):
+        await store.put("a@example.com", "123456")
+        wrong = await store.consume("a@example.com", "654321")
+        return wrong, await store.consume("a@example.com", "123456")
+
+    assert run_with_store(scenario) == (False, True)
+
+
+def test_new_otp_replaces_pending_one(run_with_store):
+    async def scenario(store):
+        await store.put("a@example.com", "111111")
+        await store.put("a@example.com", "222222")
+        return await store.consume("a@example.com", "111111"), await store.consume("a@example.com", "222222")
+
+    assert run_with_store(scenario) == (False, True)
+
+
+def test_concurrent_verifications_have_one_winner(run_with_store):
+    async def scenario(store):
+        await store.put("a@example.com", "123456")
+        return await asyncio.gather(*(store.consume("a@example.com", "123456") for _ in range(50)))
+
+    assert sum(run_with_store(scenario)) == 1
+
+
+def test_memory_store_expires_and_evicts():
+    async def scenario():
+        store = MemoryOtpStore(max_entries=2)
+        await store.put("expired@example.com", "123456", ttl=0)
+        for i in range(3):
+            await store.put(f"user{i}@example.com", "123456")
+        return store, await store.consume("expired@example.com", "123456"), await store.consume("user0@example.com", "123456")
+
+    store, expired, evicted = asyncio.run(scenario())
+    assert (expired, evicted) == (False, False)
+    assert store.stats()["entries"] == 2
+    assert store.expired == 1 and store.evicted == 1
+
+
+def test_redis_script_is_sent_only_on_noscript(fake_redis):
+    async def scenario(store):
+        for _ in range(3):
+            await store.put("a@example.com", "123456")
+            assert await store.consume("a@example.com", "123456")
+        return store.script_loads
+
+    assert _run_with_store("redis", fake_redis, scenario) == 1
+
+
+def test_verify_endpoint_consumes_the_otp(auth_client):
+    asyncio.run(otp_service.store_otp("a@example.com", "123456"))
+
+    wrong = auth_client.post("/auth/verify-otp", json={"email": "a@example.com", "otp": "654321"})
+    first = auth_client.post("/auth/verify-otp", json={"email": "A@example.com ", "otp": "123456"})
+    replay = auth_client.post("/auth/verify-otp", json={"email": "a@example.com", "otp": "123456"})
+
+    assert wrong.status_code == 401
+    assert first.status_code == 200 and first.json()["email"] == "a@example.com"
+    assert replay.status_code == 401
+    me = auth_client.get("/me", headers={"Authorization": f"Bearer {first.json()['token']}"})
+    assert me.json() == {"email": "a@example.com"}
+
+
+def test_full_email_queue_fails_the_request_without_weakening_verification(auth_client, monkeypatch):
+    monkeypatch.setattr(otp_service, "EMAILJS_CONFIGURED", True)
+    monkeypatch.setattr(otp_service.otp_email_queue, "submit", lambda email, otp: False)
+
+    response = auth_client.post("/auth/request-otp", json={"email": "a@example.com"})
+    guess = auth_client.post("/auth/verify-otp", json={"email": "a@example.com", "otp": "123456"})
+
+    assert response.status_code == 503
+    assert guess.status_code == 401
+
+
+def test_unconfigured_emailjs_still_needs_the_real_code(auth_client, monkeypatch):
+    monkeypatch.setattr(otp_service, "generate_random_otp", lambda: "654321")
+
+    assert auth_client.post("/auth/request-otp", json={"email": "a@example.com"}).status_code == 200
+    guess = auth_client.post("/auth/verify-otp", json={"email": "a@example.com", "otp": "123456"})
+    real = auth_client.post("/auth/verify-otp", json={"email": "a@example.com", "otp": "654321"})
+
+    assert (guess.status_code, real.status_code) == (401, 200)
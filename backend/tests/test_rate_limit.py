@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+from starlette.datastructures import Headers
+
+from app.routers import auth
+from app.services.rate_limit import (
+    client_ip, parse_rule, MemoryRateStore, RateLimited, RateLimiter, RedisRateStore, REQUEST_OTP_RULES
+)
+from app.services.redis_client import RedisClient
+
+
+def test_parse_rule():
+    rule = parse_rule("verify_email", "10/600")
+    assert (rule.name, rule.limit, rule.window) == ("verify_email", 10, 600.0)
+    with pytest.raises(ValueError):
+        parse_rule("verify_email", "10 per minute")
+
+
+@pytest.mark.parametrize("backend", ["memory", "redis"])
+def test_limit_rejects_with_retry_after(backend, request):
+    rule = parse_rule("test", "3/60")
+
+    async def scenario():
+        if backend == "memory":
+            store = MemoryRateStore()
+        else:
+            store = RedisRateStore(RedisClient(request.getfixturevalue("fake_redis").url))
+        limiter = RateLimiter(store, enabled=True)
+        try:
+            for _ in range(3):
+                await limiter.check([(rule, "a@example.com")])
+            with pytest.raises(RateLimited) as rejected:
+                await limiter.check([(rule, "a@example.com")])
+            # Other keys are counted separately
+            await limiter.check([(rule, "b@example.com")])
+            return rejected.value, limiter
+        finally:
+            await limiter.close()
+
+    rejection, limiter = asyncio.run(scenario())
+    assert rejection.rule == "test"
+    assert 0 < rejection.retry_after <= 120
+    assert limiter.rejected == 1
+
+
+def test_blocked_key_is_rejected_without_the_store():
+    rule = parse_rule("test", "1/60")
+    limiter = RateLimiter(MemoryRateStore(), enabled=True)
+
+    async def scenario():
+        await limiter.check([(rule, "a@example.com")])
+        for _ in range(3):
+            with pytest.raises(RateLimited):
+                await limiter.check([(rule, "a@example.com")])
+
+    asyncio.run(scenario())
+    assert limiter.rejected == 3 and limiter.local_rejections == 2
+
+
+def test_disabled_limiter_allows_everything():
+    rule = parse_rule("test", "1/60")
+    limiter = RateLimiter(MemoryRateStore(), enabled=False)
+
+    async def scenario():
+        for _ in range(5):
+            await limiter.check([(rule, "a@example.com")])
+
+    asyncio.run(scenario())
+    assert limiter.checks == 0
+
+
+def test_forwarded_for_is_ignored_unless_trusted(monkeypatch):
+    headers = Headers({"x-forwarded-for": "203.0.113.7"})
+    assert client_ip(headers, "10.0.0.1") == "10.0.0.1"
+    monkeypatch.setattr("app.services.rate_limit.AUTH_TRUST_FORWARDED_FOR", True)
+    assert client_ip(headers, "10.0.0.1") == "203.0.113.7"
+    assert client_ip(Headers({}), "10.0.0.1") == "10.0.0.1"
+
+
+def test_spoofed_forwarded_entries_are_skipped(monkeypatch):
+    monkeypatch.setattr("app.services.rate_limit.AUTH_TRUST_FORWARDED_FOR", True)
+    # The client sent "1.2.3.4"; the proxy appended the address it saw
+    spoofed = Headers(raw=[(b"x-forwarded-for", b"1.2.3.4, 203.0.113.7")])
+    assert client_ip(spoofed, "10.0.0.1") == "203.0.113.7"
+    repeated = Headers(raw=[(b"x-forwarded-for", b"1.2.3.4"), (b"x-forwarded-for", b"203.0.113.7")])
+    assert client_ip(repeated, "10.0.0.1") == "203.0.113.7"
+
+    # Two proxies: the outer one's entry is second from the right
+    monkeypatch.setattr("app.services.rate_limit.AUTH_TRUSTED_PROXY_HOPS", 2)
+    chained = Headers({"x-forwarded-for": "1.2.3.4, 203.0.113.7, 10.0.0.2"})
+    assert client_ip(chained, "10.0.0.1") == "203.0.113.7"
+    assert client_ip(Headers({"x-forwarded-for": "10.0.0.2"}), "10.0.0.1") == "10.0.0.1"
+
+
+def test_request_otp_answers_429_with_retry_after(auth_client):
+    email_limit = REQUEST_OTP_RULES[0].limit
+    statuses = [
+        auth_client.post("/auth/request-otp", json={"email": "a@example.com"}).status_code
+        for _ in range(email_limit)
+    ]
+    limited = auth_client.post("/auth/request-otp", json={"email": "a@example.com"})
+
+    assert statuses == [200] * email_limit
+    assert limited.status_code == 429
+    assert int(limited.headers["Retry-After"]) >= 1
+    assert auth.auth_rate_limiter.rejected == 1
+    assert auth_client.post("/auth/request-otp", json={"email": "b@example.com"}).status_code == 200
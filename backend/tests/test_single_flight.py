@@ -0,0 +1,150 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services import ai_planner
+from app.services.gemini_scheduler import PRIORITY_BATCH, PRIORITY_INTERACTIVE
+from app.services.itinerary_cache import request_cache_key
+from app.services.single_flight import SingleFlight
+from schemas import TripRequest
+
+
+def _request() -> TripRequest:
+    return TripRequest(trip_description="Three days of tapas and architecture", destination="Barcelona", days=3)
+
+
+def test_concurrent_callers_share_one_execution():
+    flights = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.02)
+        return object()
+
+    async def scenario():
+        return await asyncio.gather(*(flights.do("key", work) for _ in range(10)))
+
+    results = asyncio.run(scenario())
+    assert calls == 1
+    assert all(result is results[0] for result in results)
+    assert flights.stats() == {"in_flight": 0, "executions": 1, "coalesced": 9}
+
+
+def test_finished_flight_runs_again():
+    flights = SingleFlight()
+
+    async def work():
+        return 1
+
+    async def scenario():
+        await flights.do("key", work)
+        await flights.do("key", work)
+
+    asyncio.run(scenario())
+    assert flights.executions == 2
+
+
+def test_exception_reaches_every_caller():
+    flights = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def scenario():
+        return await asyncio.gather(*(flights.do("key", work) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert [type(result) for result in results] == [ValueError] * 3
+    assert flights.executions == 1
+
+
+def test_cancelled_caller_does_not_cancel_the_work():
+    flights = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def scenario():
+        first = asyncio.ensure_future(flights.do("key", work))
+        second = asyncio.ensure_future(flights.do("key", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == "done"
+
+
+def test_on_join_runs_only_for_joining_callers():
+    flights = SingleFlight()
+    joined = []
+
+    async def work():
+        await asyncio.sleep(0.01)
+
+    async def scenario():
+        await asyncio.gather(*(flights.do("key", work, on_join=lambda: joined.append(1)) for _ in range(3)))
+
+    asyncio.run(scenario())
+    assert len(joined) == 2
+
+
+def test_identical_requests_make_one_gemini_call(planner):
+    async def scenario():
+        return await asyncio.gather(*(ai_planner.generate_itinerary_with_status(_request()) for _ in range(5)))
+
+    results = asyncio.run(scenario())
+    assert planner.calls == 1
+    assert [status for _, status in results] == [ai_planner.STATUS_SUCCESS] * 5
+    assert all(itinerary is results[0][0] for itinerary, _ in results)
+
+
+def test_gemini_failure_gives_every_caller_the_fallback(planner):
+    planner.error = RuntimeError("upstream unavailable")
+
+    async def scenario():
+        return await asyncio.gather(*(ai_planner.generate_itinerary_with_status(_request()) for _ in range(3)))
+
+    results = asyncio.run(scenario())
+    assert planner.calls == 1
+    assert [status for _, status in results] == [ai_planner.STATUS_FALLBACK] * 3
+    assert all(itinerary.destination == "Barcelona" for itinerary, _ in results)
+
+
+def test_short_deadline_falls_back_without_cutting_the_shared_call(planner, monkeypatch):
+    monkeypatch.setattr(ai_planner, "FALLBACK_RESERVE", 0.0)
+    planner.delay = 0.2
+
+    async def scenario():
+        patient = asyncio.ensure_future(ai_planner.generate_itinerary_with_status(_request()))
+        await asyncio.sleep(0.01)
+        hurried = await ai_planner.generate_itinerary_with_status(_request(), deadline=time.monotonic() + 0.05)
+        return hurried, await patient
+
+    (_, hurried_status), (_, patient_status) = asyncio.run(scenario())
+    assert hurried_status == ai_planner.STATUS_FALLBACK
+    assert patient_status == ai_planner.STATUS_SUCCESS
+    assert planner.calls == 1
+
+
+def test_joining_interactive_caller_raises_the_flight_priority(planner):
+    key = request_cache_key(_request())
+
+    async def scenario():
+        batch = asyncio.ensure_future(ai_planner.generate_itinerary_with_status(_request(), PRIORITY_BATCH))
+        await asyncio.sleep(0.01)
+        before = ai_planner._flight_priorities[key].value
+        interactive = asyncio.ensure_future(ai_planner.generate_itinerary_with_status(_request(), PRIORITY_INTERACTIVE))
+        await asyncio.sleep(0.01)
+        after = ai_planner._flight_priorities[key].value
+        await asyncio.gather(batch, interactive)
+        return before, after
+
+    assert asyncio.run(scenario()) == (PRIORITY_BATCH, PRIORITY_INTERACTIVE)
+    assert key not in ai_planner._flight_priorities
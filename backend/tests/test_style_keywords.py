@@ -0,0 +1,41 @@
+import pytest
+
+from app.services.style_keywords import DEFAULT_STYLE, STYLE_CATEGORIES, StyleClassifier, stem, style_classifier, tokenize
+
+
+@pytest.mark.parametrize("words, expected", [
+    (("hikes", "hiking", "hiked", "hike"), "hik"),
+    (("museums", "museum"), "museum"),
+    (("cities", "city"), "city"),
+    (("trekking", "trek"), "trek"),
+])
+def test_inflections_share_a_stem(words, expected):
+    assert {stem(word) for word in words} == {expected}
+
+
+def test_tokenize_keeps_hyphenated_words():
+    assert tokenize("A five-star, high-end spa! Relax.") == {"a", "five-star", "high-end", "spa", "relax"}
+
+
+def test_matches_are_reported_in_category_order():
+    assert style_classifier.classify("Hiked through ancient cities") == ["Adventure", "Historical", "City"]
+
+
+def test_tags_count_like_description_words():
+    assert style_classifier.classify("", ["Luxury"]) == ["Luxury"]
+    assert style_classifier.classify("A quiet spa weekend", ["five-star"]) == ["Relaxing", "Luxury"]
+
+
+def test_limit_caps_the_categories():
+    description = "A relaxing family adventure with museums, beaches and mountain hiking"
+    assert len(style_classifier.classify(description)) == 3
+    assert len(style_classifier.classify(description, limit=10)) > 3
+
+
+def test_no_match_gives_the_default_style():
+    assert style_classifier.classify("Just a trip") == [DEFAULT_STYLE]
+
+
+def test_keyword_in_several_categories_reports_each():
+    classifier = StyleClassifier(STYLE_CATEGORIES)
+    assert classifier.classify("beach") == ["Relaxing", "Beach"]
@@ -0,0 +1,65 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from app.services.user_store import create_user_repository, SqliteUserRepository
+
+
+def test_user_is_created_once(users):
+    async def scenario():
+        first = await users.ensure_user("a@example.com")
+        second = await users.ensure_user("a@example.com")
+        return first, second, await users.get_user("a@example.com"), await users.get_user("b@example.com")
+
+    (user, created), (again, created_again), fetched, missing = asyncio.run(scenario())
+    assert (created, created_again) == (True, False)
+    assert again == user == fetched
+    assert missing is None
+    assert users.created == 1
+
+
+def test_concurrent_first_logins_agree(users):
+    async def scenario():
+        return await asyncio.gather(*(users.ensure_user("a@example.com") for _ in range(20)))
+
+    results = asyncio.run(scenario())
+    assert sum(created for _, created in results) == 1
+    assert len({user.created_at for user, _ in results}) == 1
+
+
+def test_repositories_share_the_database(tmp_path):
+    path = str(tmp_path / "users.db")
+    worker_a = SqliteUserRepository(path)
+    worker_b = SqliteUserRepository(path, cache_entries=0)
+
+    async def scenario():
+        try:
+            return await worker_a.ensure_user("a@example.com"), await worker_b.ensure_user("a@example.com")
+        finally:
+            await worker_a.close()
+            await worker_b.close()
+
+    (user_a, created_a), (user_b, created_b) = asyncio.run(scenario())
+    assert (created_a, created_b) == (True, False)
+    assert user_a == user_b
+    with sqlite3.connect(path) as connection:
+        assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_known_users_are_answered_from_the_cache(users):
+    async def scenario():
+        await users.ensure_user("a@example.com")
+        queries = users.queries
+        await users.ensure_user("a@example.com")
+        return queries
+
+    queries = asyncio.run(scenario())
+    assert users.queries == queries
+    assert users.stats()["cache_hits"] >= 1
+
+
+def test_create_user_repository_rejects_other_urls(tmp_path):
+    assert create_user_repository(f"sqlite:///{tmp_path}/users.db").path == f"{tmp_path}/users.db"
+    with pytest.raises(ValueError):
+        create_user_repository("postgres://localhost/users")
@@ -1,7 +1,7 @@
 import React, { useState } from 'react';
 import { Routes, Route, Navigate, useNavigate } from 'react-router-dom';
 import type { TripRequest, Itinerary } from './types';
-import { generateItinerary } from './services/api';
+import { streamItinerary } from './services/api';
 import { useAuth } from './contexts/AuthContext';
 import TripForm from './components/TripForm';
 import ItineraryViewer from './components/ItineraryViewer';
@@ -27,8 +27,13 @@ const AppContent: React.FC = () => {
     setError(null);
     
     try {
-      const result = await generateItinerary(requestData);
-      setItinerary(result);
+      // Show the itinerary as soon as the first day arrives
+      await streamItinerary(requestData, (partial) => {
+        if (partial.days.length > 0) {
+          setItinerary(partial);
+          setLoading(false);
+        }
+      });
     } catch (err) {
       setError('Failed to generate itinerary. Please try again.');
       console.error(err);
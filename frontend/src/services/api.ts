@@ -88,6 +88,73 @@ export async function generateItinerary(payload: TripRequest): Promise<Itinerary
   }
 }
 
+// Stream an itinerary from the NDJSON endpoint, reporting the partial
+// itinerary after every event so days can render as they arrive
+export async function streamItinerary(
+  payload: TripRequest,
+  onUpdate: (itinerary: Itinerary) => void
+): Promise<Itinerary> {
+  const headers: Record<string, string> = {
+    'Content-Type': 'application/json',
+  };
+
+  if (authToken) {
+    headers['Authorization'] = `Bearer ${authToken}`;
+  }
+
+  const response = await fetch(`${API_BASE_URL}/api/generate-itinerary/stream`, {
+    method: 'POST',
+    headers,
+    body: JSON.stringify(payload),
+  });
+
+  if (!response.ok || !response.body) {
+    throw new Error(`HTTP error! status: ${response.status}`);
+  }
+
+  let itinerary: Itinerary = {
+    destination: '',
+    numDays: payload.days || 0,
+    styleKeywords: [],
+    days: [],
+    meta: { currency: '', budgetLevel: payload.budget_level || '', notes: '' },
+  };
+
+  const handleLine = (line: string) => {
+    if (!line.trim()) return;
+    const event = JSON.parse(line);
+    if (event.type === 'header') {
+      itinerary = {
+        ...itinerary,
+        destination: event.destination,
+        numDays: event.numDays,
+        styleKeywords: event.styleKeywords,
+        imageMoodSummary: event.imageMoodSummary ?? undefined,
+      };
+    } else if (event.type === 'day') {
+      itinerary = { ...itinerary, days: [...itinerary.days, event.day] };
+    } else if (event.type === 'meta') {
+      itinerary = { ...itinerary, meta: event.meta };
+    }
+    onUpdate(itinerary);
+  };
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split('\n');
+    buffer = lines.pop() ?? '';
+    lines.forEach(handleLine);
+  }
+  handleLine(buffer);
+
+  return itinerary;
+}
+
 export async function healthCheck(): Promise<boolean> {
   try {
     const response = await fetch(`${API_BASE_URL}/health`);